@@ -1,10 +1,23 @@
+import sqlite3
+from datetime import date
+from decimal import Decimal
 from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from config import DATABASE_URL, DATABASE_SCHEMA
+from config import DATABASE_URL, DATABASE_SCHEMA, DB_MAX_CONNECTIONS
 
-# Usa postgresql+psycopg2 explicitamente
-engine = create_engine(f'postgresql+psycopg2://{DATABASE_URL.split("://")[1]}')
+# Usa postgresql+psycopg2 explicitamente (necessário para o COPY); outras URLs, como
+# um SQLite local, são usadas como estão
+if DATABASE_URL.startswith('postgresql://'):
+    DATABASE_URL = f'postgresql+psycopg2://{DATABASE_URL.split("://")[1]}'
+
+# O pool limita as conexões abertas: quem exceder aguarda uma conexão livre
+pool_options = {} if DATABASE_URL.startswith('sqlite') else {'pool_size': DB_MAX_CONNECTIONS, 'max_overflow': 0}
+
+# SQLite: valores dos codecs tipados (Decimal exato e datas) gravados como texto, sem passar por float
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(date, date.isoformat)
+engine = create_engine(DATABASE_URL, pool_pre_ping=True, **pool_options)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Base para modelos
@@ -1,7 +1,12 @@
-from flask import Blueprint, request, jsonify, render_template
+from flask import Blueprint, Response, request, jsonify, render_template, send_file
 from app.services.file_processor import process_file_upload
 from app.services.error_handler import ErrorHandler
+from app.services.job_queue import job_queue
+from app.services.metrics import metrics_registry
+from app.services.profiling import SORT_KEYS, list_profiles, profile_path, profile_summary
+from config import SSE_HEARTBEAT, PROFILE_UPLOADS, PROFILE_TOP
 import tempfile
+import json
 import os
 import asyncio
 
@@ -32,20 +37,118 @@ def upload_file():
         error_handler.log_error("O arquivo deve ter extensão .zip")
         return jsonify({"success": False, "message": "O arquivo deve ter extensão .zip"})
     
-    # Salva o arquivo temporariamente
-    temp_zip = os.path.join(tempfile.gettempdir(), file.filename)
-    file.save(temp_zip)
+    # Perfil (cProfile) deste upload: profile=1 no formulário ou na URL, ou PROFILE_UPLOADS = "on"
+    flag = request.form.get('profile') or request.args.get('profile') or ''
+    profile = PROFILE_UPLOADS == 'on' or flag.lower() in ('1', 'true', 'on')
     
-    try:
-        # Processa o arquivo de forma síncrona
-        result = process_file_upload(temp_zip)
-        return jsonify(result)
+    # Salva o arquivo temporariamente, com nome único (vários uploads podem aguardar na fila)
+    fd, temp_zip = tempfile.mkstemp(suffix='.zip')
+    os.close(fd)
     
+    try:
+        file.save(temp_zip)
+        # Processamento em segundo plano: o resultado é consultado em /jobs/<id>
+        job = job_queue.submit(process_file_upload, temp_zip, file.filename, profile=profile)
     except Exception as e:
-        error_handler.log_error(f"Erro durante o processamento: {str(e)}")
-        return jsonify({"success": False, "message": f"Erro durante o processamento: {str(e)}"})
-    
-    finally:
-        # Remove o arquivo temporário
         if os.path.exists(temp_zip):
-            os.remove(temp_zip)
\ No newline at end of file
+            os.remove(temp_zip)
+        error_handler.log_error(f"Erro ao enfileirar o processamento: {str(e)}")
+        return jsonify({"success": False, "message": f"Erro ao enfileirar o processamento: {str(e)}"})
+    
+    return jsonify({
+        "success": True,
+        "job_id": job.id,
+        "state": job.state,
+        "status_url": f"/jobs/{job.id}",
+        **({"profile_url": f"/jobs/{job.id}/profile"} if profile else {})
+    }), 202
+
+@api_bp.route('/jobs/<job_id>')
+def job_status(job_id):
+    """
+    Estado de um upload enfileirado e, quando concluído, o resultado do processamento.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Job não encontrado"}), 404
+    return jsonify(job.to_dict())
+
+
+@api_bp.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    Eventos de progresso de um job (Server-Sent Events).
+
+    Cada evento "progress" traz etapa, tabela, linhas processadas, linhas/s e
+    tempo restante estimado; o stream termina com um evento "done" quando o
+    job é concluído. Reconexões com Last-Event-ID continuam de onde pararam.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Job não encontrado"}), 404
+    
+    last_event = request.headers.get('Last-Event-ID') or request.args.get('after') or '0'
+    sequence = int(last_event) if last_event.isdigit() else 0
+    
+    def stream(sequence):
+        while True:
+            events, closed = job.progress.wait_events(sequence, SSE_HEARTBEAT)
+            for event in events:
+                sequence = event['seq']
+                yield f"id: {sequence}\nevent: progress\ndata: {json.dumps(event)}\n\n"
+            if closed and not job.progress.events_after(sequence):
+                yield f"event: done\ndata: {json.dumps({'job_id': job.id, 'state': job.state})}\n\n"
+                return
+            if not events:
+                # Comentário SSE: mantém a conexão aberta em proxies durante etapas longas
+                yield ": keep-alive\n\n"
+    
+    return Response(stream(sequence), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@api_bp.route('/jobs/<job_id>/profile')
+def job_profile(job_id):
+    """
+    Resumo dos perfis de um job enviado com profile=1: as funções mais custosas
+    da leitura do ZIP (_job) e de cada tabela já concluída.
+
+    Parâmetros: limit (funções por perfil, padrão PROFILE_TOP) e sort
+    ("cumulative", "tottime" ou "calls").
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Job não encontrado"}), 404
+    if not job.profile:
+        return jsonify({"success": False, "message": "Job enviado sem perfil (profile=1)"}), 404
+    
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in SORT_KEYS:
+        return jsonify({"success": False, "message": f"Ordenação deve ser uma de: {', '.join(SORT_KEYS)}"}), 400
+    limit = request.args.get('limit', '')
+    return jsonify({
+        "job_id": job.id,
+        "state": job.state,
+        "sort": sort,
+        "profiles": profile_summary(job.id, int(limit) if limit.isdigit() else PROFILE_TOP, sort)
+    })
+
+
+@api_bp.route('/jobs/<job_id>/profile/<name>.prof')
+def job_profile_file(job_id, name):
+    """Perfil bruto (formato pstats) de uma tabela, para snakeviz, gprof2dot ou pstats."""
+    job = job_queue.get(job_id)
+    if job is None or not job.profile or name not in list_profiles(job.id):
+        return jsonify({"success": False, "message": "Perfil não encontrado"}), 404
+    return send_file(profile_path(job.id, name), mimetype='application/octet-stream',
+                     as_attachment=True, download_name=f"{job.id}_{name}.prof")
+
+
+@api_bp.route('/metrics')
+def metrics():
+    """
+    Métricas no formato texto do Prometheus: duração por etapa (histograma), linhas,
+    bytes lidos e idas ao banco por tabela, e jobs por estado.
+    """
+    text = metrics_registry.render({'datainjector_jobs': job_queue.stats()})
+    return Response(text, mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,246 @@
+import io
+import logging
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.services.metrics import timed, count_round_trips
+from app.services.record_batch import RecordBatch, NumericColumn, DecimalColumn, DictionaryColumn
+from config import DATABASE_SCHEMA, BULK_INSERT_STRATEGY
+
+logger = logging.getLogger("BulkWriter")
+
+STRATEGIES = ('copy', 'executemany', 'values')
+
+# Limite de parâmetros por comando no INSERT com várias linhas (abaixo do limite do SQLite e do PostgreSQL)
+VALUES_MAX_PARAMS = 30000
+VALUES_MAX_ROWS = 1000
+
+
+class BulkInsertError(SQLAlchemyError):
+    """Falha na gravação de um lote; a mensagem identifica tabela, estratégia e tamanho do lote."""
+
+
+def _csv_value(value: Any) -> str:
+    # Vazio sem aspas é NULL no COPY em CSV; valores entre aspas preservam strings vazias
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _csv_column(column) -> List[str]:
+    """Formata uma coluna do lote para o COPY em CSV."""
+    if isinstance(column, DecimalColumn):
+        # Texto exato com as casas da coluna, direto dos inteiros sem escala
+        return column.to_strings()
+    if isinstance(column, NumericColumn):
+        formatted = [str(value) for value in column.values.tolist()]
+        for index in np.flatnonzero(~column.valid).tolist():
+            formatted[index] = ''
+        return formatted
+    if isinstance(column, DictionaryColumn):
+        # Formata cada valor distinto uma única vez
+        dictionary = [_csv_value(value) for value in column.dictionary]
+        return [dictionary[code] for code in column.codes.tolist()]
+    return [_csv_value(value) for value in column.tolist()]
+
+
+def _batch_to_csv(batch: RecordBatch) -> io.StringIO:
+    columns = [_csv_column(column) for column in batch.columns]
+    buffer = io.StringIO()
+    buffer.writelines(','.join(row) + '\n' for row in zip(*columns))
+    buffer.seek(0)
+    return buffer
+
+
+def resolve_strategy(session: Session, strategy: Optional[str] = None) -> str:
+    """
+    Escolhe a estratégia de gravação para a conexão da sessão.
+
+    "copy" exige PostgreSQL com psycopg2; nos demais bancos (ex.: SQLite
+    local) o padrão é "executemany".
+    """
+    strategy = strategy or BULK_INSERT_STRATEGY
+    is_postgres = session.get_bind().dialect.name == 'postgresql'
+    if strategy == 'auto':
+        return 'copy' if is_postgres else 'executemany'
+    if strategy == 'copy' and not is_postgres:
+        logger.warning("COPY disponível apenas no PostgreSQL; usando executemany")
+        return 'executemany'
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Estratégia de gravação desconhecida: {strategy}")
+    return strategy
+
+
+def _copy(session: Session, table: str, batch: RecordBatch):
+    columns = ", ".join(batch.column_names)
+    cursor = session.connection().connection.cursor()
+    try:
+        # O COPY vai direto pelo cursor do driver, fora da contagem de cursor.execute
+        count_round_trips()
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", _batch_to_csv(batch))
+    finally:
+        cursor.close()
+
+
+def _executemany(session: Session, table: str, batch: RecordBatch):
+    columns = ", ".join(batch.column_names)
+    values = ", ".join(f":{name}" for name in batch.column_names)
+    session.execute(text(f"INSERT INTO {table} ({columns}) VALUES ({values})"), batch.to_records())
+
+
+def _multi_row_values(session: Session, table: str, batch: RecordBatch):
+    names = batch.column_names
+    columns = ", ".join(names)
+    rows_per_statement = max(1, min(VALUES_MAX_ROWS, VALUES_MAX_PARAMS // max(len(names), 1)))
+    statements = {}
+    rows = list(batch.iter_rows())
+
+    for start in range(0, len(rows), rows_per_statement):
+        chunk = rows[start:start + rows_per_statement]
+        statement = statements.get(len(chunk))
+        if statement is None:
+            placeholders = ", ".join(
+                "(" + ", ".join(f":p{row}_{col}" for col in range(len(names))) + ")" for row in range(len(chunk))
+            )
+            statement = statements[len(chunk)] = text(f"INSERT INTO {table} ({columns}) VALUES {placeholders}")
+        params = {f"p{row}_{col}": value for row, values in enumerate(chunk) for col, value in enumerate(values)}
+        session.execute(statement, params)
+
+
+_WRITERS = {'copy': _copy, 'executemany': _executemany, 'values': _multi_row_values}
+
+
+def bulk_insert(session: Session, table_name: str, records: Union[RecordBatch, List[Dict[str, Any]]],
+                strategy: Optional[str] = None, schema: str = DATABASE_SCHEMA) -> int:
+    """
+    Grava um lote de registros com uma única operação em massa.
+
+    Estratégias:
+        copy: COPY ... FROM STDIN (CSV) pelo copy_expert do psycopg2
+        executemany: um INSERT parametrizado executado para todas as linhas
+        values: INSERT com várias linhas por comando (VALUES (...), (...))
+
+    Nada é confirmado aqui: a transação fica a cargo da sessão. Em caso de
+    falha, levanta BulkInsertError descrevendo o lote.
+
+    Args:
+        session: Sessão aberta
+        table_name: Nome da tabela
+        records: Lote colunar (RecordBatch) ou lista de dicionários
+        strategy: "copy", "executemany", "values" ou "auto" (padrão em BULK_INSERT_STRATEGY)
+        schema: Esquema da tabela
+
+    Returns:
+        Quantidade de registros gravados
+    """
+    batch = records if isinstance(records, RecordBatch) else RecordBatch.from_records(records)
+    if not len(batch):
+        return 0
+    strategy = resolve_strategy(session, strategy)
+    table = f"{schema}.{table_name}" if schema else table_name
+
+    try:
+        _WRITERS[strategy](session, table, batch)
+    except Exception as e:
+        raise BulkInsertError(f"Falha ao gravar lote de {len(batch)} registros em {table} ({strategy}): {str(e)}") from e
+
+    logger.info(f"{len(batch)} registros gravados em {table} ({strategy})")
+    return len(batch)
+
+
+class StagedUpdate:
+    """
+    Atualização em lote por meio de uma tabela temporária (staging).
+
+    Os registros alterados de um lote são gravados na staging (com COPY no
+    PostgreSQL) e aplicados com um único UPDATE ... FROM. Cada coluna tem um
+    indicador de alteração na staging, de modo que só as colunas que mudaram
+    em cada registro são escritas, como no UPDATE registro a registro.
+
+    A staging é criada na primeira chamada de apply e removida por close
+    (ou ao sair do bloco with); em caso de erro é desfeita junto com a
+    transação de quem chamou.
+
+    Uso:
+        with StagedUpdate(session, 'tb_procedimento', 'CO_PROCEDIMENTO', colunas) as staging:
+            staging.apply([(chave, {coluna: novo_valor}), ...])
+    """
+
+    def __init__(self, session: Session, table_name: str, key_column: str, columns: Sequence[str],
+                 strategy: Optional[str] = None, schema: str = DATABASE_SCHEMA):
+        self.session = session
+        self.table = f"{schema}.{table_name}" if schema else table_name
+        self.staging = f"sync_staging_{table_name}"
+        self.key_column = key_column
+        self.columns = [column for column in columns if column.lower() != key_column.lower()]
+        self.flags = [f"sync_changed_{index}" for index in range(len(self.columns))]
+        self.strategy = strategy
+        self.created = False
+
+    def _create(self):
+        # Mesmos tipos da tabela de destino: os valores são convertidos na carga da staging
+        columns = ", ".join([self.key_column] + self.columns)
+        self.session.execute(text(f"CREATE TEMPORARY TABLE {self.staging} AS SELECT {columns} FROM {self.table} WHERE 1 = 0"))
+        for flag in self.flags:
+            self.session.execute(text(f"ALTER TABLE {self.staging} ADD COLUMN {flag} SMALLINT"))
+        self.created = True
+
+    def close(self):
+        if self.created:
+            self.session.execute(text(f"DROP TABLE {self.staging}"))
+            self.created = False
+
+    def __enter__(self) -> 'StagedUpdate':
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+
+    def apply(self, updates: List[Tuple[Any, Dict[str, Any]]]) -> int:
+        """
+        Aplica as alterações de um lote.
+
+        Args:
+            updates: Pares (valor da chave, {coluna: novo valor}) na ordem do arquivo;
+                chaves repetidas são combinadas, prevalecendo a última alteração
+
+        Returns:
+            Quantidade de linhas atualizadas no banco
+        """
+        if not updates:
+            return 0
+
+        with timed('update', rows=len(updates)):
+            return self._apply(updates)
+
+    def _apply(self, updates: List[Tuple[Any, Dict[str, Any]]]) -> int:
+        merged: Dict[Any, Dict[str, Any]] = {}
+        for key, differences in updates:
+            merged.setdefault(key, {}).update({column.lower(): value for column, value in differences.items()})
+
+        rows = []
+        for key, differences in merged.items():
+            values = [differences.get(column.lower()) for column in self.columns]
+            flags = [1 if column.lower() in differences else 0 for column in self.columns]
+            rows.append((key, *values, *flags))
+
+        if self.created:
+            self.session.execute(text(f"DELETE FROM {self.staging}"))
+        else:
+            self._create()
+        staged = RecordBatch.from_rows([self.key_column] + self.columns + self.flags, rows)
+        bulk_insert(self.session, self.staging, staged, self.strategy, schema=None)
+
+        set_clause = ", ".join(
+            f"{column} = CASE WHEN s.{flag} = 1 THEN s.{column} ELSE t.{column} END"
+            for column, flag in zip(self.columns, self.flags)
+        )
+        result = self.session.execute(text(
+            f"UPDATE {self.table} AS t SET {set_clause} "
+            f"FROM {self.staging} AS s WHERE t.{self.key_column} = s.{self.key_column}"
+        ))
+        logger.info(f"{result.rowcount} registros atualizados em {self.table} a partir da staging")
+        return result.rowcount
@@ -0,0 +1,273 @@
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, List, Optional, Tuple
+import numpy as np
+from app.services.record_batch import NumericColumn, DecimalColumn, DateColumn, INT64_DIGITS, encode_string_array
+from config import PARSE_CODECS
+
+CODEC_MODES = ('typed', 'float')
+
+# Caracteres mantidos pela limpeza de campos numéricos (mesma regra de clean_numeric_value)
+NUMERIC_CHARS = '0123456789.-'
+
+# Formatos aceitos em campos DATE
+DATE_FORMATS = ('%Y%m%d', '%Y-%m-%d', '%d/%m/%Y')
+
+_NUMBER_TYPE = re.compile(r'^NUMBER\s*\(\s*\d+\s*(?:,\s*(-?\d+)\s*)?\)')
+
+
+def is_valid_number(value: str) -> bool:
+    """Regra de validação de campos NUMBER: o valor (sem espaços) deve ser um float válido."""
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+def clean_numeric_value(value: str):
+    """Conversão escalar de um campo NUMBER, idêntica ao parser linha a linha."""
+    try:
+        clean_value = re.sub(r'[^0-9.-]', '', value)
+        return float(clean_value) if clean_value else None
+    except ValueError:
+        return None
+
+
+def clean_decimal_value(value: str) -> Optional[Decimal]:
+    """Mesma limpeza de clean_numeric_value, com o valor exato (Decimal)."""
+    clean_value = re.sub(r'[^0-9.-]', '', value)
+    if not clean_value:
+        return None
+    try:
+        return Decimal(clean_value)
+    except InvalidOperation:
+        return None
+
+
+def number_scale(layout_type: str) -> int:
+    """Escala declarada no layout: NUMBER(p,s) -> s; NUMBER(p) e NUMBER -> 0."""
+    match = _NUMBER_TYPE.match(str(layout_type).strip())
+    return max(int(match.group(1)), 0) if match and match.group(1) else 0
+
+
+def parse_date(value: str) -> Optional[date]:
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _unscaled_integers(integer: np.ndarray, fraction: np.ndarray, scale: int, negative: np.ndarray) -> np.ndarray:
+    """
+    Inteiros sem escala (valor * 10**scale) de partes inteira e decimal já validadas como dígitos.
+
+    Os dígitos são alinhados à direita numa matriz de caracteres e somados
+    com os pesos 10**k, sem a conversão de texto para inteiro do NumPy
+    (bem mais lenta).
+    """
+    digits = np.char.lstrip(integer, '0')
+    if scale:
+        digits = np.char.add(digits, np.char.ljust(fraction, scale, '0'))
+    width = int(np.char.str_len(digits).max()) if len(digits) else 0
+    if not width:
+        return np.zeros(len(digits), dtype=np.int64)
+    padded = np.char.zfill(digits, width).astype(f'<U{width}')
+    codes = padded.view(np.uint32).reshape(-1, width).astype(np.int64) - ord('0')
+    unscaled = codes @ (10 ** np.arange(width - 1, -1, -1, dtype=np.int64))
+    return np.where(negative, -unscaled, unscaled)
+
+
+class ColumnCodec:
+    """
+    Conversão dos valores de uma coluna do layout, já sem espaços nas pontas.
+
+    convert trata um valor (parser linha a linha) e convert_block a coluna
+    inteira de um bloco (array NumPy de strings); os dois produzem os mesmos
+    valores. A coluna de texto (VARCHAR2, CHAR) fica como está: o recorte de
+    largura fixa já remove o preenchimento.
+    """
+
+    def convert(self, value: str) -> Tuple[Any, bool]:
+        """Valor convertido e se o texto original era válido."""
+        return value, True
+
+    def convert_block(self, values: np.ndarray) -> Tuple[Any, List[int]]:
+        """Coluna do RecordBatch e índices dos valores inválidos."""
+        return encode_string_array(values), []
+
+    def error(self, value: str) -> str:
+        return f"Valor inválido '{value}'"
+
+
+class FloatCodec(ColumnCodec):
+    """Campos NUMBER como float (conversão anterior aos codecs tipados, PARSE_CODECS = "float")."""
+
+    def convert(self, value: str) -> Tuple[Any, bool]:
+        if not value:
+            return None, True
+        return clean_numeric_value(value), is_valid_number(value)
+
+    def convert_block(self, values: np.ndarray) -> Tuple[NumericColumn, List[int]]:
+        # Valores compostos apenas por dígitos, ponto e sinal são convertidos de uma vez pelo NumPy
+        empty = values == ''
+        clean = np.char.strip(values, NUMERIC_CHARS) == ''
+        fast = clean & ~empty
+
+        data = np.zeros(len(values), dtype=np.float64)
+        valid = np.zeros(len(values), dtype=bool)
+        slow = ~empty & ~clean
+        try:
+            data[fast] = values[fast].astype(np.float64)
+            valid[fast] = True
+        except ValueError:
+            # Algum valor como "1-2" ou "." não é um float válido: trata todos escalarmente
+            slow = ~empty
+
+        invalid = []
+        for index in np.flatnonzero(slow).tolist():
+            value = str(values[index])
+            converted = clean_numeric_value(value)
+            if converted is not None:
+                data[index] = converted
+                valid[index] = True
+            if not is_valid_number(value):
+                invalid.append(index)
+        return NumericColumn(data, valid), invalid
+
+    def error(self, value: str) -> str:
+        return f"Valor não numérico '{value}'"
+
+
+class DecimalCodec(FloatCodec):
+    """
+    Campos NUMBER com o valor exato: int com escala 0, Decimal com as casas de NUMBER(p,s).
+
+    Num bloco, a escala é a declarada ou, se algum valor tiver mais casas, a
+    maior encontrada (nada é arredondado antes do banco). Blocos cujos
+    valores cabem em INT64_DIGITS dígitos viram um DecimalColumn (inteiros
+    int64 convertidos pelo NumPy); os demais, uma coluna de Decimal.
+    """
+
+    def __init__(self, scale: int = 0):
+        self.scale = scale
+
+    def _typed(self, number: Decimal):
+        exponent = number.as_tuple().exponent
+        if not self.scale and exponent >= 0:
+            return int(number)
+        if -exponent < self.scale:
+            try:
+                return number.quantize(Decimal(1).scaleb(-self.scale))
+            except InvalidOperation:
+                return number
+        return number
+
+    def convert(self, value: str) -> Tuple[Any, bool]:
+        if not value:
+            return None, True
+        number = clean_decimal_value(value)
+        return (self._typed(number) if number is not None else None), is_valid_number(value)
+
+    def convert_block(self, values: np.ndarray) -> Tuple[Any, List[int]]:
+        count = len(values)
+        empty = values == ''
+        unsigned = np.char.lstrip(values, '-')
+        signs = np.char.str_len(values) - np.char.str_len(unsigned)
+        parts = np.char.partition(unsigned, '.')
+        integer, fraction = parts[:, 0], parts[:, 2]
+
+        # Caminho vetorizado: [-]dígitos[.dígitos], com ao menos um dígito
+        fast = (np.char.strip(values, NUMERIC_CHARS) == '') & ~empty & (signs <= 1)
+        fast &= np.char.isdigit(integer) | (integer == '')
+        fast &= np.char.isdigit(fraction) | (fraction == '')
+        fast &= (integer != '') | (fraction != '')
+
+        slow = {}
+        invalid = []
+        for index in np.flatnonzero(~empty & ~fast).tolist():
+            value = str(values[index])
+            slow[index] = clean_decimal_value(value)
+            if not is_valid_number(value):
+                invalid.append(index)
+
+        scale = self.scale
+        digits = 0
+        if fast.any():
+            scale = max(scale, int(np.char.str_len(fraction[fast]).max()))
+            digits = int(np.char.str_len(np.char.lstrip(integer[fast], '0')).max())
+        for number in slow.values():
+            if number is not None:
+                exponent = number.as_tuple().exponent
+                scale = max(scale, -exponent)
+                digits = max(digits, number.adjusted() + 1)
+
+        if digits + scale > INT64_DIGITS:
+            column = np.empty(count, dtype=object)
+            column[:] = [
+                self._typed(slow[index]) if index in slow and slow[index] is not None
+                else (self._typed(Decimal(str(values[index]))) if fast[index] else None)
+                for index in range(count)
+            ]
+            return column, invalid
+
+        data = np.zeros(count, dtype=np.int64)
+        valid = fast.copy()
+        data[fast] = _unscaled_integers(integer[fast], fraction[fast], scale, signs[fast] == 1)
+        for index, number in slow.items():
+            if number is not None:
+                data[index] = int(number.scaleb(scale))
+                valid[index] = True
+        return DecimalColumn(data, valid, scale), invalid
+
+
+class DateCodec(ColumnCodec):
+    """Campos DATE como datetime.date (formatos em DATE_FORMATS)."""
+
+    def convert(self, value: str) -> Tuple[Any, bool]:
+        if not value:
+            return None, True
+        parsed = parse_date(value)
+        return parsed, parsed is not None
+
+    def convert_block(self, values: np.ndarray) -> Tuple[DateColumn, List[int]]:
+        # Cada data distinta é interpretada uma única vez
+        uniques, inverse = np.unique(values, return_inverse=True)
+        parsed = [parse_date(str(value)) if value else None for value in uniques.tolist()]
+        dates = np.array([np.datetime64(value, 'D') if value else np.datetime64('NaT') for value in parsed],
+                         dtype='datetime64[D]')
+        ok = np.array([value is not None for value in parsed], dtype=bool)
+        inverse = inverse.reshape(-1)
+        valid = ok[inverse]
+        invalid = np.flatnonzero(~valid & (values != '')).tolist()
+        return DateColumn(dates[inverse], valid), invalid
+
+    def error(self, value: str) -> str:
+        return f"Data inválida '{value}'"
+
+
+TEXT_CODEC = ColumnCodec()
+FLOAT_CODEC = FloatCodec()
+DATE_CODEC = DateCodec()
+
+
+def column_codec(layout_type: Any, mode: Optional[str] = None) -> ColumnCodec:
+    """
+    Codec de uma coluna pelo tipo no layout.
+
+    Com mode (padrão em PARSE_CODECS) = "typed", NUMBER vira int/Decimal
+    exatos (DecimalCodec) e DATE vira datetime.date; com "float", NUMBER vira
+    float e DATE fica como texto, como antes dos codecs.
+    """
+    mode = mode or PARSE_CODECS
+    if mode not in CODEC_MODES:
+        raise ValueError(f"Modo de conversão desconhecido: {mode}")
+    layout_type = str(layout_type)
+    if layout_type.startswith('NUMBER'):
+        return DecimalCodec(number_scale(layout_type)) if mode == 'typed' else FLOAT_CODEC
+    if layout_type.startswith('DATE') and mode == 'typed':
+        return DATE_CODEC
+    return TEXT_CODEC
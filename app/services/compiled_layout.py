@@ -0,0 +1,116 @@
+import io
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Sequence, Union
+import pandas as pd
+from app.services.column_codecs import ColumnCodec, column_codec
+from app.utils.file_utils import DataSource, open_binary
+from config import LAYOUT_CACHE_SIZE
+
+logger = logging.getLogger("CompiledLayout")
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+class CompiledLayout:
+    """
+    Layout de largura fixa pré-processado para os laços de parsing.
+
+    Guarda os deslocamentos já convertidos para inteiros (base 0), a largura
+    total do registro, o codec de cada coluna (ver column_codec) e um índice de nomes sem
+    distinção de maiúsculas/minúsculas. Continua se comportando como a lista
+    de dicionários retornada por parse_layout_file.
+    """
+
+    __slots__ = ('columns', 'names', 'starts', 'ends', 'numeric', 'codecs',
+                 'record_width', 'content_hash', '_index')
+
+    def __init__(self, layout_columns: Sequence[Dict[str, Any]], content_hash: Optional[str] = None):
+        self.columns = list(layout_columns)
+        self.content_hash = content_hash
+        self.names = [col['Coluna'] for col in self.columns]
+        self.starts = [int(col['Inicio']) - 1 for col in self.columns]
+        self.ends = [int(col['Fim']) for col in self.columns]
+        self.numeric = [str(col['Tipo']).startswith('NUMBER') for col in self.columns]
+        self.codecs: List[ColumnCodec] = [column_codec(col['Tipo']) for col in self.columns]
+        # Largura do registro: fim da última coluna do layout
+        self.record_width = self.ends[-1] if self.ends else 0
+        self._index = {}
+        for position, name in enumerate(self.names):
+            self._index.setdefault(str(name).casefold(), position)
+
+    def column_index(self, name: str) -> Optional[int]:
+        """Posição da coluna pelo nome, ignorando maiúsculas/minúsculas."""
+        return self._index.get(str(name).casefold())
+
+    def column_name(self, name: str) -> Optional[str]:
+        """Nome da coluna como escrito no layout."""
+        position = self.column_index(name)
+        return self.names[position] if position is not None else None
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __getitem__(self, index):
+        return self.columns[index]
+
+
+def compile_layout(layout_columns: Union[CompiledLayout, Sequence[Dict[str, Any]]]) -> CompiledLayout:
+    """Aceita um layout já compilado ou a lista de dicionários de parse_layout_file."""
+    if isinstance(layout_columns, CompiledLayout):
+        return layout_columns
+    return CompiledLayout(layout_columns)
+
+
+def load_compiled_layout(layout_file_path: DataSource) -> CompiledLayout:
+    """
+    Lê e compila um arquivo de layout, com cache LRU pelo hash do conteúdo.
+
+    Uploads repetidos com o mesmo layout reaproveitam o objeto compilado
+    sem passar novamente pelo pandas.
+
+    Args:
+        layout_file_path: Caminho para o arquivo de layout (ou membro de um ZIP).
+
+    Returns:
+        CompiledLayout (vazio em caso de erro)
+    """
+    try:
+        with open_binary(layout_file_path) as file:
+            content = file.read()
+        content_hash = hashlib.sha256(content).hexdigest()
+
+        with _cache_lock:
+            layout = _cache.get(content_hash)
+            if layout is not None:
+                _cache.move_to_end(content_hash)
+                _stats['hits'] += 1
+                return layout
+            _stats['misses'] += 1
+
+        layout_df = pd.read_csv(io.BytesIO(content), sep=',')
+        layout = CompiledLayout(layout_df.to_dict('records'), content_hash)
+        logger.info(f"Layout compilado: {len(layout)} colunas, registro de {layout.record_width} caracteres")
+
+        with _cache_lock:
+            _cache[content_hash] = layout
+            while len(_cache) > LAYOUT_CACHE_SIZE:
+                _cache.popitem(last=False)
+        return layout
+
+    except Exception as e:
+        logger.error(f"Erro ao compilar o arquivo de layout: {str(e)}")
+        return CompiledLayout([])
+
+
+def layout_cache_stats() -> Dict[str, int]:
+    """Contadores de acertos/faltas do cache de layouts."""
+    with _cache_lock:
+        return {**_stats, 'size': len(_cache)}
@@ -1,18 +1,50 @@
 import os
+import itertools
 import logging
+import multiprocessing
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import re
-from datetime import datetime
-from typing import List, Dict, Any
-from sqlalchemy import text, inspect
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from sqlalchemy import text, bindparam
 from sqlalchemy.orm import Session
 from app.models.database import SessionLocal, Base
-from app.services.data_validator import parse_layout_file, parse_fixed_width_data
+from app.services.data_validator import iter_fixed_width_batches
+from app.services.compiled_layout import load_compiled_layout
+from app.services.fixed_width_parser import ParseErrorReport
+from app.services.record_batch import RecordBatch
 from app.services.error_handler import ErrorHandler
+from app.services.progress import JobProgress, NO_PROGRESS
+from app.services.profiling import profiled
+from app.services.metrics import (StageTimings, metrics_registry, timed, timed_iter, count_rows, count_round_trips,
+                                  add_bytes_read, discard_stages)
+from app.utils.encoding_utils import detect_file_encoding
+from app.utils.file_utils import DataSource, list_zip_members, source_size
 from app.services.database_service import insert_records_safely_sync
-from config import DATABASE_SCHEMA
+from app.services.bulk_writer import StagedUpdate
+from app.services.database_diff import choose_diff_engine, sync_batches_in_database, DatabaseDiffUnavailable
+from app.services.schema_cache import schema_cache, invalidate_schema_cache
+from app.services.merge_diff import ExternalSort, iter_table_by_key, merge_join
+from app.services.row_hash import normalize_value, row_hashes, row_hash_sql, create_sql_functions
+from app.services.value_comparators import (Comparator, KeyFunction, compile_record_comparators,
+                                            compile_record_key_functions, values_equal)
+from app.services.vectorized_diff import (KEY_COLUMN, POSITION_COLUMN, record_frame, index_by_key, match_records,
+                                          changed_cells, row_differences)
+from config import (DATABASE_SCHEMA, SYNC_BATCH_SIZE, PARSE_ERROR_POLICY, PARSE_MAX_ERRORS,
+                    SYNC_WORKERS, SYNC_EXECUTOR, DB_MAX_CONNECTIONS, SYNC_EXISTING_FETCH, SYNC_KEY_LOOKUP_SIZE,
+                    SYNC_FETCH_SIZE, SYNC_ROW_HASH, SYNC_HASH_COLUMN)
 
 logger = logging.getLogger("DataSyncService")
 
+# Nome da coluna com o hash da linha nas consultas de registros existentes
+ROW_HASH_ALIAS = 'sync_row_hash'
+
+# Tabelas sincronizadas ao mesmo tempo no processo, somando todos os uploads (UPLOAD_WORKERS x
+# SYNC_WORKERS): cada uma ocupa uma conexão do pool, que não tem excedente, e as demais aguardam
+# a vez aqui em vez de falhar pelo tempo limite de espera do pool
+_table_slots = threading.BoundedSemaphore(DB_MAX_CONNECTIONS)
+
 class DataSyncService:
     def __init__(self):
         self.logger = logging.getLogger("DataSyncService")
@@ -20,34 +52,129 @@ class DataSyncService:
         self.processed_layouts = set()
 
     def _get_table_columns(self, session: Session, table_name: str) -> Dict[str, str]:
-        inspector = inspect(session.bind)
-        columns = inspector.get_columns(table_name, schema=DATABASE_SCHEMA)
-        return {col['name']: str(col['type']) for col in columns}
-
-    def _get_existing_records(self, session: Session, table_name: str) -> List[Dict]:
-        try:
-            # Get table structure
-            inspector = inspect(session.bind)
-            pk_constraint = inspector.get_pk_constraint(table_name, schema=DATABASE_SCHEMA)
-            columns_info = inspector.get_columns(table_name, schema=DATABASE_SCHEMA)
+        # Metadados em cache; numa falta, usa a conexão da sessão (uma única conexão do pool por tabela)
+        columns = schema_cache.get_columns(table_name, DATABASE_SCHEMA, bind=session.connection())
+        return {col['name']: col['type'] for col in columns}
+
+    def _select_list(self, session: Session, table_name: str, column_names: Optional[List[str]],
+                     hash_expression: Optional[str]) -> Tuple[List[str], str]:
+        """Nomes e lista do SELECT: as colunas (padrão: todas) e, opcionalmente, o hash da linha."""
+        if column_names is None:
+            # Get table structure (cached)
+            columns_info = schema_cache.get_columns(table_name, DATABASE_SCHEMA, bind=session.connection())
             column_names = [col['name'] for col in columns_info]
-
-            # Create columns string for query
-            columns_str = ", ".join(column_names)
-
-            # Execute query to get all records
-            query = text(f"SELECT {columns_str} FROM {DATABASE_SCHEMA}.{table_name}")
+        expressions = list(column_names)
+        if hash_expression:
+            column_names = list(column_names) + [ROW_HASH_ALIAS]
+            expressions.append(f"{hash_expression} AS {ROW_HASH_ALIAS}")
+        return column_names, ", ".join(expressions)
+
+    def _iter_existing_records(self, session: Session, table_name: str, column_names: Optional[List[str]] = None,
+                               hash_expression: Optional[str] = None) -> Iterator[RecordBatch]:
+        """
+        Lê os registros da tabela em partes de SYNC_FETCH_SIZE linhas.
+
+        A consulta usa um cursor do lado do servidor (cursor nomeado no psycopg2,
+        via yield_per): nem o driver nem a aplicação guardam o resultado inteiro,
+        só a parte em uso.
+
+        Args:
+            session: Sessão aberta
+            table_name: Nome da tabela
+            column_names: Colunas lidas (padrão: todas)
+            hash_expression: Expressão do hash da linha, lida como coluna ROW_HASH_ALIAS (opcional)
+
+        Returns:
+            Iterador de RecordBatch, um por parte lida
+        """
+        column_names, columns_str = self._select_list(session, table_name, column_names, hash_expression)
+        query = text(f"SELECT {columns_str} FROM {DATABASE_SCHEMA}.{table_name}")
+        with timed('fetch_existing'):
+            result = session.execute(query, execution_options={'yield_per': SYNC_FETCH_SIZE})
+        try:
+            for rows in timed_iter('fetch_existing', result.partitions(SYNC_FETCH_SIZE)):
+                # Cada parte é uma leitura do cursor do lado do servidor
+                count_round_trips()
+                yield RecordBatch.from_rows(column_names, rows)
+        finally:
+            result.close()
+
+    def _get_existing_records(self, session: Session, table_name: str, hash_expression: Optional[str] = None) -> RecordBatch:
+        try:
             self.logger.info(f"Buscando registros existentes em {table_name}")
-            result = session.execute(query)
-
-            # Convert result to dictionary
-            records = [dict(zip(column_names, row)) for row in result]
+            # Converte o resultado em lotes colunares, parte por parte, à medida que chegam do servidor
+            parts = list(self._iter_existing_records(session, table_name, hash_expression=hash_expression))
+            records = RecordBatch.concat(parts) if parts else RecordBatch.from_rows(
+                self._select_list(session, table_name, None, hash_expression)[0], []
+            )
             self.logger.info(f"Encontrados {len(records)} registros existentes em {table_name}")
 
             return records
         except Exception as e:
             self.logger.error(f"Erro ao buscar registros em {table_name}: {str(e)}")
-            return []
+            return RecordBatch([], [])
+
+    def _get_existing_keys(self, session: Session, table_name: str, primary_key: str) -> Dict[str, Any]:
+        """
+        Busca apenas a chave primária de todos os registros da tabela.
+
+        Returns:
+            Dicionário chave normalizada (texto sem espaços nas pontas) -> valor da chave no banco
+        """
+        self.logger.info(f"Buscando chaves existentes em {table_name}")
+        existing_keys = {}
+        for part in self._iter_existing_records(session, table_name, [primary_key]):
+            for key in part.columns[0].tolist():
+                if key is not None:
+                    key_value = str(key).strip()
+                    if key_value:
+                        existing_keys[key_value] = key
+        self.logger.info(f"Encontradas {len(existing_keys)} chaves existentes em {table_name}")
+        return existing_keys
+
+    def _get_records_by_keys(self, session: Session, table_name: str, primary_key: str, keys: List[Any],
+                             column_names: Optional[List[str]] = None, hash_expression: Optional[str] = None) -> RecordBatch:
+        """
+        Busca os registros das chaves informadas, em consultas de até
+        SYNC_KEY_LOOKUP_SIZE chaves (WHERE chave = ANY(:keys) no PostgreSQL).
+
+        Args:
+            column_names: Colunas lidas (padrão: todas)
+            hash_expression: Expressão do hash da linha, lida como coluna ROW_HASH_ALIAS (opcional)
+        """
+        column_names, columns_str = self._select_list(session, table_name, column_names, hash_expression)
+        if session.get_bind().dialect.name == 'postgresql':
+            query = text(f"SELECT {columns_str} FROM {DATABASE_SCHEMA}.{table_name} WHERE {primary_key} = ANY(:keys)")
+        else:
+            query = text(f"SELECT {columns_str} FROM {DATABASE_SCHEMA}.{table_name} WHERE {primary_key} IN :keys")
+            query = query.bindparams(bindparam('keys', expanding=True))
+
+        with timed('fetch_existing'):
+            parts = [
+                RecordBatch.from_rows(column_names, session.execute(query, {'keys': keys[start:start + SYNC_KEY_LOOKUP_SIZE]}).fetchall())
+                for start in range(0, len(keys), SYNC_KEY_LOOKUP_SIZE)
+            ]
+            records = RecordBatch.concat(parts or [RecordBatch.from_rows(column_names, [])])
+        count_rows('fetch_existing', len(records))
+        return records
+
+    def _row_hash_source(self, session: Session, table_name: str,
+                         compare_columns: List[str]) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Decide de onde vem o hash das linhas do banco (ver SYNC_ROW_HASH).
+
+        Returns:
+            Tupla (coluna de hash gravada na tabela ou None, expressão SQL do hash ou None)
+        """
+        if SYNC_ROW_HASH == 'off' or not compare_columns:
+            return None, None
+        columns = {col['name'].lower(): col for col in schema_cache.get_columns(table_name, DATABASE_SCHEMA, bind=session.connection())}
+        if SYNC_HASH_COLUMN and SYNC_HASH_COLUMN.lower() in columns:
+            return SYNC_HASH_COLUMN, SYNC_HASH_COLUMN
+        if session.get_bind().dialect.name == 'postgresql':
+            create_sql_functions(session)
+            return None, row_hash_sql([columns[name.lower()] for name in compare_columns])
+        return None, None
 
     def _compare_data_and_layout(self, table_name: str, layout_columns: List[Dict[str, Any]], db_columns: Dict[str, str]) -> Dict[str, Any]:
         differences = {
@@ -105,17 +232,490 @@ class DataSyncService:
 
         return differences
 
-    def sync_table_data(self, table_name: str, data_file_path: str, layout_file_path: str) -> Dict[str, Any]:
+    def _find_differences(self, table_name: str, record: Dict[str, Any], existing_record: Dict[str, Any], primary_key_lower: str,
+                          comparators: Optional[Dict[str, Comparator]] = None) -> Dict[str, Any]:
+        """
+        Compara um registro do arquivo com o registro correspondente do banco.
+
+        Args:
+            comparators: Comparador de cada coluna (ver compile_record_comparators);
+                colunas sem comparador usam a comparação genérica values_equal
+
+        Returns:
+            Dicionário {coluna: novo valor} apenas com os campos que mudaram
+        """
+        differences = {}
+        comparators = comparators or {}
+
+        for key in record:
+            # Ignora a chave primária na verificação - ela já é usada para identificar o registro
+            if key.lower() == primary_key_lower:
+                continue
+
+            file_value = record[key]
+            db_value = existing_record.get(key)
+
+            # Valores normalizados iguais (vazios, ou números iguais dentro da tolerância) não são diferença
+            if comparators.get(key, values_equal)(file_value, db_value):
+                continue
+
+            # Registra a diferença para atualização
+            differences[key] = file_value
+            # Log detalhado para depuração das diferenças
+            self.logger.info(f"Diferença detectada em {table_name}.{key}:")
+            self.logger.info(f"  Valor DB: '{db_value}' (tipo: {type(db_value).__name__})")
+            self.logger.info(f"  Valor Arquivo: '{file_value}' (tipo: {type(file_value).__name__})")
+            self.logger.info(f"  Normalizado DB: '{normalize_value(db_value)}'")
+            self.logger.info(f"  Normalizado Arquivo: '{normalize_value(file_value)}'")
+
+        return differences
+
+    def _index_by_key(self, records: RecordBatch, primary_key: str) -> Dict[str, int]:
+        """Índice chave normalizada (texto sem espaços nas pontas) -> posição do registro no lote."""
+        index = {}
+        # Procura a chave ignorando diferenças de maiúsculas/minúsculas
+        key_index = records.column_index(primary_key)
+        if key_index is not None:
+            for position, key in enumerate(records.columns[key_index].tolist()):
+                if key is not None:
+                    key_value = str(key).strip()
+                    if key_value:
+                        index[key_value] = position
+        return index
+
+    def _sync_batches_in_python(self, session: Session, table_name: str, primary_key: str,
+                                column_names: List[str], batches: Iterable[RecordBatch],
+                                comparators: Optional[Dict[str, Comparator]] = None) -> Dict[str, int]:
+        """
+        Compara os lotes do arquivo com os registros do banco no servidor da aplicação.
+
+        Com SYNC_EXISTING_FETCH = "keys" (padrão) a comparação tem duas fases:
+        primeiro só as chaves primárias da tabela são lidas; depois, a cada lote,
+        os registros do arquivo cujas chaves não existem são inseridos direto e
+        apenas as linhas das chaves restantes são buscadas por completo. Com
+        "full" todas as linhas da tabela são carregadas antes do primeiro lote.
+
+        Quando há hash de linha (ver SYNC_ROW_HASH), registros cujo hash no
+        arquivo é igual ao do banco contam como sem alterações sem comparação
+        campo a campo; no modo "keys" só os de hash diferente são buscados por
+        completo.
+
+        Novos registros são inseridos e os alterados atualizados lote a lote;
+        nada é confirmado aqui.
+
+        Returns:
+            Dicionário com records_read, new_records, updated_records e unchanged_records
+        """
+        new_records_count = 0
+        updated_records_count = 0
+        unchanged_records = 0
+        records_read = 0
+        primary_key_lower = primary_key.lower()  # Converter para minúsculas para comparação
+        key_first = SYNC_EXISTING_FETCH == 'keys'
+        compare_columns = [name for name in column_names if name.lower() != primary_key_lower]
+        hash_column, hash_expression = self._row_hash_source(session, table_name, compare_columns)
+        if hash_column:
+            compare_columns = [name for name in compare_columns if name.lower() != hash_column.lower()]
+
+        if key_first:
+            # Chave normalizada -> valor da chave no banco (usado na busca das linhas completas)
+            existing_keys = self._get_existing_keys(session, table_name, primary_key)
+        else:
+            # Busca registros existentes e indexa pela chave primária
+            existing_records = self._get_existing_records(session, table_name, hash_expression)
+            existing_records_dict = existing_keys = self._index_by_key(existing_records, primary_key)
+            self.logger.info(f"Mapeados {len(existing_records_dict)} registros existentes por chave primária '{primary_key}' em {table_name}")
+
+            # Add diagnostic sampling
+            if len(existing_records) > 0:
+                sample_record = existing_records.record(0)
+                self.logger.info(f"Amostra de registro existente: {sample_record}")
+                sample_key = str(sample_record.get(primary_key, '')).strip() if sample_record.get(primary_key) is not None else None
+                self.logger.info(f"Valor de chave primária da amostra: '{sample_key}'")
+
+        # Alterações aplicadas com um UPDATE ... FROM por lote, via tabela temporária
+        staging = StagedUpdate(session, table_name, primary_key, column_names + ([hash_column] if hash_column else []))
+
+        # Cada lote é comparado, inserido e atualizado antes da leitura do próximo
+        for batch in batches:
+            new_positions = []
+            candidates = []
+            updates = []
+            key_index = batch.column_index(primary_key)
+            rows = list(batch.iter_rows())
+
+            for position, row in enumerate(rows):
+                i = records_read
+                records_read += 1
+
+                if key_index is None or row[key_index] is None:
+                    self.logger.warning(f"Registro sem valor para chave primária {primary_key} em {table_name}")
+                    continue
+
+                record_id = str(row[key_index]).strip()
+
+                # Add example record logging
+                if i < 3:
+                    self.logger.info(f"Exemplo registro #{i} do arquivo: {primary_key}='{record_id}'")
+
+                if record_id not in existing_keys:
+                    new_positions.append(position)
+                    if new_records_count + len(new_positions) <= 3:
+                        self.logger.info(f"Novo registro identificado em {table_name}: {primary_key}='{record_id}' (não encontrado no banco)")
+                else:
+                    candidates.append((position, record_id))
+
+            file_hashes = {}
+            if candidates and hash_expression:
+                # Hash do arquivo x hash do banco: iguais dispensam a comparação campo a campo
+                candidate_hashes = row_hashes(batch.take([position for position, _ in candidates]), compare_columns)
+                if key_first:
+                    hashed = self._get_records_by_keys(
+                        session, table_name, primary_key, [existing_keys[record_id] for _, record_id in candidates],
+                        column_names=[primary_key], hash_expression=hash_expression
+                    )
+                else:
+                    hashed = existing_records
+                hashed_positions = existing_records_dict if not key_first else self._index_by_key(hashed, primary_key)
+                db_hashes = hashed.columns[hashed.column_index(ROW_HASH_ALIAS)]
+
+                remaining = []
+                for (position, record_id), file_hash in zip(candidates, candidate_hashes):
+                    if db_hashes[hashed_positions[record_id]] == file_hash:
+                        unchanged_records += 1
+                        if unchanged_records <= 3:
+                            self.logger.info(f"Registro sem alterações em {table_name}: {primary_key}={record_id} (mesmo hash)")
+                    else:
+                        remaining.append((position, record_id))
+                        file_hashes[position] = file_hash
+                candidates = remaining
+
+            if candidates:
+                if key_first:
+                    # Segunda fase: linhas completas só das chaves que já existem (e cujo hash mudou)
+                    existing_records = self._get_records_by_keys(
+                        session, table_name, primary_key, [existing_keys[record_id] for _, record_id in candidates]
+                    )
+                    existing_records_dict = self._index_by_key(existing_records, primary_key)
+
+                # Colunas do banco pelos nomes do layout (o PostgreSQL devolve os nomes em minúsculas)
+                existing_columns = [
+                    (name, existing_records.columns[index])
+                    for name, index in ((name, existing_records.column_index(name)) for name in column_names)
+                    if index is not None
+                ]
+
+                for position, record_id in candidates:
+                    # Só os pares comparados viram dicionários
+                    record = dict(zip(batch.column_names, rows[position]))
+                    existing_position = existing_records_dict[record_id]
+                    existing_record = {name: column[existing_position] for name, column in existing_columns}
+                    differences = self._find_differences(table_name, record, existing_record, primary_key_lower, comparators)
+
+                    # Só atualiza se houver diferenças reais
+                    if differences:
+                        updated_records_count += 1
+                        if updated_records_count <= 3:
+                            self.logger.info(f"Registro alterado em {table_name}: {primary_key}={record_id} ({len(differences)} campos)")
+                        if hash_column:
+                            differences[hash_column] = file_hashes[position]
+                        updates.append((record_id, differences))
+                    else:
+                        unchanged_records += 1
+                        if unchanged_records <= 3:  # Limita logs para não sobrecarregar
+                            self.logger.info(f"Registro sem alterações em {table_name}: {primary_key}={record_id}")
+                        if hash_column:
+                            # Só renova o hash gravado (ex.: diferença dentro da tolerância numérica)
+                            updates.append((record_id, {hash_column: file_hashes[position]}))
+
+            # Insere os novos registros do lote
+            if new_positions:
+                self.logger.info(f"Iniciando inserção de {len(new_positions)} novos registros em {table_name}")
+                new_batch = batch.take(new_positions)
+                if hash_column:
+                    new_batch = new_batch.with_column(hash_column, row_hashes(new_batch, compare_columns))
+                success = insert_records_safely_sync(table_name, new_batch, session=session)
+                if not success:
+                    raise Exception(f"Falha na inserção de registros em {table_name}")
+                new_records_count += len(new_positions)
+
+            # Atualiza os registros alterados do lote
+            if updates:
+                staging.apply(updates)
+
+        staging.close()
+        return {
+            'records_read': records_read,
+            'new_records': new_records_count,
+            'updated_records': updated_records_count,
+            'unchanged_records': unchanged_records
+        }
+
+    def _sync_batches_by_merge(self, session: Session, table_name: str, primary_key: str,
+                               column_names: List[str], batches: Iterable[RecordBatch],
+                               comparators: Optional[Dict[str, Comparator]] = None) -> Dict[str, int]:
+        """
+        Compara os lotes do arquivo com a tabela por intercalação ordenada (tabelas maiores que a memória).
+
+        As linhas do arquivo são ordenadas pela chave (ExternalSort, com arquivos
+        temporários a cada SYNC_MERGE_BUFFER_ROWS linhas) e a tabela é lida na
+        mesma ordem por um cursor do lado do servidor; as duas sequências são
+        intercaladas (merge_join). Inserções e atualizações são gravadas a cada
+        SYNC_BATCH_SIZE registros, então a memória fica limitada ao buffer de
+        ordenação e a um lote de gravação. O hash de linha (SYNC_ROW_HASH) é
+        usado como na comparação em Python.
+
+        Nada é confirmado aqui.
+
+        Returns:
+            Dicionário com records_read, new_records, updated_records e unchanged_records
+        """
+        new_records_count = 0
+        updated_records_count = 0
+        unchanged_records = 0
+        records_read = 0
+        primary_key_lower = primary_key.lower()
+        compare_columns = [name for name in column_names if name.lower() != primary_key_lower]
+        hash_column, hash_expression = self._row_hash_source(session, table_name, compare_columns)
+        if hash_column:
+            compare_columns = [name for name in compare_columns if name.lower() != hash_column.lower()]
+        # Com hash, as linhas do arquivo e do banco levam o hash depois das colunas
+        width = len(column_names)
+        insert_columns = column_names + ([hash_column] if hash_column else [])
+        staging = StagedUpdate(session, table_name, primary_key, insert_columns)
+
+        def insert(rows: List[Tuple]):
+            self.logger.info(f"Iniciando inserção de {len(rows)} novos registros em {table_name}")
+            new_batch = RecordBatch.from_rows(insert_columns, [row[:len(insert_columns)] for row in rows])
+            if not insert_records_safely_sync(table_name, new_batch, session=session):
+                raise Exception(f"Falha na inserção de registros em {table_name}")
+
+        with ExternalSort() as sorter:
+            for batch in batches:
+                records_read += len(batch)
+                sorter.add_batch(batch, primary_key, compare_columns if hash_expression else None)
+            if sorter.skipped:
+                self.logger.warning(f"{sorter.skipped} registros sem valor para chave primária {primary_key} em {table_name}")
+            self.logger.info(f"{records_read} registros do arquivo ordenados ({len(sorter.runs)} arquivos temporários)")
+
+            new_rows = []
+            updates = []
+            db_rows = iter_table_by_key(session, table_name, primary_key, column_names, hash_expression)
+            for record_id, row, db_row in merge_join(sorter, db_rows):
+                if db_row is None:
+                    new_rows.append(row)
+                    new_records_count += 1
+                    if new_records_count <= 3:
+                        self.logger.info(f"Novo registro identificado em {table_name}: {primary_key}='{record_id}' (não encontrado no banco)")
+                    if len(new_rows) >= SYNC_BATCH_SIZE:
+                        insert(new_rows)
+                        new_rows = []
+                    continue
+
+                if hash_expression and row[width] == db_row[width]:
+                    unchanged_records += 1
+                    continue
+
+                differences = self._find_differences(table_name, dict(zip(column_names, row[:width])),
+                                                     dict(zip(column_names, db_row[:width])), primary_key_lower,
+                                                     comparators)
+                if differences:
+                    updated_records_count += 1
+                    if updated_records_count <= 3:
+                        self.logger.info(f"Registro alterado em {table_name}: {primary_key}={record_id} ({len(differences)} campos)")
+                    if hash_column:
+                        differences[hash_column] = row[width]
+                    updates.append((record_id, differences))
+                else:
+                    unchanged_records += 1
+                    if hash_column:
+                        updates.append((record_id, {hash_column: row[width]}))
+                if len(updates) >= SYNC_BATCH_SIZE:
+                    staging.apply(updates)
+                    updates = []
+
+            if new_rows:
+                insert(new_rows)
+            if updates:
+                staging.apply(updates)
+
+        staging.close()
+        return {
+            'records_read': records_read,
+            'new_records': new_records_count,
+            'updated_records': updated_records_count,
+            'unchanged_records': unchanged_records
+        }
+
+    def _sync_batches_vectorized(self, session: Session, table_name: str, primary_key: str, column_names: List[str],
+                                 batches: Iterable[RecordBatch],
+                                 key_functions: Dict[str, Tuple[KeyFunction, KeyFunction]]) -> Dict[str, int]:
+        """
+        Compara os lotes do arquivo com os registros do banco em DataFrames (pandas/NumPy).
+
+        Cada lote e as linhas correspondentes do banco (obtidas como no modo
+        Python, ver SYNC_EXISTING_FETCH) viram DataFrames juntados pela chave:
+        linhas sem correspondente são novas e, nas demais, a desigualdade de
+        cada coluna é calculada para todas as linhas de uma vez, com as mesmas
+        regras de _find_differences. Linhas com o mesmo hash de linha no
+        arquivo e no banco contam como sem alterações antes da comparação.
+
+        Indicado para tabelas médias, que cabem em memória no modo "full";
+        nada é confirmado aqui.
+
+        Args:
+            key_functions: Funções de chave de cada coluna (ver compile_record_key_functions)
+
+        Returns:
+            Dicionário com records_read, new_records, updated_records e unchanged_records
+        """
+        new_records_count = 0
+        updated_records_count = 0
+        unchanged_records = 0
+        records_read = 0
+        primary_key_lower = primary_key.lower()
+        key_first = SYNC_EXISTING_FETCH == 'keys'
+        compare_columns = [name for name in column_names if name.lower() != primary_key_lower]
+        hash_column, hash_expression = self._row_hash_source(session, table_name, compare_columns)
+        if hash_column:
+            compare_columns = [name for name in compare_columns if name.lower() != hash_column.lower()]
+        hash_columns = [ROW_HASH_ALIAS] if hash_expression else []
+
+        if key_first:
+            existing_keys = self._get_existing_keys(session, table_name, primary_key)
+        else:
+            existing_frame = index_by_key(record_frame(self._get_existing_records(session, table_name, hash_expression),
+                                                       column_names, primary_key, hash_columns))
+            self.logger.info(f"Carregados {len(existing_frame)} registros existentes de {table_name} para comparação vetorizada")
+
+        staging = StagedUpdate(session, table_name, primary_key, column_names + ([hash_column] if hash_column else []))
+
+        for batch in batches:
+            records_read += len(batch)
+            file_frame = record_frame(batch, column_names, primary_key)
+            missing = file_frame[KEY_COLUMN].isna().to_numpy()
+            if missing.any():
+                self.logger.warning(f"{int(missing.sum())} registros sem valor para chave primária {primary_key} em {table_name}")
+                file_frame = file_frame[~missing]
+
+            if key_first:
+                keys = [existing_keys[key] for key in file_frame[KEY_COLUMN].unique() if key in existing_keys]
+                db_frame = index_by_key(record_frame(
+                    self._get_records_by_keys(session, table_name, primary_key, keys, hash_expression=hash_expression),
+                    column_names, primary_key, hash_columns
+                ))
+            else:
+                db_frame = existing_frame
+
+            new, merged = match_records(file_frame, db_frame)
+            new_positions = merged.loc[new, POSITION_COLUMN].tolist()
+            matched = merged[~new]
+
+            file_hashes = None
+            if hash_expression and len(matched):
+                # Hash do arquivo x hash do banco: iguais dispensam a comparação das colunas
+                file_hashes = np.array(row_hashes(batch.take(matched[POSITION_COLUMN].to_numpy()), compare_columns), dtype=object)
+                same_hash = file_hashes == matched[ROW_HASH_ALIAS].to_numpy(dtype=object)
+                unchanged_records += int(same_hash.sum())
+                matched = matched[~same_hash]
+                file_hashes = file_hashes[~same_hash]
+
+            changed = changed_cells(matched, compare_columns, key_functions)
+            record_ids = matched[KEY_COLUMN].tolist()
+            differences = row_differences(matched, compare_columns, changed)
+            updated_records_count += len(differences)
+            unchanged_records += len(matched) - len(differences)
+            if differences:
+                self.logger.info(f"{len(differences)} registros alterados em {table_name} no lote "
+                                 f"(ex.: {primary_key}={record_ids[differences[0][0]]})")
+
+            if hash_column:
+                # Linhas sem alteração também recebem o hash, que pode estar desatualizado
+                changes = dict(differences)
+                updates = [
+                    (record_id, {**changes.get(row_index, {}), hash_column: file_hashes[row_index]})
+                    for row_index, record_id in enumerate(record_ids)
+                ]
+            else:
+                updates = [(record_ids[row_index], row_changes) for row_index, row_changes in differences]
+
+            if new_positions:
+                self.logger.info(f"Iniciando inserção de {len(new_positions)} novos registros em {table_name}")
+                new_batch = batch.take(new_positions)
+                if hash_column:
+                    new_batch = new_batch.with_column(hash_column, row_hashes(new_batch, compare_columns))
+                if not insert_records_safely_sync(table_name, new_batch, session=session):
+                    raise Exception(f"Falha na inserção de registros em {table_name}")
+                new_records_count += len(new_positions)
+
+            if updates:
+                staging.apply(updates)
+
+        staging.close()
+        return {
+            'records_read': records_read,
+            'new_records': new_records_count,
+            'updated_records': updated_records_count,
+            'unchanged_records': unchanged_records
+        }
+
+    def sync_table_data(self, table_name: str, data_file_path: DataSource, layout_file_path: DataSource,
+                        diff_engine: Optional[str] = None, progress: Optional[JobProgress] = None) -> Dict[str, Any]:
+        """
+        Sincroniza uma tabela com o arquivo de dados: insere os registros novos e
+        atualiza os alterados.
+
+        O resultado traz em 'timings' o tempo exclusivo, as linhas e as chamadas
+        de cada etapa (layout, parse, fetch_existing, diff, insert, update,
+        commit), os bytes lidos e as idas ao banco (ver StageTimings).
+
+        Args:
+            table_name: Nome da tabela
+            data_file_path: Arquivo de dados (caminho ou membro do ZIP)
+            layout_file_path: Arquivo de layout
+            diff_engine: Onde comparar arquivo x banco: "python", "vectorized", "database", "merge" ou "auto"
+                (padrão em SYNC_DIFF_ENGINE_TABLES / SYNC_DIFF_ENGINE, ver choose_diff_engine)
+            progress: Eventos de progresso do job (opcional); as linhas são contadas a cada lote lido
+        """
+        timings = StageTimings(table_name)
+        with timings.activate():
+            result = self._sync_table_data(table_name, data_file_path, layout_file_path, diff_engine, progress)
+        result['timings'] = timings.to_dict()
+        return result
+
+    def _sync_table_data(self, table_name: str, data_file_path: DataSource, layout_file_path: DataSource,
+                         diff_engine: Optional[str], progress: Optional[JobProgress]) -> Dict[str, Any]:
+        progress = progress or NO_PROGRESS
         try:
             self.logger.info(f"Iniciando sincronização da tabela: {table_name}")
-            self.processed_layouts.add(layout_file_path)
-
-            # Parse layout e dados
-            layout_columns = parse_layout_file(layout_file_path)
-            records = parse_fixed_width_data(data_file_path, layout_columns)
-            if not records:
+            self.processed_layouts.add(str(layout_file_path))
+
+            # Parse layout e dados (os registros do arquivo são lidos em lotes)
+            with timed('layout'):
+                layout_columns = load_compiled_layout(layout_file_path)
+            data_file_size = _data_file_size(data_file_path)
+            # Total de linhas estimado pelo tamanho do arquivo (registro + quebra de linha), para o tempo restante
+            record_width = getattr(layout_columns, 'record_width', 0)
+            progress.start_table(table_name, data_file_size // (record_width + 1) if record_width else None)
+            encoding_info = detect_file_encoding(data_file_path)
+            # Validação e conversão acontecem na mesma passada sobre o arquivo
+            def read_batches(error_report: ParseErrorReport) -> Iterator[RecordBatch]:
+                add_bytes_read(data_file_size)
+                return progress.track_batches(table_name, timed_iter('parse', iter_fixed_width_batches(
+                    data_file_path, layout_columns, SYNC_BATCH_SIZE, encoding=encoding_info,
+                    policy=PARSE_ERROR_POLICY, error_report=error_report)))
+
+            error_report = ParseErrorReport(PARSE_MAX_ERRORS)
+            batches = read_batches(error_report)
+            first_batch = next(batches, None)
+            if not first_batch:
                 self.logger.warning(f"Nenhum dado válido encontrado para {table_name}")
-                return {'status': 'error', 'message': 'Nenhum dado válido encontrado'}
+                return {
+                    'status': 'error',
+                    'message': 'Nenhum dado válido encontrado',
+                    'encoding': dict(encoding_info),
+                    'parse_errors': error_report.to_dict()
+                }
 
             # Detecta chave primária
             primary_key = None
@@ -142,234 +742,78 @@ class DataSyncService:
                     # Validação de schema
                     db_columns = self._get_table_columns(session, table_name)
                     schema_diff = self._compare_data_and_layout(table_name, layout_columns, db_columns)
+                    if schema_diff['missing_columns']:
+                        # A estrutura em cache pode estar desatualizada: confirma no catálogo
+                        invalidate_schema_cache(table_name, DATABASE_SCHEMA)
+                        db_columns = self._get_table_columns(session, table_name)
+                        schema_diff = self._compare_data_and_layout(table_name, layout_columns, db_columns)
                     if schema_diff['missing_columns']:
                         return {'status': 'error', 'message': f"Colunas faltantes em {table_name}: {schema_diff['missing_columns']}"}
 
-                    # Busca registros existentes
-                    existing_records = self._get_existing_records(session, table_name)
-                    new_records = []
-                    updated_records = []
-                    unchanged_records = 0
-
-                    # Comparação de dados - VERSÃO CORRIGIDA
-                    existing_records_dict = {}
-                    primary_key_lower = primary_key.lower()  # Converter para minúsculas para comparação
-
-                    for record in existing_records:
-                        # Procura a chave ignorando diferenças de maiúsculas/minúsculas
-                        matching_key = next((k for k in record.keys() if k.lower() == primary_key_lower), None)
-
-                        if matching_key and record[matching_key] is not None:
-                            key_value = str(record[matching_key]).strip()
-                            if key_value:
-                                existing_records_dict[key_value] = record
-
-                    self.logger.info(f"Mapeados {len(existing_records_dict)} registros existentes por chave primária '{primary_key}' em {table_name}")
-
-                    # Add diagnostic sampling
-                    if existing_records and len(existing_records) > 0:
-                        sample_record = existing_records[0]
-                        self.logger.info(f"Amostra de registro existente: {sample_record}")
-                        sample_key = str(sample_record.get(primary_key, '')).strip() if sample_record.get(primary_key) is not None else None
-                        self.logger.info(f"Valor de chave primária da amostra: '{sample_key}'")
-
-                    # Replace the existing record comparison loop with this enhanced version
-                    for i, record in enumerate(records):
-                        # Procura a chave ignorando diferenças de maiúsculas/minúsculas
-                        matching_key = next((k for k in record.keys() if k.lower() == primary_key_lower), None)
-
-                        if not matching_key or record[matching_key] is None:
-                            self.logger.warning(f"Registro sem valor para chave primária {primary_key} em {table_name}")
-                            continue
-
-                        record_id = str(record[matching_key]).strip()
-
-                        # Add example record logging
-                        if i < 3:
-                            self.logger.info(f"Exemplo registro #{i} do arquivo: {primary_key}='{record_id}'")
-
-                        if record_id not in existing_records_dict:
-                            new_records.append(record)
-                            if len(new_records) <= 3:
-                                self.logger.info(f"Novo registro identificado em {table_name}: {primary_key}='{record_id}' (não encontrado no banco)")
-                        else:
-                            existing_record = existing_records_dict[record_id]
-                            differences = {}
-
-                            for key in record:
-                                # Ignora a chave primária na verificação - ela já é usada para identificar o registro
-                                if key.lower() == primary_key_lower:
-                                    continue
-
-                                file_value = record[key]
-                                db_value = existing_record.get(key)
-
-                                # Função para normalizar valores para comparação
-                                def _normalize_value(value):
-                                    """Normaliza valores para comparação consistente"""
-                                    # Trata valores nulos
-                                    if value is None:
-                                        return ''
-                                    
-                                    # Converte para string e remove espaços
-                                    if isinstance(value, (int, float)):
-                                        # Para números, usa representação de string precisa
-                                        if isinstance(value, int):
-                                            return str(value)
-                                        else:  # float
-                                            # Remove zeros à direita e ponto decimal se for inteiro
-                                            # Usa formatação para evitar problemas de precisão
-                                            if value == int(value):  # É um float que representa um inteiro
-                                                return str(int(value))
-                                            # Formatação com precisão fixa para evitar diferenças de arredondamento
-                                            s = f"{value:.10f}".rstrip('0').rstrip('.') if value != 0 else '0'
-                                            return s
-                                    elif isinstance(value, datetime):
-                                        # Normaliza datas para formato ISO sem milissegundos
-                                        return value.strftime('%Y-%m-%d %H:%M:%S')
-                                    elif isinstance(value, str):
-                                        # Para strings, normaliza removendo espaços extras e convertendo para minúsculas
-                                        # Também remove caracteres não imprimíveis que podem causar problemas
-                                        s = value
-                                        # Remove caracteres de controle e espaços extras
-                                        s = re.sub(r'[\x00-\x1F\x7F]', '', s)
-                                        # Normaliza espaços múltiplos para um único espaço
-                                        s = re.sub(r'\s+', ' ', s)
-                                        # Remove espaços no início e fim e converte para minúsculas
-                                        s = s.strip().lower()
-                                        # Tenta converter para número se parecer um número
-                                        if re.match(r'^-?\d+(\.\d+)?$', s):
-                                            try:
-                                                if '.' in s:
-                                                    num = float(s)
-                                                    if num == int(num):  # É um float que representa um inteiro
-                                                        return str(int(num))
-                                                    return f"{num:.10f}".rstrip('0').rstrip('.')
-                                                else:
-                                                    return str(int(s))
-                                            except (ValueError, TypeError):
-                                                pass
-                                        return s
-                                    else:
-                                        # Para outros tipos, converte para string e normaliza
-                                        s = str(value)
-                                        s = re.sub(r'[\x00-\x1F\x7F]', '', s)
-                                        s = re.sub(r'\s+', ' ', s)
-                                        return s.strip().lower()
-                                
-                                # Normaliza os valores para comparação
-                                file_norm = _normalize_value(file_value)
-                                db_norm = _normalize_value(db_value)
-                                
-                                # Se ambos forem vazios, são considerados iguais
-                                if not file_norm and not db_norm:
-                                    continue
-                                    
-                                # Tenta comparação numérica para maior precisão
-                                numeric_equal = False
-                                try:
-                                    # Verifica se ambos parecem ser números
-                                    file_is_numeric = re.match(r'^-?\d+(\.\d+)?$', file_norm) and file_norm.strip()
-                                    db_is_numeric = re.match(r'^-?\d+(\.\d+)?$', db_norm) and db_norm.strip()
-                                    
-                                    if file_is_numeric and db_is_numeric:
-                                        # Converte para float para comparação numérica
-                                        file_num = float(file_norm)
-                                        db_num = float(db_norm)
-                                        
-                                        # Se ambos são inteiros ou representam inteiros
-                                        if file_num == int(file_num) and db_num == int(db_num):
-                                            # Compara como inteiros
-                                            numeric_equal = int(file_num) == int(db_num)
-                                        else:
-                                            # Compara com tolerância para números de ponto flutuante
-                                            # Usa tolerância relativa para números grandes
-                                            abs_diff = abs(file_num - db_num)
-                                            max_val = max(abs(file_num), abs(db_num))
-                                            if max_val > 1.0:
-                                                # Tolerância relativa para números grandes
-                                                numeric_equal = abs_diff / max_val < 0.0000001
-                                            else:
-                                                # Tolerância absoluta para números pequenos
-                                                numeric_equal = abs_diff < 0.0000001
-                                        
-                                        if numeric_equal:
-                                            self.logger.info(f"Valores numericamente iguais: {file_num} e {db_num}")
-                                except (ValueError, TypeError):
-                                    # Se falhar na conversão, não é numérico
-                                    numeric_equal = False
-                                
-                                # Se os valores são numericamente iguais, não registra diferença
-                                if numeric_equal:
-                                    continue
-                                    
-                                # Se os valores normalizados são iguais, não registra diferença
-                                if file_norm == db_norm:
-                                    continue
-                                    
-                                # Registra a diferença para atualização
-                                differences[key] = file_value
-                                # Log detalhado para depuração das diferenças
-                                self.logger.info(f"Diferença detectada em {table_name}.{key}:")
-                                self.logger.info(f"  Valor DB: '{db_value}' (tipo: {type(db_value).__name__})")
-                                self.logger.info(f"  Valor Arquivo: '{file_value}' (tipo: {type(file_value).__name__})")
-                                self.logger.info(f"  Normalizado DB: '{db_norm}'")
-                                self.logger.info(f"  Normalizado Arquivo: '{file_norm}'")
-
-                            # Só atualiza se houver diferenças reais
-                            if differences:
-                                try:
-                                    self.logger.info(f"Encontradas {len(differences)} diferenças no registro {primary_key}={record_id} em {table_name}")
-                                    
-                                    # Log detalhado das diferenças para depuração
-                                    for key, new_value in differences.items():
-                                        old_value = existing_record.get(key)
-                                        self.logger.debug(f"  - Campo '{key}': Valor atual='{old_value}' → Novo valor='{new_value}'")
-                                    
-                                    # Construção da query de atualização
-                                    set_clause = ", ".join([f"{k} = :{k}" for k in differences.keys()])
-                                    update_query = text(
-                                        f"UPDATE {DATABASE_SCHEMA}.{table_name} "
-                                        f"SET {set_clause} "
-                                        f"WHERE {primary_key} = :{primary_key}"
-                                    )
-
-                                    # Parâmetros para a query
-                                    params = {**differences, primary_key: record_id}
-                                    
-                                    # Executa a atualização
-                                    session.execute(update_query, params)
-                                    updated_records.append(record_id)
-                                    self.logger.info(f"Registro atualizado em {table_name}: {primary_key}={record_id} com {len(differences)} alterações")
-                                except Exception as e:
-                                    self.logger.error(f"Erro ao atualizar registro {record_id} em {table_name}: {str(e)}")
-                                    raise
-                            else:
-                                unchanged_records += 1
-                                if unchanged_records <= 3:  # Limita logs para não sobrecarregar
-                                    self.logger.info(f"Registro sem alterações em {table_name}: {primary_key}={record_id}")
-
-                    # Insere novos registros em lote
-                    if new_records:
-                        self.logger.info(f"Iniciando inserção de {len(new_records)} novos registros em {table_name}")
-                        success = insert_records_safely_sync(table_name, new_records)
-                        if not success:
-                            raise Exception(f"Falha na inserção de registros em {table_name}")
-
-                    session.commit()
+                    layout_names = list(first_batch.column_names)
+                    diff_engine = choose_diff_engine(session, table_name, primary_key, diff_engine)
+                    self.logger.info(f"Comparação de {table_name}: {diff_engine}")
+                    if diff_engine == 'database':
+                        try:
+                            with timed('diff'):
+                                counts = sync_batches_in_database(session, table_name, primary_key,
+                                                                  itertools.chain([first_batch], batches))
+                        except DatabaseDiffUnavailable as e:
+                            # Nada foi gravado na tabela: relê o arquivo e compara no servidor. Erros de
+                            # formato, etapas medidas e progresso recomeçam; o tempo perdido fica em "retry"
+                            self.logger.warning(f"{e}; comparando {table_name} no servidor")
+                            diff_engine = 'python'
+                            discard_stages(('parse', 'diff'))
+                            progress.start_table(table_name, data_file_size // (record_width + 1) if record_width else None)
+                            error_report = ParseErrorReport(PARSE_MAX_ERRORS)
+                            first_batch = None
+                            batches = read_batches(error_report)
+                    if diff_engine in ('merge', 'python'):
+                        # Comparadores por coluna, compilados uma vez pelos tipos do layout e do banco
+                        comparators = compile_record_comparators(
+                            layout_columns, schema_cache.get_columns(table_name, DATABASE_SCHEMA, bind=session.connection())
+                        )
+                    if diff_engine == 'vectorized':
+                        key_functions = compile_record_key_functions(
+                            layout_columns, schema_cache.get_columns(table_name, DATABASE_SCHEMA, bind=session.connection())
+                        )
+                        with timed('diff'):
+                            counts = self._sync_batches_vectorized(session, table_name, primary_key, layout_names,
+                                                                   itertools.chain([first_batch], batches), key_functions)
+                    if diff_engine == 'merge':
+                        with timed('diff'):
+                            counts = self._sync_batches_by_merge(session, table_name, primary_key, layout_names,
+                                                                 itertools.chain([first_batch], batches), comparators)
+                    if diff_engine == 'python':
+                        batches = itertools.chain([first_batch], batches) if first_batch else batches
+                        with timed('diff'):
+                            counts = self._sync_batches_in_python(session, table_name, primary_key, layout_names,
+                                                                  batches, comparators)
+
+                    count_rows('diff', counts['records_read'])
+                    with timed('commit'):
+                        session.commit()
                     self.logger.info(f"Sincronização concluída para {table_name}:")
-                    self.logger.info(f"  - {len(new_records)} novos registros inseridos")
-                    self.logger.info(f"  - {len(updated_records)} registros atualizados")
-                    self.logger.info(f"  - {unchanged_records} registros sem alterações (já estavam atualizados)")
+                    self.logger.info(f"  - {counts['records_read']} registros lidos do arquivo")
+                    self.logger.info(f"  - {counts['new_records']} novos registros inseridos")
+                    self.logger.info(f"  - {counts['updated_records']} registros atualizados")
+                    self.logger.info(f"  - {counts['unchanged_records']} registros sem alterações (já estavam atualizados)")
+                    if error_report.total_errors:
+                        self.logger.warning(f"  - {error_report.total_errors} erros de formato, {error_report.rejected_lines} linhas rejeitadas")
 
                     return {
                         'status': 'success',
                         'table': table_name,
                         'primary_key': primary_key,
-                        'new_records': len(new_records),
-                        'updated_records': len(updated_records),
-                        'unchanged_records': unchanged_records,
-                        'processed_layout': layout_file_path
+                        'new_records': counts['new_records'],
+                        'updated_records': counts['updated_records'],
+                        'unchanged_records': counts['unchanged_records'],
+                        'diff_engine': diff_engine,
+                        'processed_layout': str(layout_file_path),
+                        # Encoding final (pode ter mudado durante a leitura) e o motivo da escolha
+                        'encoding': dict(encoding_info),
+                        'rejected_records': error_report.rejected_lines,
+                        'parse_errors': error_report.to_dict()
                     }
 
                 except Exception as e:
@@ -381,16 +825,104 @@ class DataSyncService:
             self.logger.error(error_msg)
             return {'status': 'error', 'message': error_msg}
 
-def sync_data_for_matched_tables(matched_tables: Dict[str, Dict[str, str]], temp_dir: str) -> List[Dict[str, Any]]:
-    sync_service = DataSyncService()
-    results = []
+def _sync_table_job(table_name: str, data_file: DataSource, layout_file: DataSource,
+                    progress: Optional[JobProgress] = None, profile_id: Optional[str] = None) -> Dict[str, Any]:
+    """Sincroniza uma tabela com seu próprio serviço e sessão (executado no pool)."""
+    if not _table_slots.acquire(blocking=False):
+        logger.info(f"{table_name} aguardando uma conexão livre ({DB_MAX_CONNECTIONS} tabelas em sincronização)")
+        _table_slots.acquire()
+    try:
+        with profiled(profile_id, table_name):
+            return DataSyncService().sync_table_data(table_name, data_file, layout_file, progress=progress)
+    finally:
+        _table_slots.release()
+
+def _record_table_result(progress: JobProgress, table_name: str, result: Dict[str, Any]):
+    """Registra o resultado de uma tabela nas métricas do processo e no progresso do job."""
+    metrics_registry.record(table_name, result.get('timings', {}), result.get('status'))
+    counts = [result.get(key) for key in ('new_records', 'updated_records', 'unchanged_records')]
+    rows = sum(counts) if None not in counts else None
+    progress.emit('table_done', table_name, rows=rows, status=result.get('status'),
+                  new_records=result.get('new_records'), updated_records=result.get('updated_records'),
+                  unchanged_records=result.get('unchanged_records'))
+
+def _data_file_size(data_file: DataSource) -> int:
+    try:
+        return source_size(data_file)
+    except OSError:
+        return 0
+
+def sync_data_for_matched_tables(matched_tables: Dict[str, Dict[str, str]], temp_dir: Optional[str] = None,
+                                 archive_path: Optional[str] = None, workers: Optional[int] = None,
+                                 progress: Optional[JobProgress] = None,
+                                 profile_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Sincroniza as tabelas correspondidas, várias ao mesmo tempo.
+    
+    Os arquivos são lidos do diretório de extração (temp_dir) ou, se
+    archive_path for informado, diretamente de dentro do ZIP.
+    
+    As tabelas são distribuídas num pool de threads ou processos
+    (SYNC_EXECUTOR), maiores arquivos de dados primeiro, para reduzir o tempo
+    total. Cada tabela usa uma sessão própria; o número de tabelas
+    simultâneas no processo, somando os uploads em paralelo, não passa de
+    DB_MAX_CONNECTIONS (as excedentes aguardam uma conexão livre).
+    
+    Com progress, cada tabela informa seus lotes e a conclusão; no pool de
+    processos só a conclusão de cada tabela é informada (os eventos não
+    atravessam processos).
+    
+    Com profile_id, cada tabela grava seu perfil (cProfile) em
+    profile_dir(profile_id) e as tabelas rodam sempre no pool de processos:
+    a partir do Python 3.12 o cProfile mede o processo inteiro, e numa thread
+    o perfil de uma tabela incluiria o trabalho das demais.
+    
+    Returns:
+        Resultados por tabela, na mesma ordem de matched_tables
+    """
+    members = {member.name: member for member in list_zip_members(archive_path)} if archive_path else {}
+    jobs = []
     
     for table, files in matched_tables.items():
-        data_file = os.path.join(temp_dir, files['data_file'])
-        layout_file = os.path.join(temp_dir, files['layout_file'])
+        if archive_path:
+            data_file = members[files['data_file']]
+            layout_file = members[files['layout_file']]
+        else:
+            data_file = os.path.join(temp_dir, files['data_file'])
+            layout_file = os.path.join(temp_dir, files['layout_file'])
+        jobs.append((table, data_file, layout_file))
+    
+    progress = progress or NO_PROGRESS
+    workers = min(workers or SYNC_WORKERS, DB_MAX_CONNECTIONS, len(jobs))
+    executor_type = 'process' if profile_id else SYNC_EXECUTOR
+    if workers <= 1 and not (profile_id and jobs):
+        results = []
+        for job in jobs:
+            results.append(_sync_table_job(*job, progress, profile_id))
+            _record_table_result(progress, job[0], results[-1])
+    else:
+        if executor_type == 'process':
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sync')
+        logger.info(f"Sincronizando {len(jobs)} tabelas com {workers} workers ({executor_type})")
         
-        result = sync_service.sync_table_data(table, data_file, layout_file)
-        results.append(result)
+        # Maiores arquivos primeiro: a fila do pool é atendida em ordem de envio
+        order = sorted(range(len(jobs)), key=lambda index: _data_file_size(jobs[index][1]), reverse=True)
+        results = [None] * len(jobs)
+        job_progress = progress if executor_type != 'process' else None
+        with executor:
+            futures = {executor.submit(_sync_table_job, *jobs[index], job_progress, profile_id): index for index in order}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    error_msg = f"Erro na sincronização de {jobs[index][0]}: {str(e)}"
+                    logger.error(error_msg)
+                    results[index] = {'status': 'error', 'message': error_msg}
+                _record_table_result(progress, jobs[index][0], results[index])
     
-    logger.info(f"Layouts processados: {sync_service.processed_layouts}")
-    return results
\ No newline at end of file
+    processed_layouts = {result['processed_layout'] for result in results if result.get('processed_layout')}
+    logger.info(f"Layouts processados: {processed_layouts}")
+    return results
@@ -1,10 +1,17 @@
 import pandas as pd
 import re
 import logging
-from typing import List, Dict, Any
-from sqlalchemy import text
-from app.models.database import engine, SessionLocal
-from config import DATABASE_SCHEMA
+import itertools
+from typing import List, Dict, Any, Iterator, Optional, Union
+from app.models.database import engine
+from app.utils.encoding_utils import resolve_encoding, open_decoded
+from app.utils.file_utils import DataSource, source_size
+from app.services.record_batch import RecordBatch
+from app.services.compiled_layout import CompiledLayout, compile_layout
+from app.services.fixed_width_parser import ParseErrorReport, iter_fixed_width_blocks, parse_fixed_width_file
+from app.services.parallel_parser import iter_parallel_blocks
+from app.services.schema_cache import schema_cache
+from config import DATABASE_SCHEMA, PARSER_ENGINE, PARSER_BLOCK_LINES, PARALLEL_PARSE_MIN_BYTES
 
 logger = logging.getLogger("DataValidator")
 
@@ -47,16 +54,8 @@ def validate_database_schema(table_name: str, layout_columns: List[Dict[str, Any
             }
             return type_mapping.get(oracle_type, oracle_type.lower())
         
-        # Obtém colunas do banco de dados
-        with SessionLocal() as session:
-            query = text("""
-                SELECT column_name, data_type 
-                FROM information_schema.columns 
-                WHERE table_name = :table AND table_schema = :schema
-            """)
-            
-            result = session.execute(query, {'table': table_name, 'schema': DATABASE_SCHEMA})
-            db_columns = [(row.column_name, row.data_type) for row in result]
+        # Obtém colunas do banco de dados (cache de metadados)
+        db_columns = [(col['name'], col['data_type']) for col in schema_cache.get_columns(table_name, DATABASE_SCHEMA)]
         
         # Verificações de layout
         if len(layout_columns) != len(db_columns):
@@ -120,26 +119,15 @@ def validate_database_schema(table_name: str, layout_columns: List[Dict[str, Any
             }
             return type_mapping.get(oracle_type, oracle_type.lower())
         
-        with SessionLocal() as session:
-            query = text("""
-                SELECT column_name, data_type 
-                FROM information_schema.columns 
-                WHERE table_name = :table AND table_schema = :schema
-                ORDER BY ordinal_position
-            """)
-            
-            result = session.execute(query, {
-                'table': table_name, 
-                'schema': DATABASE_SCHEMA
-            })
-            db_columns = [(row.column_name, row.data_type) for row in result]
+        # Columns in ordinal order, from the shared metadata cache
+        db_columns = [(col['name'], col['data_type']) for col in schema_cache.get_columns(table_name, DATABASE_SCHEMA)]
         
         # More strict comparisons
         if len(layout_columns) != len(db_columns):
             logger.error(f"Column count mismatch for {table_name}. Layout: {len(layout_columns)}, Database: {len(db_columns)}")
             return False
         
-        for (layout_col, (db_col, db_type)), index in zip(layout_columns, db_columns):
+        for index, (layout_col, (db_col, db_type)) in enumerate(zip(layout_columns, db_columns)):
             # Ensure column names match exactly
             if layout_col['Coluna'].lower() != db_col.lower():
                 logger.error(f"Column name mismatch at position {index}. Layout: {layout_col['Coluna']}, Database: {db_col}")
@@ -157,162 +145,192 @@ def validate_database_schema(table_name: str, layout_columns: List[Dict[str, Any
         logger.error(f"Schema validation error for {table_name}: {str(e)}")
         return False
 
-def validate_fixed_width_data(data_file_path: str, layout_columns: List[Dict[str, Any]], encoding: str = None) -> bool:
+def validate_fixed_width_data(data_file_path: DataSource, layout_columns: List[Dict[str, Any]],
+                              encoding: Union[str, Dict[str, Any], None] = None,
+                              error_report: Optional[ParseErrorReport] = None) -> bool:
     """
     Valida o arquivo de dados de largura fixa.
     
+    Usa a mesma passada de parse_fixed_width_data com a política "strict";
+    para validar e converter de uma vez use iter_fixed_width_batches com
+    um ParseErrorReport.
+    
     Args:
-        data_file_path: Caminho do arquivo de dados
+        data_file_path: Caminho do arquivo de dados (ou membro de um ZIP)
         layout_columns: Informações do layout
-        encoding: Encoding do arquivo (opcional)
+        encoding: Encoding do arquivo (nome sugerido ou resultado de detect_file_encoding)
+        error_report: Relatório onde os erros por linha são registrados (opcional)
         
     Returns:
         Booleano indicando se os dados estão no formato correto
     """
-    # Lista de possíveis encodings para tentar
-    possible_encodings = [
-        encoding,  # Primeiro, tenta o encoding fornecido
-        'utf-8', 
-        'iso-8859-1', 
-        'windows-1252', 
-        'latin1'
-    ]
+    error_report = error_report if error_report is not None else ParseErrorReport()
+    try:
+        for _ in iter_fixed_width_batches(data_file_path, layout_columns, PARSER_BLOCK_LINES,
+                                          encoding=encoding, policy='strict', error_report=error_report):
+            pass
+    except Exception as e:
+        logger.error(f"Erro na validação dos dados: {str(e)}")
+        return False
     
-    # Remove None do início da lista
-    possible_encodings = [enc for enc in possible_encodings if enc is not None]
+    if error_report.total_errors:
+        logger.error(f"Arquivo {data_file_path} inválido: {error_report.total_errors} erros em {error_report.rejected_lines} linhas")
+        return False
+    return True
+
+def _iter_records_python(file, layout_columns: Union[CompiledLayout, List[Dict[str, Any]]], policy: str = 'lenient',
+                         error_report: Optional[ParseErrorReport] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Parser original linha a linha, mantido como referência e para comparação.
     
-    for current_encoding in possible_encodings:
-        try:
-            with open(data_file_path, 'r', encoding=current_encoding) as file:
-                for line_num, line in enumerate(file, 1):
-                    # Remove newline e verifica comprimento total
-                    line = line.rstrip('\n')
-                    total_expected_length = int(layout_columns[-1]['Fim'])
-                    
-                    if len(line) != total_expected_length:
-                        logger.error(f"Linha {line_num}: Comprimento incorreto. Esperado {total_expected_length}, encontrado {len(line)}")
-                        return False
-                    
-                    # Valida cada coluna
-                    for col in layout_columns:
-                        start = int(col['Inicio']) - 1
-                        end = int(col['Fim'])
-                        value = line[start:end]
-                        
-                        # Validações específicas por tipo
-                        if col['Tipo'] == 'NUMBER':
-                            try:
-                                float(value.strip())
-                            except ValueError:
-                                logger.error(f"Linha {line_num}, Coluna {col['Coluna']}: Valor não numérico")
-                                return False
+    Aplica as mesmas regras de validação e políticas de parse_lines_block.
+    """
+    error_report = error_report if error_report is not None else ParseErrorReport()
+    layout = compile_layout(layout_columns)
+    expected_length = layout.record_width
+    fields = list(zip(layout.names, layout.starts, layout.ends, layout.codecs))
+
+    for line_num, line in enumerate(file, 1):
+        line_errors = error_report.total_errors
+
+        # Remove quebras de linha e espaços extras
+        line = line.rstrip('\n')
+        
+        # Verifica se a linha tem o comprimento esperado
+        if len(line) != expected_length:
+            error_report.add(line_num, None, f"Comprimento incorreto. Esperado {expected_length}, encontrado {len(line)}")
+            # Preenche linhas curtas com espaços e trunca as longas
+            line = line.ljust(expected_length)[:expected_length]
+        
+        record = {}
+        for name, start, end, codec in fields:
+            # Fatias fora dos limites resultam em string vazia
+            value = line[start:end].strip()
             
-            # Se chegou até aqui, a validação com este encoding foi bem-sucedida
-            if current_encoding != encoding:
-                logger.info(f"Usando encoding: {current_encoding}")
-            return True
+            # Conversão de tipos consistente (números e datas vazios viram None)
+            converted, valid = codec.convert(value)
+            if not valid:
+                error_report.add(line_num, name, codec.error(value))
+            
+            record[name] = converted
         
-        except UnicodeDecodeError:
-            # Continua para o próximo encoding se houver erro de decodificação
+        if policy == 'strict' and error_report.total_errors > line_errors:
+            error_report.rejected_lines += 1
             continue
-        except Exception as e:
-            logger.error(f"Erro na validação dos dados: {str(e)}")
-            return False
-    
-    # Se nenhum encoding funcionou
-    logger.error("Não foi possível decodificar o arquivo com os encodings testados")
-    return False
+        yield record
 
-def parse_fixed_width_data(data_file_path: str, layout_columns: List[Dict[str, Any]], encoding: str = None) -> List[Dict[str, Any]]:
+def parse_fixed_width_data(data_file_path: DataSource, layout_columns: List[Dict[str, Any]],
+                           encoding: Union[str, Dict[str, Any], None] = None, engine: str = None,
+                           policy: str = 'lenient', error_report: Optional[ParseErrorReport] = None) -> List[Dict[str, Any]]:
     """
     Converte arquivo de largura fixa para lista de dicionários.
     
     Args:
-        data_file_path: Caminho do arquivo de dados
+        data_file_path: Caminho do arquivo de dados (ou membro de um ZIP)
         layout_columns: Informações do layout
-        encoding: Encoding do arquivo (opcional)
+        encoding: Encoding do arquivo (nome sugerido ou resultado de detect_file_encoding)
+        engine: "vectorized" (blocos NumPy) ou "python" (linha a linha); padrão em PARSER_ENGINE
+        policy: "lenient" (ajusta linhas/valores inválidos) ou "strict" (rejeita as linhas)
+        error_report: Relatório onde os erros por linha são registrados (opcional)
         
     Returns:
         Lista de dicionários com os registros
     """
-    # Lista de possíveis encodings para tentar
-    possible_encodings = [
-        encoding,  # Primeiro, tenta o encoding fornecido
-        'utf-8', 
-        'iso-8859-1', 
-        'windows-1252', 
-        'latin1'
-    ]
+    engine = engine or PARSER_ENGINE
+
+    try:
+        encoding_info = resolve_encoding(data_file_path, encoding)
+        if _use_parallel_parser(data_file_path, engine):
+            records = []
+            for batch in iter_parallel_blocks(data_file_path, layout_columns, encoding_info, PARSER_BLOCK_LINES, policy, error_report):
+                records.extend(batch.iter_records())
+        else:
+            with open_decoded(data_file_path, encoding_info) as file:
+                if engine == 'python':
+                    records = list(_iter_records_python(file, layout_columns, policy, error_report))
+                else:
+                    records = parse_fixed_width_file(file, layout_columns, PARSER_BLOCK_LINES, policy, error_report)
+        
+        logger.info(f"Arquivo lido com sucesso usando encoding: {encoding_info['encoding']}")
+        logger.info(f"Total de registros lidos: {len(records)}")
+        return records
     
-    # Remove None do início da lista
-    possible_encodings = [enc for enc in possible_encodings if enc is not None]
+    except Exception as e:
+        logger.error(f"Erro na interpretação dos dados de {data_file_path}: {str(e)}")
+        return []
+
+def _use_parallel_parser(data_file_path: DataSource, engine: str) -> bool:
+    """
+    Arquivos grandes em disco lidos pelo parser vetorizado são divididos entre vários processos.
+
+    Membros de ZIP são sempre lidos em sequência: o stream compactado não
+    permite posicionar a leitura no meio do arquivo sem descompactar o início.
+    """
+    return (engine != 'python' and isinstance(data_file_path, str)
+            and source_size(data_file_path) >= PARALLEL_PARSE_MIN_BYTES)
+
+def _rebatch(blocks: Iterator[RecordBatch], batch_size: int) -> Iterator[RecordBatch]:
+    """Reagrupa blocos de tamanho variável em lotes de exatamente batch_size registros (exceto o último)."""
+    pending = []
+    pending_rows = 0
+    for block in blocks:
+        pending.append(block)
+        pending_rows += len(block)
+        if pending_rows < batch_size:
+            continue
+        merged = RecordBatch.concat(pending)
+        start = 0
+        while len(merged) - start >= batch_size:
+            yield merged if (start == 0 and len(merged) == batch_size) else merged.slice(start, start + batch_size)
+            start += batch_size
+        pending = [merged.slice(start, len(merged))] if start < len(merged) else []
+        pending_rows = len(merged) - start
+    if pending_rows:
+        yield RecordBatch.concat(pending)
+
+def iter_fixed_width_batches(data_file_path: DataSource, layout_columns: List[Dict[str, Any]], batch_size: int,
+                             encoding: Union[str, Dict[str, Any], None] = None, engine: str = None,
+                             policy: str = 'lenient', error_report: Optional[ParseErrorReport] = None) -> Iterator[RecordBatch]:
+    """
+    Versão em streaming de parse_fixed_width_data: produz lotes colunares (RecordBatch).
     
-    successful_encoding = None
+    Apenas um lote fica em memória por vez, independente do tamanho do arquivo.
+    A validação acontece na mesma passada: os erros por linha vão para
+    error_report e, com a política "strict", as linhas inválidas são descartadas.
     
-    for current_encoding in possible_encodings:
-        try:
-            records = []
-            
-            with open(data_file_path, 'r', encoding=current_encoding) as file:
-                for line_num, line in enumerate(file, 1):
-                    # Remove quebras de linha e espaços extras
-                    line = line.rstrip('\n')
-                    
-                    # Verifica se a linha tem o comprimento esperado
-                    expected_length = int(layout_columns[-1]['Fim'])
-                    if len(line) != expected_length:
-                        logger.warning(f"Linha {line_num}: Comprimento incorreto. Esperado {expected_length}, encontrado {len(line)}")
-                        # Ajusta a linha se for muito curta (preenche com espaços)
-                        if len(line) < expected_length:
-                            line = line.ljust(expected_length)
-                        # Trunca se for muito longa
-                        if len(line) > expected_length:
-                            line = line[:expected_length]
-                    
-                    record = {}
-                    for col in layout_columns:
-                        start = int(col['Inicio']) - 1
-                        end = int(col['Fim'])
-                        
-                        # Garante que os índices estão dentro dos limites
-                        if start >= len(line):
-                            value = ''
-                        elif end > len(line):
-                            value = line[start:].strip()
-                        else:
-                            value = line[start:end].strip()
-                        
-                        # Conversão de tipos consistente
-                        if col['Tipo'].startswith('NUMBER'):
-                            # Trata valores vazios como None
-                            if not value:
-                                value = None
-                            else:
-                                try:
-                                    # Remove caracteres não numéricos
-                                    clean_value = re.sub(r'[^0-9.-]', '', value)
-                                    value = float(clean_value) if clean_value else None
-                                except ValueError:
-                                    logger.warning(f"Linha {line_num}, Coluna {col['Coluna']}: Valor não numérico '{value}', convertendo para None")
-                                    value = None
-                        
-                        record[col['Coluna']] = value
-                    
-                    records.append(record)
-            
-            # Se chegou até aqui, a leitura com este encoding foi bem-sucedida
-            successful_encoding = current_encoding
-            logger.info(f"Arquivo lido com sucesso usando encoding: {current_encoding}")
-            logger.info(f"Total de registros lidos: {len(records)}")
-            return records
+    Args:
+        data_file_path: Caminho do arquivo de dados (ou membro de um ZIP)
+        layout_columns: Informações do layout
+        batch_size: Quantidade de registros por lote
+        encoding: Encoding do arquivo (nome sugerido ou resultado de detect_file_encoding)
+        engine: "vectorized" (blocos NumPy) ou "python" (linha a linha); padrão em PARSER_ENGINE
+        policy: "lenient" (ajusta linhas/valores inválidos) ou "strict" (rejeita as linhas)
+        error_report: Relatório onde os erros por linha são registrados (opcional)
         
-        except UnicodeDecodeError:
-            # Continua para o próximo encoding se houver erro de decodificação
-            continue
-        except Exception as e:
-            logger.error(f"Erro na interpretação dos dados com encoding {current_encoding}: {str(e)}")
-            continue
+    Returns:
+        Iterador de RecordBatch com os registros
+    """
+    engine = engine or PARSER_ENGINE
+    encoding_info = resolve_encoding(data_file_path, encoding)
+    records_yielded = 0
+
+    if _use_parallel_parser(data_file_path, engine):
+        blocks = iter_parallel_blocks(data_file_path, layout_columns, encoding_info, batch_size, policy, error_report)
+        for batch in _rebatch(blocks, batch_size):
+            records_yielded += len(batch)
+            yield batch
+    else:
+        with open_decoded(data_file_path, encoding_info) as file:
+            if engine == 'python':
+                records = _iter_records_python(file, layout_columns, policy, error_report)
+                blocks = (RecordBatch.from_records(chunk) for chunk in iter(lambda: list(itertools.islice(records, batch_size)), []))
+            else:
+                # Blocos do parser do tamanho do lote: o reagrupamento vira apenas recortes
+                blocks = iter_fixed_width_blocks(file, layout_columns, batch_size, policy, error_report)
+            
+            for batch in _rebatch(blocks, batch_size):
+                records_yielded += len(batch)
+                yield batch
     
-    # Se nenhum encoding funcionou
-    logger.error("Não foi possível decodificar o arquivo com os encodings testados")
-    return []
\ No newline at end of file
+    logger.info(f"Arquivo lido com sucesso usando encoding: {encoding_info['encoding']}")
+    logger.info(f"Total de registros lidos: {records_yielded}")
@@ -0,0 +1,256 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.services.bulk_writer import bulk_insert
+from app.services.record_batch import RecordBatch
+from app.services.schema_cache import schema_cache
+from app.services.row_hash import SQL_NORMALIZE_FUNCTION, create_sql_functions, row_hash_sql
+from config import DATABASE_SCHEMA, SYNC_DIFF_ENGINE, SYNC_DIFF_ENGINE_TABLES, DB_DIFF_MIN_ROWS, SYNC_HASH_COLUMN
+
+logger = logging.getLogger("DatabaseDiff")
+
+ENGINES = ('python', 'vectorized', 'database', 'merge', 'auto')
+
+# Mesmas regras de DataSyncService._find_differences, em funções temporárias da sessão:
+# sem caracteres de controle, espaços colapsados, minúsculas, vazio igual a NULL e
+# números comparados como float com tolerância de 1e-7 (relativa acima de 1)
+_COMPARISON_FUNCTIONS = (
+    SQL_NORMALIZE_FUNCTION,
+    r"""
+    CREATE OR REPLACE FUNCTION pg_temp.sync_numbers_equal(a float8, b float8) RETURNS boolean
+    LANGUAGE sql IMMUTABLE AS $$
+        SELECT a = b OR (NOT (a = trunc(a) AND b = trunc(b)) AND CASE
+            WHEN greatest(abs(a), abs(b)) > 1 THEN abs(a - b) / greatest(abs(a), abs(b)) < 1e-7
+            ELSE abs(a - b) < 1e-7
+        END)
+    $$
+    """,
+    r"""
+    CREATE OR REPLACE FUNCTION pg_temp.sync_values_equal(a text, b text) RETURNS boolean
+    LANGUAGE plpgsql IMMUTABLE AS $$
+    DECLARE
+        na text;
+        nb text;
+    BEGIN
+        -- Caso mais comum: o texto já é idêntico
+        IF a IS NOT DISTINCT FROM b THEN
+            RETURN true;
+        END IF;
+        na := pg_temp.sync_normalize(a);
+        nb := pg_temp.sync_normalize(b);
+        IF na = '' AND nb = '' THEN
+            RETURN true;
+        END IF;
+        IF na ~ '^-?[0-9]+(\.[0-9]+)?$' AND nb ~ '^-?[0-9]+(\.[0-9]+)?$'
+                AND pg_temp.sync_numbers_equal(CAST(na AS float8), CAST(nb AS float8)) THEN
+            RETURN true;
+        END IF;
+        RETURN na = nb;
+    END
+    $$
+    """,
+)
+
+
+class DatabaseDiffUnavailable(Exception):
+    """A carga não pode ser comparada no banco (ex.: chaves repetidas no arquivo); use o modo Python."""
+
+
+def _table_engines() -> Dict[str, str]:
+    engines = {}
+    for item in SYNC_DIFF_ENGINE_TABLES.split(','):
+        if ':' in item:
+            table, engine = item.split(':', 1)
+            engines[table.strip().lower()] = engine.strip().lower()
+    return engines
+
+
+def _unavailable_reason(session: Session, table_name: str, primary_key: str) -> Optional[str]:
+    if session.get_bind().dialect.name != 'postgresql':
+        return "requer PostgreSQL"
+    constraint = schema_cache.get_primary_key(table_name, DATABASE_SCHEMA, bind=session.connection())
+    if [column.lower() for column in constraint] != [primary_key.lower()]:
+        # ON CONFLICT precisa de uma restrição única exatamente na chave usada na comparação
+        return f"chave primária da tabela ({', '.join(constraint) or 'nenhuma'}) difere de {primary_key}"
+    return None
+
+
+def estimate_table_rows(session: Session, table_name: str) -> int:
+    """Quantidade estimada de linhas pelas estatísticas do PostgreSQL (pg_class.reltuples)."""
+    rows = session.execute(
+        text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:name)"),
+        {'name': f"{DATABASE_SCHEMA}.{table_name}"}
+    ).scalar()
+    # -1 indica tabela ainda não analisada
+    return max(int(rows or 0), 0)
+
+
+def choose_diff_engine(session: Session, table_name: str, primary_key: str, engine: Optional[str] = None) -> str:
+    """
+    Decide onde a comparação arquivo x banco de uma tabela é feita.
+
+    A escolha vem do argumento, de SYNC_DIFF_ENGINE_TABLES ou de
+    SYNC_DIFF_ENGINE. O modo banco exige PostgreSQL e chave primária igual à
+    chave usada na sincronização; do contrário cai no Python. Em "auto",
+    tabelas do PostgreSQL com pelo menos DB_DIFF_MIN_ROWS linhas estimadas
+    são comparadas no banco ou, se ele não estiver disponível, por
+    intercalação ordenada ("merge").
+
+    Returns:
+        "python", "vectorized", "database" ou "merge"
+    """
+    engine = (engine or _table_engines().get(table_name.lower()) or SYNC_DIFF_ENGINE).lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Modo de comparação desconhecido: {engine}")
+    if engine in ('python', 'vectorized', 'merge'):
+        return engine
+
+    reason = _unavailable_reason(session, table_name, primary_key)
+    if engine == 'database':
+        if reason:
+            logger.warning(f"Comparação no banco indisponível para {table_name} ({reason}); usando Python")
+            return 'python'
+        return engine
+
+    # auto: o tamanho vem das estatísticas do PostgreSQL
+    if session.get_bind().dialect.name != 'postgresql':
+        return 'python'
+    rows = estimate_table_rows(session, table_name)
+    if rows < DB_DIFF_MIN_ROWS:
+        return 'python'
+    if reason:
+        logger.info(f"{table_name} tem cerca de {rows} linhas: comparação por intercalação ordenada ({reason})")
+        return 'merge'
+    logger.info(f"{table_name} tem cerca de {rows} linhas: comparação no banco")
+    return 'database'
+
+
+def _column_types(session: Session, table_name: str) -> Dict[str, str]:
+    """Tipo base (sem tamanho/precisão) de cada coluna, qualificado pelo esquema do tipo."""
+    result = session.execute(text(
+        "SELECT a.attname, quote_ident(n.nspname) || '.' || quote_ident(t.typname) "
+        "FROM pg_attribute a JOIN pg_type t ON t.oid = a.atttypid JOIN pg_namespace n ON n.oid = t.typnamespace "
+        "WHERE a.attrelid = to_regclass(:name) AND a.attnum > 0 AND NOT a.attisdropped"
+    ), {'name': f"{DATABASE_SCHEMA}.{table_name}"})
+    return {name.lower(): type_name for name, type_name in result}
+
+
+def _stored_hash(session: Session, table_name: str, compare_columns: List[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Coluna SYNC_HASH_COLUMN da tabela (se existir) e a expressão do hash das colunas comparadas.
+
+    É a mesma impressão digital gravada pelos modos python, vectorized e merge
+    (row_hash_sql é igual a row_hashes), então o hash segue válido quando a
+    tabela troca de modo entre cargas.
+    """
+    if not SYNC_HASH_COLUMN:
+        return None, None
+    columns = {col['name'].lower(): col for col in schema_cache.get_columns(table_name, DATABASE_SCHEMA, bind=session.connection())}
+    if SYNC_HASH_COLUMN.lower() not in columns:
+        return None, None
+    compare_columns = [name for name in compare_columns if name.lower() != SYNC_HASH_COLUMN.lower()]
+    create_sql_functions(session)
+    return SYNC_HASH_COLUMN, row_hash_sql([columns[name.lower()] for name in compare_columns])
+
+
+def sync_batches_in_database(session: Session, table_name: str, primary_key: str,
+                             batches: Iterable[RecordBatch]) -> Dict[str, int]:
+    """
+    Sincroniza os lotes do arquivo com a tabela deixando a comparação ao PostgreSQL.
+
+    Os lotes são copiados (COPY) para uma tabela temporária só de colunas texto
+    (tabelas temporárias não geram WAL) e aplicados com um único
+    INSERT ... ON CONFLICT (chave) DO UPDATE ... WHERE <alguma coluna mudou>.
+    Cada coluna alterada recebe o valor do arquivo e as demais ficam como estão,
+    como no modo Python; RETURNING (xmax = 0) separa inserções de atualizações.
+    Com SYNC_HASH_COLUMN na tabela, o hash das linhas inseridas e alteradas
+    é recalculado em seguida, para não ficar desatualizado para os outros modos.
+
+    A igualdade segue as regras de _find_differences, mas compara o valor do
+    arquivo já convertido para o tipo da coluna. Os resultados só divergem quando
+    a conversão muda o valor (ex.: mais casas decimais que a escala da coluna),
+    caso em que o modo Python acusa alteração a cada carga.
+
+    Nada é confirmado aqui. Chaves repetidas no arquivo levantam
+    DatabaseDiffUnavailable antes de qualquer escrita na tabela de destino.
+
+    Returns:
+        Dicionário com records_read, new_records, updated_records e unchanged_records
+    """
+    table = f"{DATABASE_SCHEMA}.{table_name}"
+    staging = f"sync_diff_{table_name}"
+    types = _column_types(session, table_name)
+    records_read = 0
+    column_names: List[str] = []
+
+    for batch in batches:
+        if not column_names:
+            column_names = list(batch.column_names)
+            columns = ", ".join(f"{name} text" for name in column_names)
+            session.execute(text(f"CREATE TEMPORARY TABLE {staging} ({columns})"))
+        bulk_insert(session, staging, batch, schema=None)
+        records_read += len(batch)
+    if not column_names:
+        return {'records_read': 0, 'new_records': 0, 'updated_records': 0, 'unchanged_records': 0}
+
+    key = next(name for name in column_names if name.lower() == primary_key.lower())
+    key_type = types[key.lower()]
+    keyed, distinct = session.execute(text(
+        f"SELECT count({key}), count(DISTINCT CAST({key} AS {key_type})) FROM {staging}"
+    )).one()
+    if keyed != distinct:
+        session.execute(text(f"DROP TABLE {staging}"))
+        raise DatabaseDiffUnavailable(f"{keyed - distinct} chaves repetidas no arquivo de {table_name}")
+    if keyed < records_read:
+        logger.warning(f"{records_read - keyed} registros sem valor para chave primária {primary_key} em {table_name}")
+
+    for statement in _COMPARISON_FUNCTIONS:
+        session.execute(text(statement))
+
+    others = [name for name in column_names if name != key]
+    equal = {
+        name: f"pg_temp.sync_values_equal(CAST(t.{name} AS text), CAST(excluded.{name} AS text))"
+        for name in others
+    }
+    if others:
+        set_clause = ", ".join(
+            f"{name} = CASE WHEN {equal[name]} THEN t.{name} ELSE excluded.{name} END" for name in others
+        )
+        conflict = f"DO UPDATE SET {set_clause} WHERE NOT ({' AND '.join(equal.values())})"
+    else:
+        conflict = "DO NOTHING"
+    # Conversão para o tipo base: tamanho e escala da coluna são aplicados na atribuição, como num INSERT comum
+    values = ", ".join(f"CAST(s.{name} AS {types[name.lower()]})" for name in column_names)
+
+    hash_column, hash_expression = _stored_hash(session, table_name, others)
+    changed = f"sync_hash_{table_name}"
+    record_changed = ""
+    if hash_column:
+        # Chaves inseridas/alteradas: o hash é recalculado depois, com os valores finais da linha
+        session.execute(text(f"CREATE TEMPORARY TABLE {changed} (sync_key {key_type})"))
+        record_changed = f", changed AS (INSERT INTO {changed} (sync_key) SELECT {key} FROM upsert) "
+
+    logger.info(f"Comparando {keyed} registros com {table} no banco")
+    inserted, updated = session.execute(text(
+        f"WITH upsert AS ("
+        f"INSERT INTO {table} AS t ({', '.join(column_names)}) "
+        f"SELECT {values} FROM {staging} AS s WHERE s.{key} IS NOT NULL "
+        f"ON CONFLICT ({key}) {conflict} "
+        f"RETURNING t.{key}, (xmax = 0) AS inserted"
+        f"){record_changed} SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upsert"
+    )).one()
+    session.execute(text(f"DROP TABLE {staging}"))
+    if hash_column:
+        session.execute(text(
+            f"UPDATE {table} AS t SET {hash_column} = {hash_expression} "
+            f"FROM {changed} AS c WHERE t.{key} = c.sync_key"
+        ))
+        session.execute(text(f"DROP TABLE {changed}"))
+
+    return {
+        'records_read': records_read,
+        'new_records': inserted,
+        'updated_records': updated,
+        'unchanged_records': keyed - inserted - updated
+    }
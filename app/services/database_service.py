@@ -1,40 +1,55 @@
 import logging
-from typing import List, Dict, Any
-from sqlalchemy import text
+from typing import List, Dict, Any, Optional, Union
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
 from app.models.database import SessionLocal
+from app.services.record_batch import RecordBatch
+from app.services.metrics import timed
+from app.services.bulk_writer import bulk_insert
 from app.utils.async_utils import batch_process
 import asyncio
 
 logger = logging.getLogger("DatabaseService")
 
-def insert_records_safely_sync(table_name: str, records: List[Dict[str, Any]]) -> bool:
+def insert_records_safely_sync(table_name: str, records: Union[RecordBatch, List[Dict[str, Any]]],
+                               session: Optional[Session] = None, strategy: Optional[str] = None) -> bool:
+    """
+    Insere registros na tabela com uma gravação em massa por lote.
+    
+    Args:
+        table_name: Nome da tabela.
+        records: Lote colunar (RecordBatch) ou lista de dicionários com os registros.
+        session: Sessão já aberta (opcional). Quando informada, a transação
+            fica a cargo de quem chamou: nada é confirmado nem desfeito aqui.
+        strategy: "copy", "executemany", "values" ou "auto" (padrão em BULK_INSERT_STRATEGY).
+        
+    Returns:
+        True se a operação for bem-sucedida, False caso contrário.
+    """
+    owns_session = session is None
+    db = SessionLocal() if owns_session else session
     try:
-        db = SessionLocal()
         logger.info(f"Iniciando inserção em {table_name} ({len(records)} registros)")
         
-        if not records:
+        if not len(records):
             logger.warning("Nenhum registro para inserir")
             return True
 
-        # Log das colunas
-        logger.info(f"Colunas detectadas: {list(records[0].keys())}")
-        
-        for record in records:
-            columns = ", ".join(record.keys())
-            values = ", ".join([f":{key}" for key in record.keys()])
-            query = text(f"INSERT INTO {table_name} ({columns}) VALUES ({values})")
-            db.execute(query, record)
+        with timed('insert', rows=len(records)):
+            bulk_insert(db, table_name, records, strategy)
         
-        db.commit()
+        if owns_session:
+            db.commit()
         logger.info(f"Inserção concluída em {table_name}")
         return True
     except SQLAlchemyError as e:
         logger.error(f"Erro em {table_name}: {str(e)}")
-        db.rollback()
+        if owns_session:
+            db.rollback()
         return False
     finally:
-        db.close()
+        if owns_session:
+            db.close()
 
 async def insert_records_safely(table_name: str, records: List[Dict[str, Any]]) -> bool:
     """
@@ -5,9 +5,7 @@ import logging
 import asyncio
 from werkzeug.utils import secure_filename
 from typing import Tuple, Optional, List, Dict, Any
-from sqlalchemy import text
-from app.models.database import SessionLocal
-from app.utils.file_utils import create_temp_dir, remove_temp_dir, is_valid_zip, get_file_name
+from app.utils.file_utils import create_temp_dir, remove_temp_dir, is_valid_zip, get_file_name, list_zip_members
 from app.services.data_validator import (
     parse_layout_file, 
     validate_database_schema, 
@@ -15,7 +13,11 @@ from app.services.data_validator import (
     parse_fixed_width_data
 )
 from app.services.database_service import insert_records_safely
-from config import DATABASE_SCHEMA
+from app.services.schema_cache import schema_cache
+from app.services.progress import JobProgress, NO_PROGRESS
+from app.services.metrics import StageTimings, metrics_registry, summarize_timings, timed
+from app.services.profiling import JOB_PROFILE, profiled
+from config import DATABASE_SCHEMA, ZIP_READ_MODE
 from app.services.data_sync_service import sync_data_for_matched_tables
 
 logger = logging.getLogger("FileProcessor")
@@ -28,15 +30,8 @@ def get_database_tables() -> List[str]:
         Lista de nomes de tabelas no esquema configurado.
     """
     try:
-        with SessionLocal() as session:
-            query = text("""
-                SELECT table_name 
-                FROM information_schema.tables 
-                WHERE table_schema = :schema
-            """)
-            
-            result = session.execute(query, {'schema': DATABASE_SCHEMA})
-            tables = [row.table_name for row in result]
+        # Metadados em cache (SCHEMA_CACHE_TTL), compartilhados entre uploads
+        tables = schema_cache.get_tables(DATABASE_SCHEMA)
         
         logger.info(f"Tabelas encontradas no banco de dados: {tables}")
         return tables
@@ -120,11 +115,62 @@ def extract_zip_file(zip_path: str) -> Dict[str, Any]:
             remove_temp_dir(temp_dir)
         return {'error': str(e)}
 
-def process_file_upload(zip_path: str) -> Dict[str, Any]:
+def match_zip_members(zip_path: str) -> Dict[str, Any]:
+    """
+    Identifica correspondências de tabelas pela lista de nomes do ZIP, sem extraí-lo.
+    
+    Os arquivos são lidos depois diretamente do arquivo compactado (ZipFile.open).
+    
+    Returns:
+        Dicionário com arquivos correspondidos e não correspondidos
+    """
     try:
-        extraction_result = extract_zip_file(zip_path)
+        if not is_valid_zip(zip_path):
+            logger.error(f"Arquivo ZIP inválido ou não encontrado: {zip_path}")
+            return {'error': 'Invalid ZIP file'}
+        
+        member_names = [member.name for member in list_zip_members(zip_path)]
+        
+        # Recupera tabelas do banco de dados
+        database_tables = get_database_tables()
+        
+        # Encontra correspondências
+        matches = match_files_to_tables(member_names, database_tables)
+        matches['archive_path'] = zip_path
+        
+        logger.info(f"Correspondências encontradas: {matches}")
+        return matches
+    
+    except Exception as e:
+        logger.error(f"Erro ao ler o arquivo ZIP: {str(e)}")
+        return {'error': str(e)}
+
+def process_file_upload(zip_path: str, progress: Optional[JobProgress] = None,
+                        profile_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Processa um ZIP enviado: identifica os pares dados/layout e sincroniza as tabelas.
+
+    O resultado traz em details.timings o tempo de cada etapa somado entre
+    as tabelas (o de cada tabela fica em synchronized_tables[].timings).
+
+    Args:
+        zip_path: Caminho do ZIP
+        progress: Eventos de progresso do job (opcional)
+        profile_id: Gera os perfis (cProfile) da leitura do ZIP e de cada tabela com este id (opcional)
+    """
+    progress = progress or NO_PROGRESS
+    job_timings = StageTimings()
+    try:
+        progress.emit('extract')
+        with profiled(profile_id, JOB_PROFILE), job_timings.activate(), timed('extract'):
+            if ZIP_READ_MODE == 'extract':
+                extraction_result = extract_zip_file(zip_path)
+            else:
+                extraction_result = match_zip_members(zip_path)
+        metrics_registry.record(None, job_timings.to_dict())
         if 'error' in extraction_result:
             return {"success": False, "message": extraction_result['error']}
+        progress.emit('extract', tables=sorted(extraction_result.get('matched_tables', {})))
 
         results = {
             "synchronized_tables": [],
@@ -135,7 +181,10 @@ def process_file_upload(zip_path: str) -> Dict[str, Any]:
         # Sincronização
         sync_results = sync_data_for_matched_tables(
             extraction_result.get('matched_tables', {}), 
-            extraction_result['temp_dir']
+            extraction_result.get('temp_dir'),
+            archive_path=extraction_result.get('archive_path'),
+            progress=progress,
+            profile_id=profile_id
         )
         results['synchronized_tables'] = sync_results
 
@@ -145,7 +194,14 @@ def process_file_upload(zip_path: str) -> Dict[str, Any]:
             if result.get('processed_layout')
         ))
 
-        remove_temp_dir(extraction_result['temp_dir'])
+        # Etapas somadas entre as tabelas (as tabelas sincronizam em paralelo: a soma pode passar do tempo total)
+        results['timings'] = {
+            **summarize_timings([job_timings.to_dict()] + [result.get('timings', {}) for result in sync_results]),
+            'total_seconds': job_timings.to_dict()['total_seconds']
+        }
+
+        if extraction_result.get('temp_dir'):
+            remove_temp_dir(extraction_result['temp_dir'])
         return {
             "success": all(result['status'] == 'success' for result in sync_results),
             "details": results
@@ -0,0 +1,186 @@
+import logging
+from typing import List, Dict, Any, Iterator, Optional, TextIO, Union
+import numpy as np
+from app.services.record_batch import RecordBatch
+from app.services.compiled_layout import CompiledLayout, compile_layout
+
+logger = logging.getLogger("FixedWidthParser")
+
+def iter_line_blocks(file: TextIO, block_lines: int, line_width: int = 0) -> Iterator[List[str]]:
+    """
+    Lê um arquivo texto em blocos de linhas, sem a quebra de linha final.
+
+    Args:
+        file: Arquivo aberto em modo texto
+        block_lines: Quantidade de linhas por bloco (o último pode ter menos)
+        line_width: Largura esperada de cada linha (usada para dimensionar a leitura)
+
+    Returns:
+        Iterador de listas de linhas
+    """
+    chunk_chars = max(block_lines * (line_width + 1), 1 << 16)
+    remainder = ''
+    pending = []
+    while True:
+        chunk = file.read(chunk_chars)
+        if not chunk:
+            break
+        lines = (remainder + chunk).split('\n')
+        # A última parte pode ser uma linha incompleta: fica para a próxima leitura
+        remainder = lines.pop()
+        pending.extend(lines)
+        while len(pending) >= block_lines:
+            yield pending[:block_lines]
+            del pending[:block_lines]
+    if remainder:
+        pending.append(remainder)
+    if pending:
+        yield pending
+
+
+class ParseErrorReport:
+    """
+    Relatório limitado dos erros encontrados por linha durante o parsing.
+
+    Guarda no máximo max_errors ocorrências detalhadas (linha, coluna, motivo),
+    mas conta todas.
+    """
+
+    def __init__(self, max_errors: int = 100, log_errors: bool = True):
+        self.max_errors = max_errors
+        self.log_errors = log_errors
+        self.errors = []
+        self.total_errors = 0
+        self.rejected_lines = 0
+
+    def add(self, line_num: int, column: Optional[str], reason: str):
+        self.total_errors += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line_num, 'column': column, 'reason': reason})
+            if self.log_errors:
+                logger.warning(f"Linha {line_num}{f', Coluna {column}' if column else ''}: {reason}")
+
+    def merge(self, other: Dict[str, Any], line_offset: int = 0):
+        """Incorpora o relatório (to_dict) de um trecho do arquivo, deslocando os números de linha."""
+        for error in other['errors']:
+            self.add(error['line'] + line_offset, error['column'], error['reason'])
+        self.total_errors += other['total_errors'] - len(other['errors'])
+        self.rejected_lines += other['rejected_lines']
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'total_errors': self.total_errors,
+            'rejected_lines': self.rejected_lines,
+            'truncated': self.total_errors > len(self.errors),
+            'errors': list(self.errors)
+        }
+
+
+def parse_lines_block(lines: List[str], layout_columns: Union[CompiledLayout, List[Dict[str, Any]]], first_line_num: int = 1,
+                      policy: str = 'lenient', error_report: Optional[ParseErrorReport] = None) -> RecordBatch:
+    """
+    Valida e converte um bloco de linhas de largura fixa em registros, coluna a coluna.
+
+    As linhas são carregadas num array NumPy de caracteres e cada coluna é
+    recortada para o bloco inteiro de uma só vez.
+
+    Com a política "lenient" linhas de tamanho incorreto são completadas ou
+    truncadas e valores inválidos (números, datas) viram None (após limpeza); com "strict"
+    as linhas com qualquer erro são rejeitadas. Em ambos os casos os erros vão
+    para error_report.
+
+    Args:
+        lines: Linhas do bloco (sem quebra de linha)
+        layout_columns: Informações do layout
+        first_line_num: Número da primeira linha do bloco no arquivo
+        policy: "lenient" ou "strict"
+        error_report: Relatório onde os erros são registrados (opcional)
+
+    Returns:
+        RecordBatch com os registros aceitos do bloco
+    """
+    layout = compile_layout(layout_columns)
+    column_names = layout.names
+    if not lines:
+        return RecordBatch(column_names, [np.empty(0, dtype=object) for _ in column_names])
+    error_report = error_report if error_report is not None else ParseErrorReport()
+    block_errors = []
+
+    expected_length = layout.record_width
+    for index, line in enumerate(lines):
+        if len(line) != expected_length:
+            block_errors.append((index, None, f"Comprimento incorreto. Esperado {expected_length}, encontrado {len(line)}"))
+            # Preenche linhas curtas com espaços e trunca as longas
+            lines[index] = line.ljust(expected_length)[:expected_length]
+
+    if expected_length > 0:
+        chars = np.array(lines, dtype=f'<U{expected_length}').view('<U1').reshape(len(lines), expected_length)
+
+    columns = []
+    for name, start, end, codec in zip(layout.names, layout.starts, layout.ends, layout.codecs):
+        end = min(end, expected_length)
+
+        if start >= expected_length or end <= start:
+            values = np.full(len(lines), '', dtype='<U1')
+        else:
+            values = np.ascontiguousarray(chars[:, start:end]).view(f'<U{end - start}').reshape(-1)
+            values = np.char.strip(values)
+
+        converted, invalid = codec.convert_block(values)
+        block_errors.extend((index, name, codec.error(values[index])) for index in invalid)
+        columns.append(converted)
+
+    rejected = set()
+    for index, column, reason in sorted(block_errors, key=lambda error: error[0]):
+        error_report.add(first_line_num + index, column, reason)
+        if policy == 'strict':
+            rejected.add(index)
+    error_report.rejected_lines += len(rejected)
+
+    batch = RecordBatch(column_names, columns)
+    if rejected:
+        batch = batch.take([index for index in range(len(lines)) if index not in rejected])
+    return batch
+
+
+def iter_fixed_width_blocks(file: TextIO, layout_columns: Union[CompiledLayout, List[Dict[str, Any]]], block_lines: int,
+                            policy: str = 'lenient', error_report: Optional[ParseErrorReport] = None) -> Iterator[RecordBatch]:
+    """
+    Interpreta um arquivo de largura fixa bloco a bloco.
+
+    Args:
+        file: Arquivo aberto em modo texto
+        layout_columns: Informações do layout
+        block_lines: Quantidade de linhas por bloco
+        policy: "lenient" ou "strict" (ver parse_lines_block)
+        error_report: Relatório onde os erros são registrados (opcional)
+
+    Returns:
+        Iterador de RecordBatch, um por bloco lido
+    """
+    layout = compile_layout(layout_columns)
+    line_num = 1
+    for lines in iter_line_blocks(file, block_lines, layout.record_width):
+        yield parse_lines_block(lines, layout, line_num, policy, error_report)
+        line_num += len(lines)
+
+
+def parse_fixed_width_file(file: TextIO, layout_columns: Union[CompiledLayout, List[Dict[str, Any]]], block_lines: int,
+                           policy: str = 'lenient', error_report: Optional[ParseErrorReport] = None) -> List[Dict[str, Any]]:
+    """
+    Interpreta um arquivo de largura fixa inteiro usando o parser por blocos.
+
+    Args:
+        file: Arquivo aberto em modo texto
+        layout_columns: Informações do layout
+        block_lines: Quantidade de linhas por bloco
+        policy: "lenient" ou "strict" (ver parse_lines_block)
+        error_report: Relatório onde os erros são registrados (opcional)
+
+    Returns:
+        Lista de dicionários com os registros
+    """
+    records = []
+    for block in iter_fixed_width_blocks(file, layout_columns, block_lines, policy, error_report):
+        records.extend(block.iter_records())
+    return records
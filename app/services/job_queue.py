@@ -0,0 +1,141 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from app.services.progress import JobProgress
+from app.services.profiling import remove_profiles
+from config import UPLOAD_WORKERS, JOB_RETENTION
+
+logger = logging.getLogger("JobQueue")
+
+# Estados de um job, na ordem em que acontecem
+JOB_STATES = ('queued', 'running', 'finished', 'failed')
+
+
+class Job:
+    """Um upload enfileirado: estado, horários, eventos de progresso e o resultado de process_file_upload."""
+
+    __slots__ = ('id', 'file_name', 'profile', 'state', 'result', 'submitted_at', 'started_at', 'finished_at',
+                 'progress')
+
+    def __init__(self, file_name: str, profile: bool = False):
+        self.id = uuid.uuid4().hex
+        self.file_name = file_name
+        self.profile = profile
+        self.state = 'queued'
+        self.result: Optional[Dict[str, Any]] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.progress = JobProgress(self.id)
+        self.progress.emit('queued')
+
+    @property
+    def done(self) -> bool:
+        return self.state in ('finished', 'failed')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'file_name': self.file_name,
+            'profile': self.profile,
+            'state': self.state,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'progress': self.progress.latest(),
+            'result': self.result
+        }
+
+
+class JobQueue:
+    """
+    Fila em memória dos uploads, atendida por um pool de threads.
+
+    submit devolve o id do job imediatamente; o processamento acontece em
+    até workers jobs simultâneos (os demais aguardam na fila do pool, em
+    ordem de envio). Jobs concluídos (e seus perfis) ficam disponíveis para
+    consulta por retention segundos. Os jobs não sobrevivem a um reinício
+    do processo.
+    """
+
+    def __init__(self, workers: int = UPLOAD_WORKERS, retention: float = JOB_RETENTION):
+        self.workers = max(workers, 1)
+        self.retention = retention
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Criado no primeiro envio, para não abrir threads ao só importar o módulo
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='upload')
+        return self._executor
+
+    def _purge(self):
+        limit = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < limit]
+        for job_id in expired:
+            if self._jobs.pop(job_id).profile:
+                remove_profiles(job_id)
+
+    def submit(self, process: Callable[..., Dict[str, Any]], zip_path: str, file_name: str,
+               profile: bool = False) -> Job:
+        """
+        Enfileira o processamento de um ZIP já salvo em disco.
+
+        Args:
+            process: Função que processa o ZIP e informa o progresso (ex.: process_file_upload)
+            zip_path: Caminho do ZIP; o arquivo é removido ao fim do job
+            file_name: Nome original do arquivo enviado
+            profile: Gera o perfil (cProfile) do job; process recebe o id do job em profile_id
+
+        Returns:
+            Job criado (estado "queued")
+        """
+        job = Job(file_name, profile)
+        with self._lock:
+            self._purge()
+            self._jobs[job.id] = job
+            self._pool().submit(self._run, job, process, zip_path)
+        logger.info(f"Job {job.id} enfileirado: {file_name}")
+        return job
+
+    def _run(self, job: Job, process: Callable[..., Dict[str, Any]], zip_path: str):
+        job.started_at = time.time()
+        job.state = 'running'
+        try:
+            if job.profile:
+                job.result = process(zip_path, job.progress, profile_id=job.id)
+            else:
+                job.result = process(zip_path, job.progress)
+            job.state = 'finished'
+        except Exception as e:
+            logger.error(f"Erro no job {job.id}: {str(e)}")
+            job.result = {"success": False, "message": f"Erro durante o processamento: {str(e)}"}
+            job.state = 'failed'
+        finally:
+            job.finished_at = time.time()
+            if os.path.exists(zip_path):
+                os.remove(zip_path)
+            job.progress.close(job.state)
+            logger.info(f"Job {job.id} concluído ({job.state}) em {job.finished_at - job.started_at:.1f}s")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        """Quantidade de jobs conhecidos por estado."""
+        with self._lock:
+            counts = {state: 0 for state in JOB_STATES}
+            for job in self._jobs.values():
+                counts[job.state] += 1
+            return counts
+
+
+# Fila compartilhada pelas rotas
+job_queue = JobQueue()
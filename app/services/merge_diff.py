@@ -0,0 +1,166 @@
+import os
+import heapq
+import pickle
+import logging
+import tempfile
+from operator import itemgetter
+from typing import List, Iterable, Iterator, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.services.record_batch import RecordBatch
+from app.services.row_hash import row_hashes
+from config import DATABASE_SCHEMA, SYNC_FETCH_SIZE, SYNC_MERGE_BUFFER_ROWS, SYNC_SPILL_DIR
+
+logger = logging.getLogger("MergeDiff")
+
+# Linhas gravadas por bloco nos arquivos de spill
+SPILL_CHUNK_ROWS = 10000
+
+KeyedRow = Tuple[str, Tuple]
+
+
+class MergeOrderError(Exception):
+    """As chaves do banco não vieram na mesma ordem usada na ordenação do arquivo."""
+
+
+def _write_run(rows: List[KeyedRow], directory: str) -> str:
+    fd, path = tempfile.mkstemp(suffix='.run', dir=directory)
+    with os.fdopen(fd, 'wb') as file:
+        for start in range(0, len(rows), SPILL_CHUNK_ROWS):
+            pickle.dump(rows[start:start + SPILL_CHUNK_ROWS], file, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _read_run(path: str) -> Iterator[KeyedRow]:
+    with open(path, 'rb') as file:
+        while True:
+            try:
+                chunk = pickle.load(file)
+            except EOFError:
+                return
+            yield from chunk
+
+
+class ExternalSort:
+    """
+    Ordenação externa das linhas do arquivo pela chave primária.
+
+    As linhas entram por lote; a cada buffer_rows linhas o buffer é ordenado e
+    gravado num arquivo temporário (spill). A leitura intercala os arquivos e o
+    que restou no buffer (heapq.merge), de modo que a memória fica limitada ao
+    buffer mais um bloco por arquivo.
+
+    Uso:
+        with ExternalSort() as sorter:
+            for batch in batches:
+                sorter.add_batch(batch, 'CO_PROCEDIMENTO')
+            for key, row in sorter:
+                ...
+    """
+
+    def __init__(self, buffer_rows: int = SYNC_MERGE_BUFFER_ROWS, spill_dir: Optional[str] = SYNC_SPILL_DIR):
+        self.buffer_rows = buffer_rows
+        self.spill_dir = spill_dir or None
+        self.buffer: List[KeyedRow] = []
+        self.runs: List[str] = []
+        self.skipped = 0
+        self._directory = None
+
+    def add_batch(self, batch: RecordBatch, primary_key: str, hash_columns: Optional[List[str]] = None):
+        """
+        Acrescenta as linhas de um lote; linhas sem chave são contadas em skipped.
+
+        Com hash_columns, cada linha leva no final o hash dessas colunas (ver row_hashes).
+        """
+        key_index = batch.column_index(primary_key)
+        rows = batch.iter_rows()
+        if hash_columns is not None:
+            rows = (row + (row_hash,) for row, row_hash in zip(rows, row_hashes(batch, hash_columns)))
+        for row in rows:
+            key = row[key_index] if key_index is not None else None
+            if key is None:
+                self.skipped += 1
+                continue
+            self.buffer.append((str(key).strip(), row))
+            if len(self.buffer) >= self.buffer_rows:
+                self._spill()
+
+    def _spill(self):
+        if self._directory is None:
+            self._directory = tempfile.TemporaryDirectory(prefix='sync_merge_', dir=self.spill_dir)
+        self.buffer.sort(key=itemgetter(0))
+        self.runs.append(_write_run(self.buffer, self._directory.name))
+        logger.info(f"{len(self.buffer)} linhas ordenadas gravadas em disco (arquivo {len(self.runs)})")
+        self.buffer = []
+
+    def __iter__(self) -> Iterator[KeyedRow]:
+        # sort é estável e heapq.merge preserva a ordem dos arquivos: chaves repetidas ficam na ordem do arquivo
+        self.buffer.sort(key=itemgetter(0))
+        if not self.runs:
+            return iter(self.buffer)
+        return heapq.merge(*[_read_run(path) for path in self.runs], self.buffer, key=itemgetter(0))
+
+    def close(self):
+        self.buffer = []
+        self.runs = []
+        if self._directory is not None:
+            self._directory.cleanup()
+            self._directory = None
+
+    def __enter__(self) -> 'ExternalSort':
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+
+def iter_table_by_key(session: Session, table_name: str, primary_key: str, column_names: List[str],
+                      hash_expression: Optional[str] = None) -> Iterator[KeyedRow]:
+    """
+    Lê a tabela ordenada pela chave, por um cursor do lado do servidor.
+
+    A ordenação é a do texto da chave sem espaços nas pontas, por bytes
+    (COLLATE "C" no PostgreSQL, BINARY no SQLite): é a mesma ordem das strings
+    Python usada em ExternalSort para chaves em UTF-8.
+
+    Returns:
+        Iterador de (chave normalizada, linha com as colunas na ordem de column_names
+        e, com hash_expression, o hash no final)
+    """
+    columns = list(column_names) + ([hash_expression] if hash_expression else [])
+    key_text = f"trim(CAST({primary_key} AS text))"
+    if session.get_bind().dialect.name == 'postgresql':
+        key_text += ' COLLATE "C"'
+    query = text(f"SELECT {', '.join(columns)} FROM {DATABASE_SCHEMA}.{table_name} "
+                 f"WHERE {primary_key} IS NOT NULL ORDER BY {key_text}")
+    key_index = [name.lower() for name in column_names].index(primary_key.lower())
+
+    result = session.execute(query, execution_options={'yield_per': SYNC_FETCH_SIZE})
+    try:
+        for rows in result.partitions(SYNC_FETCH_SIZE):
+            for row in rows:
+                key = str(row[key_index]).strip()
+                if key:
+                    yield key, tuple(row)
+    finally:
+        result.close()
+
+
+def merge_join(file_rows: Iterable[KeyedRow], db_rows: Iterable[KeyedRow]) -> Iterator[Tuple[str, Tuple, Optional[Tuple]]]:
+    """
+    Junta dois fluxos ordenados pela chave.
+
+    Returns:
+        Iterador de (chave, linha do arquivo, linha do banco ou None se a chave é nova),
+        na ordem das chaves; linhas do banco sem correspondente no arquivo são ignoradas
+    """
+    db_iter = iter(db_rows)
+    db_key, db_row = next(db_iter, (None, None))
+    previous_db_key = None
+    for key, row in file_rows:
+        while db_key is not None and db_key < key:
+            previous_db_key = db_key
+            db_key, db_row = next(db_iter, (None, None))
+            if db_key is not None and db_key < previous_db_key:
+                raise MergeOrderError(f"Chave '{db_key}' do banco fora de ordem (após '{previous_db_key}')")
+        yield key, row, db_row if db_key == key else None
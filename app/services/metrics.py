@@ -0,0 +1,274 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from config import METRICS_BUCKETS
+
+# Etapas medidas, na ordem do pipeline
+STAGES = ('extract', 'layout', 'parse', 'fetch_existing', 'diff', 'insert', 'update', 'commit', 'retry')
+
+_local = threading.local()
+
+
+class StageTimings:
+    """
+    Tempo, linhas e chamadas por etapa de uma tabela (ou do job), além de bytes lidos e idas ao banco.
+
+    O tempo de cada etapa é exclusivo: uma etapa iniciada dentro de outra
+    (ex.: a leitura de um lote durante a comparação) pausa a de fora, então
+    as etapas somam o tempo total sem contagem dupla. Cada instância é usada
+    por uma única thread (a que sincroniza a tabela).
+    """
+
+    def __init__(self, table: Optional[str] = None):
+        self.table = table
+        self.stages: Dict[str, List[float]] = {}
+        self.db_round_trips = 0
+        self.bytes_read = 0
+        self.started = time.perf_counter()
+        self._stack: List[Tuple[str, float]] = []
+
+    def _entry(self, stage: str) -> List[float]:
+        entry = self.stages.get(stage)
+        if entry is None:
+            # [segundos, linhas, chamadas]
+            entry = self.stages[stage] = [0.0, 0, 0]
+        return entry
+
+    def start(self, stage: str):
+        now = time.perf_counter()
+        if self._stack:
+            outer, since = self._stack[-1]
+            self._entry(outer)[0] += now - since
+        self._stack.append((stage, now))
+
+    def stop(self, rows: int = 0):
+        now = time.perf_counter()
+        stage, since = self._stack.pop()
+        entry = self._entry(stage)
+        entry[0] += now - since
+        entry[1] += rows
+        entry[2] += 1
+        if self._stack:
+            # A etapa de fora volta a contar a partir daqui
+            self._stack[-1] = (self._stack[-1][0], now)
+
+    def add_rows(self, stage: str, rows: int):
+        self._entry(stage)[1] += rows
+
+    def discard(self, stages: Iterable[str], into: str = 'retry'):
+        """
+        Move o tempo e as chamadas das etapas para into e zera as linhas e os bytes lidos.
+
+        Para trabalho descartado e refeito (ex.: o arquivo relido por outro
+        modo de comparação): as etapas passam a descrever só a nova passada e
+        o tempo perdido continua somando no total.
+        """
+        target = self._entry(into)
+        for stage in stages:
+            entry = self.stages.pop(stage, None)
+            if entry is not None:
+                target[0] += entry[0]
+                target[2] += entry[2]
+        self.bytes_read = 0
+
+    @contextmanager
+    def activate(self):
+        """Torna esta instância a da thread atual (usada por timed, timed_iter e pela contagem de idas ao banco)."""
+        previous = getattr(_local, 'timings', None)
+        _local.timings = self
+        try:
+            yield self
+        finally:
+            _local.timings = previous
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'total_seconds': round(time.perf_counter() - self.started, 3),
+            'stages': {
+                stage: {'seconds': round(seconds, 3), 'rows': int(rows), 'calls': int(calls)}
+                for stage, (seconds, rows, calls) in self.stages.items()
+            },
+            'bytes_read': self.bytes_read,
+            'db_round_trips': self.db_round_trips
+        }
+
+
+def current_timings() -> Optional[StageTimings]:
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def timed(stage: str, rows: int = 0):
+    """Mede um trecho como a etapa stage da tabela ativa na thread (sem tabela ativa, não mede)."""
+    timings = current_timings()
+    if timings is None:
+        yield
+        return
+    timings.start(stage)
+    try:
+        yield
+    finally:
+        timings.stop(rows)
+
+
+def timed_iter(stage: str, items: Iterable[Any]) -> Iterator[Any]:
+    """Repassa os itens medindo, como a etapa stage, o tempo gasto para produzir cada um (e as linhas, via len)."""
+    timings = current_timings()
+    if timings is None:
+        yield from items
+        return
+    iterator = iter(items)
+    while True:
+        timings.start(stage)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            timings.stop()
+            return
+        except BaseException:
+            timings.stop()
+            raise
+        timings.stop(len(item))
+        yield item
+
+
+def discard_stages(stages: Iterable[str], into: str = 'retry'):
+    timings = current_timings()
+    if timings is not None:
+        timings.discard(stages, into)
+
+
+def count_rows(stage: str, rows: int):
+    timings = current_timings()
+    if timings is not None:
+        timings.add_rows(stage, rows)
+
+
+def add_bytes_read(count: int):
+    timings = current_timings()
+    if timings is not None:
+        timings.bytes_read += count
+
+
+def count_round_trips(count: int = 1):
+    """Idas ao banco fora de cursor.execute (COPY, leituras do cursor do lado do servidor)."""
+    timings = current_timings()
+    if timings is not None:
+        timings.db_round_trips += count
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_execute(conn, cursor, statement, parameters, context, executemany):
+    count_round_trips()
+
+
+def summarize_timings(timings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Soma etapas, bytes e idas ao banco de vários to_dict (ex.: as tabelas de um upload)."""
+    stages: Dict[str, Dict[str, float]] = {}
+    for item in timings:
+        for stage, values in item.get('stages', {}).items():
+            total = stages.setdefault(stage, {'seconds': 0.0, 'rows': 0, 'calls': 0})
+            for key in total:
+                total[key] += values[key]
+    return {
+        'stages': {stage: {**values, 'seconds': round(values['seconds'], 3)}
+                   for stage, values in sorted(stages.items(), key=lambda item: _stage_order(item[0]))},
+        'bytes_read': sum(item.get('bytes_read', 0) for item in timings),
+        'db_round_trips': sum(item.get('db_round_trips', 0) for item in timings)
+    }
+
+
+def _stage_order(stage: str) -> int:
+    return STAGES.index(stage) if stage in STAGES else len(STAGES)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """
+    Métricas acumuladas do processo no formato texto do Prometheus.
+
+    Cada sincronização de tabela registra uma observação por etapa no
+    histograma de duração e soma linhas, bytes lidos e idas ao banco nos
+    contadores, rotulados por tabela.
+    """
+
+    def __init__(self, buckets: Iterable[float] = METRICS_BUCKETS):
+        self.buckets = sorted(buckets)
+        self._lock = threading.Lock()
+        # (etapa, tabela) -> [contagem por faixa..., soma, contagem]
+        self._durations: Dict[Tuple[str, str], List[float]] = {}
+        self._rows: Dict[Tuple[str, str], int] = {}
+        self._bytes: Dict[str, int] = {}
+        self._round_trips: Dict[str, int] = {}
+        self._syncs: Dict[Tuple[str, str], int] = {}
+
+    def record(self, table: Optional[str], timings: Dict[str, Any], status: Optional[str] = None):
+        """Registra o to_dict de uma tabela (ou do job, com table None)."""
+        table = table or ''
+        with self._lock:
+            for stage, values in timings.get('stages', {}).items():
+                histogram = self._durations.setdefault((stage, table), [0] * len(self.buckets) + [0.0, 0])
+                for index, bound in enumerate(self.buckets):
+                    if values['seconds'] <= bound:
+                        histogram[index] += 1
+                histogram[-2] += values['seconds']
+                histogram[-1] += 1
+                self._rows[(stage, table)] = self._rows.get((stage, table), 0) + values['rows']
+            self._bytes[table] = self._bytes.get(table, 0) + timings.get('bytes_read', 0)
+            self._round_trips[table] = self._round_trips.get(table, 0) + timings.get('db_round_trips', 0)
+            if status:
+                self._syncs[(table, status)] = self._syncs.get((table, status), 0) + 1
+
+    def render(self, gauges: Optional[Dict[str, Dict[str, float]]] = None) -> str:
+        """
+        Texto de exposição (text/plain; version=0.0.4).
+
+        Args:
+            gauges: Métricas instantâneas extras: nome -> {valor do rótulo "state": valor}
+        """
+        lines = []
+        with self._lock:
+            lines += ['# HELP datainjector_stage_duration_seconds Tempo por etapa em cada sincronização de tabela',
+                      '# TYPE datainjector_stage_duration_seconds histogram']
+            for (stage, table), histogram in sorted(self._durations.items()):
+                labels = f'stage="{_escape(stage)}",table="{_escape(table)}"'
+                for bound, count in zip(self.buckets, histogram):
+                    lines.append(f'datainjector_stage_duration_seconds_bucket{{{labels},le="{bound:g}"}} {count}')
+                lines.append(f'datainjector_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram[-1]}')
+                lines.append(f'datainjector_stage_duration_seconds_sum{{{labels}}} {histogram[-2]:.6f}')
+                lines.append(f'datainjector_stage_duration_seconds_count{{{labels}}} {histogram[-1]}')
+
+            lines += ['# HELP datainjector_stage_rows_total Linhas processadas por etapa',
+                      '# TYPE datainjector_stage_rows_total counter']
+            lines += [f'datainjector_stage_rows_total{{stage="{_escape(stage)}",table="{_escape(table)}"}} {rows}'
+                      for (stage, table), rows in sorted(self._rows.items())]
+
+            lines += ['# HELP datainjector_bytes_read_total Bytes de arquivos de dados lidos',
+                      '# TYPE datainjector_bytes_read_total counter']
+            lines += [f'datainjector_bytes_read_total{{table="{_escape(table)}"}} {count}'
+                      for table, count in sorted(self._bytes.items())]
+
+            lines += ['# HELP datainjector_db_round_trips_total Comandos enviados ao banco (execute, COPY, leituras do cursor)',
+                      '# TYPE datainjector_db_round_trips_total counter']
+            lines += [f'datainjector_db_round_trips_total{{table="{_escape(table)}"}} {count}'
+                      for table, count in sorted(self._round_trips.items())]
+
+            lines += ['# HELP datainjector_table_syncs_total Sincronizações de tabela por resultado',
+                      '# TYPE datainjector_table_syncs_total counter']
+            lines += [f'datainjector_table_syncs_total{{table="{_escape(table)}",status="{_escape(status)}"}} {count}'
+                      for (table, status), count in sorted(self._syncs.items())]
+
+        for name, values in (gauges or {}).items():
+            lines += [f'# TYPE {name} gauge']
+            lines += [f'{name}{{state="{_escape(state)}"}} {value}' for state, value in values.items()]
+        return '\n'.join(lines) + '\n'
+
+
+# Métricas do processo, expostas em /metrics
+metrics_registry = MetricsRegistry()
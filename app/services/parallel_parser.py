@@ -0,0 +1,189 @@
+import os
+import logging
+import itertools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
+from app.utils.encoding_utils import DecodedReader
+from app.services.record_batch import RecordBatch
+from app.services.compiled_layout import CompiledLayout, compile_layout
+from app.services.fixed_width_parser import ParseErrorReport, parse_lines_block
+from config import PARSER_WORKERS
+
+logger = logging.getLogger("ParallelParser")
+
+# Tamanho mínimo de cada trecho enviado a um processo
+MIN_RANGE_BYTES = 1 << 20
+
+
+class _ByteRange:
+    """Arquivo binário limitado a um trecho [início, fim) do arquivo original."""
+
+    def __init__(self, file, start: int, end: int):
+        self._file = file
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b''
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+def plan_byte_ranges(data_file_path: str, range_bytes: int) -> Iterator[Tuple[int, int]]:
+    """
+    Divide o arquivo em trechos de aproximadamente range_bytes bytes.
+
+    Cada trecho termina logo após uma quebra de linha (b'\\n'), que não aparece
+    dentro de caracteres multibyte em UTF-8 nem em ISO-8859-1; assim nenhum
+    registro nem caractere fica dividido entre dois trechos.
+
+    Args:
+        data_file_path: Caminho do arquivo de dados
+        range_bytes: Tamanho aproximado de cada trecho
+
+    Returns:
+        Iterador de tuplas (início, fim) em bytes
+    """
+    size = os.path.getsize(data_file_path)
+    with open(data_file_path, 'rb') as file:
+        start = 0
+        while start < size:
+            end = start + range_bytes
+            if end >= size:
+                end = size
+            else:
+                # Avança até o fim da linha em que o corte caiu
+                file.seek(end - 1)
+                file.readline()
+                end = min(file.tell(), size)
+            yield start, end
+            start = end
+
+
+def parse_byte_range(data_file_path: str, start: int, end: int, layout_columns: CompiledLayout,
+                     encoding_info: Dict[str, Any], policy: str = 'lenient', max_errors: int = 100) -> Dict[str, Any]:
+    """
+    Interpreta um trecho do arquivo (executado nos processos do pool).
+
+    Os números de linha do relatório de erros são relativos ao trecho; quem
+    junta os resultados aplica o deslocamento.
+
+    Returns:
+        Dicionário com o lote ('batch'), a quantidade de linhas ('lines'), o
+        relatório de erros ('errors'), se o trecho era ASCII puro ('ascii') e
+        o encoding efetivamente usado ('encoding_info')
+    """
+    info = dict(encoding_info)
+    report = ParseErrorReport(max_errors, log_errors=False)
+    reader = DecodedReader(_ByteRange(open(data_file_path, 'rb'), start, end), info, offset=start)
+    with reader:
+        text = ''.join(iter(partial(reader.read, 1 << 20), ''))
+
+    lines = text.split('\n')
+    # Mesma regra de iter_line_blocks: a quebra final não gera linha vazia
+    if lines[-1] == '':
+        lines.pop()
+    batch = parse_lines_block(lines, layout_columns, 1, policy, report)
+    return {
+        'batch': batch,
+        'lines': len(lines),
+        'errors': report.to_dict(),
+        'ascii': reader.ascii_so_far,
+        'encoding_info': info
+    }
+
+
+def _consistent_with_serial(result: Dict[str, Any], encoding_info: Dict[str, Any], ascii_so_far: bool) -> bool:
+    """
+    Indica se o trecho foi decodificado como a leitura sequencial o faria.
+
+    Cada processo começa seu trecho com o encoding detectado no prefixo. Isso só
+    diverge da leitura sequencial quando o encoding era trocável (prefixo ASCII)
+    e um trecho anterior já definiu o resultado: trechos ASCII decodificam igual
+    em qualquer caso; os demais precisam ter chegado ao mesmo encoding.
+    """
+    if result['ascii']:
+        return True
+    if encoding_info.get('switchable') and ascii_so_far:
+        return True
+    return result['encoding_info']['encoding'] == encoding_info['encoding']
+
+
+def iter_parallel_blocks(data_file_path: str, layout_columns: Union[CompiledLayout, List[Dict[str, Any]]],
+                         encoding_info: Dict[str, Any], block_lines: int, policy: str = 'lenient',
+                         error_report: Optional[ParseErrorReport] = None, workers: int = 0) -> Iterator[RecordBatch]:
+    """
+    Interpreta um arquivo de largura fixa em vários processos, por trechos de bytes.
+
+    Os trechos são processados fora de ordem, mas os lotes são produzidos na
+    ordem das linhas do arquivo, com no máximo 2 * workers trechos em andamento
+    (memória limitada, como na leitura sequencial). Números de linha dos erros
+    e a decisão de encoding (encoding_info) ficam iguais aos da leitura
+    sequencial.
+
+    Args:
+        data_file_path: Caminho do arquivo de dados
+        layout_columns: Informações do layout
+        encoding_info: Resultado de detect_file_encoding (atualizado se o encoding mudar)
+        block_lines: Quantidade aproximada de linhas por trecho
+        policy: "lenient" ou "strict" (ver parse_lines_block)
+        error_report: Relatório onde os erros são registrados (opcional)
+        workers: Quantidade de processos (padrão em PARSER_WORKERS ou CPUs disponíveis)
+
+    Returns:
+        Iterador de RecordBatch na ordem do arquivo
+    """
+    layout = compile_layout(layout_columns)
+    error_report = error_report if error_report is not None else ParseErrorReport()
+    workers = workers or PARSER_WORKERS or os.cpu_count() or 1
+    range_bytes = max(block_lines * (layout.record_width + 1), MIN_RANGE_BYTES)
+    ranges = plan_byte_ranges(data_file_path, range_bytes)
+    # Cópia do encoding inicial: é o que todos os processos recebem
+    initial_info = dict(encoding_info)
+    logger.info(f"Parsing paralelo de {data_file_path} com {workers} processos (trechos de {range_bytes} bytes)")
+
+    # "spawn" evita herdar threads e conexões do processo do servidor
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        def submit(byte_range):
+            return byte_range, executor.submit(parse_byte_range, data_file_path, *byte_range,
+                                               layout, initial_info, policy, error_report.max_errors)
+
+        pending = deque(submit(byte_range) for byte_range in itertools.islice(ranges, 2 * workers))
+        line_offset = 0
+        ascii_so_far = True
+        while pending:
+            byte_range, future = pending.popleft()
+            result = future.result()
+            next_range = next(ranges, None)
+            if next_range is not None:
+                pending.append(submit(next_range))
+
+            if not _consistent_with_serial(result, encoding_info, ascii_so_far):
+                # Raro: prefixo ASCII com conteúdo misto; refaz o trecho com o encoding já decidido
+                logger.info(f"Trecho {byte_range} relido com {encoding_info['encoding']}")
+                result = parse_byte_range(data_file_path, *byte_range, layout,
+                                          dict(encoding_info, switchable=False), policy, error_report.max_errors)
+
+            range_info = result['encoding_info']
+            if not result['ascii'] and range_info['encoding'] != encoding_info['encoding']:
+                encoding_info.update(encoding=range_info['encoding'], switchable=False, reason=range_info['reason'])
+            if 'invalid_bytes_at' in range_info:
+                encoding_info.setdefault('invalid_bytes_at', range_info['invalid_bytes_at'])
+            ascii_so_far = ascii_so_far and result['ascii']
+
+            error_report.merge(result['errors'], line_offset)
+            line_offset += result['lines']
+            yield result['batch']
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,116 @@
+import os
+import re
+import shutil
+import pstats
+import logging
+import cProfile
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+from config import PROFILE_DIR, PROFILE_TOP
+
+logger = logging.getLogger("Profiling")
+
+# Nome do perfil das etapas do job fora das tabelas (leitura do ZIP, correspondência de arquivos)
+JOB_PROFILE = '_job'
+
+# Ordenações aceitas no resumo (chaves de pstats.Stats.sort_stats)
+SORT_KEYS = ('cumulative', 'tottime', 'calls')
+
+_SAFE_NAME = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+def profile_dir(profile_id: str) -> str:
+    """Diretório dos perfis de um job (PROFILE_DIR ou o diretório temporário do sistema)."""
+    base = PROFILE_DIR or os.path.join(tempfile.gettempdir(), 'data-injector-profiles')
+    return os.path.join(base, _SAFE_NAME.sub('_', profile_id))
+
+
+def profile_path(profile_id: str, name: str) -> str:
+    return os.path.join(profile_dir(profile_id), f"{_SAFE_NAME.sub('_', name)}.prof")
+
+
+@contextmanager
+def profiled(profile_id: Optional[str], name: str):
+    """
+    Executa o trecho sob cProfile e grava o perfil em profile_path(profile_id, name).
+
+    Até o Python 3.11 o cProfile mede só a thread atual; a partir do 3.12
+    mede o processo inteiro e só um perfil fica ativo por vez (os trechos que
+    começam com outro em andamento seguem sem perfil). Por isso as tabelas de
+    um job com perfil rodam cada uma num processo do pool
+    (sync_data_for_matched_tables); o perfil JOB_PROFILE, na thread do
+    upload, pode incluir o trabalho de outros uploads simultâneos. Sem
+    profile_id, não mede.
+    """
+    if not profile_id:
+        yield
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        logger.warning(f"Perfil de {name} não gerado: {str(e)}")
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path = profile_path(profile_id, name)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            profiler.dump_stats(path)
+            logger.info(f"Perfil de {name} gravado em {path}")
+        except OSError as e:
+            logger.error(f"Erro ao gravar o perfil de {name}: {str(e)}")
+
+
+def list_profiles(profile_id: str) -> List[str]:
+    """Nomes dos perfis gravados de um job (tabelas e JOB_PROFILE)."""
+    directory = profile_dir(profile_id)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name[:-len('.prof')] for name in os.listdir(directory) if name.endswith('.prof'))
+
+
+def profile_summary(profile_id: str, limit: int = PROFILE_TOP, sort: str = 'cumulative') -> Dict[str, Any]:
+    """
+    Funções mais custosas de cada perfil de um job.
+
+    Args:
+        profile_id: Id do job
+        limit: Funções por perfil
+        sort: "cumulative" (tempo incluindo as chamadas internas), "tottime" (só a própria função) ou "calls"
+
+    Returns:
+        Dicionário nome do perfil -> {'total_seconds', 'total_calls', 'functions': [...]}
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Ordenação desconhecida: {sort}")
+    summary = {}
+    for name in list_profiles(profile_id):
+        stats = pstats.Stats(profile_path(profile_id, name))
+        stats.sort_stats(sort)
+        functions = []
+        for function in stats.fcn_list[:limit]:
+            primitive_calls, calls, total_time, cumulative_time, _ = stats.stats[function]
+            filename, line, function_name = function
+            functions.append({
+                'function': function_name,
+                'location': f"{filename}:{line}",
+                'calls': calls,
+                'primitive_calls': primitive_calls,
+                'total_seconds': round(total_time, 6),
+                'cumulative_seconds': round(cumulative_time, 6)
+            })
+        summary[name] = {
+            'total_seconds': round(stats.total_tt, 6),
+            'total_calls': stats.total_calls,
+            'functions': functions
+        }
+    return summary
+
+
+def remove_profiles(profile_id: str):
+    shutil.rmtree(profile_dir(profile_id), ignore_errors=True)
@@ -0,0 +1,118 @@
+import time
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from config import PROGRESS_EVENT_BUFFER
+
+# Etapas de um job, na ordem em que acontecem (as de tabela se repetem para cada tabela)
+STAGES = ('queued', 'extract', 'layout', 'sync', 'finalize', 'table_done', 'finished', 'failed')
+
+
+class _TableClock:
+    __slots__ = ('started', 'total_rows')
+
+    def __init__(self, total_rows: Optional[int]):
+        self.started = time.monotonic()
+        self.total_rows = total_rows
+
+
+class JobProgress:
+    """
+    Eventos de progresso de um job (etapa, tabela, linhas, linhas/s e tempo restante estimado).
+
+    Os eventos recebem um número sequencial e os últimos PROGRESS_EVENT_BUFFER
+    ficam guardados, para quem se conectar depois (ou reconectar com
+    Last-Event-ID) receber o que perdeu. Seguro para uso entre threads: as
+    tabelas de um job são sincronizadas em paralelo.
+    """
+
+    def __init__(self, job_id: Optional[str] = None, buffer_size: int = PROGRESS_EVENT_BUFFER):
+        self.job_id = job_id
+        self.closed = False
+        self._events: deque = deque(maxlen=buffer_size)
+        self._sequence = 0
+        self._tables: Dict[str, _TableClock] = {}
+        self._condition = threading.Condition()
+
+    def start_table(self, table: str, total_rows: Optional[int] = None):
+        """Marca o início de uma tabela; total_rows (estimado) permite calcular o tempo restante."""
+        with self._condition:
+            self._tables[table] = _TableClock(total_rows)
+        self.emit('layout', table, rows=0)
+
+    def emit(self, stage: str, table: Optional[str] = None, rows: Optional[int] = None, **details: Any):
+        """
+        Registra um evento e acorda quem aguarda em wait_events.
+
+        Para uma tabela iniciada com start_table, rows gera também a vazão
+        desde o início da tabela (rows_per_second) e, com o total estimado, o
+        tempo restante (eta_seconds).
+        """
+        event: Dict[str, Any] = {'stage': stage, 'table': table, 'rows': rows, 'time': time.time()}
+        with self._condition:
+            clock = self._tables.get(table) if table else None
+            if clock is not None:
+                elapsed = time.monotonic() - clock.started
+                event['elapsed_seconds'] = round(elapsed, 3)
+                event['total_rows'] = clock.total_rows
+                if rows and elapsed > 0:
+                    rate = rows / elapsed
+                    event['rows_per_second'] = round(rate, 1)
+                    if clock.total_rows and stage == 'sync':
+                        event['eta_seconds'] = round(max(clock.total_rows - rows, 0) / rate, 1)
+            event.update(details)
+            self._sequence += 1
+            event['seq'] = self._sequence
+            self._events.append(event)
+            self._condition.notify_all()
+
+    def track_batches(self, table: str, batches: Iterable[Any]) -> Iterator[Any]:
+        """Repassa os lotes de uma tabela emitindo um evento "sync" com as linhas lidas até cada um."""
+        rows = 0
+        for batch in batches:
+            rows += len(batch)
+            self.emit('sync', table, rows=rows)
+            yield batch
+        self.emit('finalize', table, rows=rows)
+
+    def close(self, stage: str = 'finished', **details: Any):
+        """Último evento do job; quem aguarda em wait_events é liberado."""
+        self.emit(stage, **details)
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    def events_after(self, sequence: int) -> List[Dict[str, Any]]:
+        with self._condition:
+            return [event for event in self._events if event['seq'] > sequence]
+
+    def wait_events(self, sequence: int, timeout: float) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Eventos posteriores a sequence, aguardando até timeout segundos se ainda não houver nenhum.
+
+        Returns:
+            Tupla (eventos, job encerrado)
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.closed or self._sequence > sequence, timeout)
+            return [event for event in self._events if event['seq'] > sequence], self.closed
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        with self._condition:
+            return self._events[-1] if self._events else None
+
+
+class _NoProgress(JobProgress):
+    """Progresso descartado (chamadas fora de um job)."""
+
+    def start_table(self, table: str, total_rows: Optional[int] = None):
+        pass
+
+    def emit(self, stage: str, table: Optional[str] = None, rows: Optional[int] = None, **details: Any):
+        pass
+
+    def track_batches(self, table: str, batches: Iterable[Any]) -> Iterator[Any]:
+        return iter(batches)
+
+
+NO_PROGRESS = _NoProgress(buffer_size=1)
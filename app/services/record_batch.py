@@ -0,0 +1,334 @@
+import logging
+from decimal import Decimal
+from typing import List, Dict, Any, Iterator, Iterable, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger("RecordBatch")
+
+# Acima desta proporção de valores distintos a codificação por dicionário não compensa
+DICTIONARY_MAX_RATIO = 0.5
+
+# Dígitos significativos (parte inteira + casas decimais) que cabem num int64 sem estouro
+INT64_DIGITS = 18
+
+
+class NumericColumn:
+    """Coluna numérica: valores contíguos (float64 ou int64) e máscara de nulos."""
+
+    __slots__ = ('values', 'valid')
+
+    def __init__(self, values: np.ndarray, valid: np.ndarray):
+        self.values = values
+        self.valid = valid
+
+    @classmethod
+    def from_list(cls, values: Sequence[Optional[float]]) -> 'NumericColumn':
+        valid = np.fromiter((value is not None for value in values), dtype=bool, count=len(values))
+        data = np.fromiter((value if value is not None else 0.0 for value in values), dtype=np.float64, count=len(values))
+        return cls(data, valid)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, index: int):
+        return self.values[index].item() if self.valid[index] else None
+
+    def tolist(self) -> List[Optional[float]]:
+        values = self.values.tolist()
+        if not self.valid.all():
+            for index in np.flatnonzero(~self.valid).tolist():
+                values[index] = None
+        return values
+
+    def take(self, indices: np.ndarray) -> 'NumericColumn':
+        return NumericColumn(self.values[indices], self.valid[indices])
+
+    @staticmethod
+    def concat(columns: List['NumericColumn']) -> 'NumericColumn':
+        return NumericColumn(np.concatenate([c.values for c in columns]), np.concatenate([c.valid for c in columns]))
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.valid.nbytes
+
+
+class DecimalColumn(NumericColumn):
+    """
+    Coluna decimal exata: inteiros int64 sem escala (valor * 10**scale) e máscara de nulos.
+
+    Os valores saem como Decimal com scale casas (int quando scale é 0), e o
+    texto para o COPY é formatado direto dos inteiros.
+    """
+
+    __slots__ = ('scale',)
+
+    def __init__(self, values: np.ndarray, valid: np.ndarray, scale: int):
+        super().__init__(values, valid)
+        self.scale = scale
+
+    def _to_value(self, unscaled: int):
+        return unscaled if not self.scale else Decimal(unscaled).scaleb(-self.scale)
+
+    def __getitem__(self, index: int):
+        return self._to_value(int(self.values[index])) if self.valid[index] else None
+
+    def tolist(self) -> List[Any]:
+        if self.scale:
+            scale = -self.scale
+            values = [Decimal(value).scaleb(scale) for value in self.values.tolist()]
+        else:
+            values = self.values.tolist()
+        if not self.valid.all():
+            for index in np.flatnonzero(~self.valid).tolist():
+                values[index] = None
+        return values
+
+    def to_strings(self) -> List[str]:
+        """Texto de cada valor com scale casas decimais (vazio para nulos)."""
+        if self.scale:
+            divisor = 10 ** self.scale
+            scale = self.scale
+            formatted = [
+                f"{'-' if value < 0 else ''}{abs(value) // divisor}.{abs(value) % divisor:0{scale}d}"
+                for value in self.values.tolist()
+            ]
+        else:
+            formatted = [str(value) for value in self.values.tolist()]
+        for index in np.flatnonzero(~self.valid).tolist():
+            formatted[index] = ''
+        return formatted
+
+    def take(self, indices: np.ndarray) -> 'DecimalColumn':
+        return DecimalColumn(self.values[indices], self.valid[indices], self.scale)
+
+    def digits(self) -> int:
+        """Dígitos do maior valor sem escala (0 se não há valores)."""
+        values = self.values[self.valid]
+        return len(str(int(np.abs(values).max()))) if len(values) else 0
+
+    @staticmethod
+    def concat(columns: List['DecimalColumn']):
+        """
+        Une as partes na maior escala entre elas.
+
+        Se algum valor, levado à maior escala, passar de INT64_DIGITS dígitos,
+        o resultado é uma coluna de Decimal (como em DecimalCodec.convert_block),
+        em vez de estourar o int64.
+        """
+        scale = max(column.scale for column in columns)
+        if any(column.digits() + scale - column.scale > INT64_DIGITS for column in columns if column.scale < scale):
+            exponent = -scale
+            values = []
+            for column in columns:
+                factor = 10 ** (scale - column.scale)
+                values += [Decimal(value * factor).scaleb(exponent) if valid else None
+                           for value, valid in zip(column.values.tolist(), column.valid.tolist())]
+            return _object_array(values)
+        values = [column.values * 10 ** (scale - column.scale) for column in columns]
+        return DecimalColumn(np.concatenate(values), np.concatenate([c.valid for c in columns]), scale)
+
+
+class DateColumn(NumericColumn):
+    """Coluna de datas: valores datetime64[D] e máscara de nulos; os valores saem como datetime.date."""
+
+    __slots__ = ()
+
+    def take(self, indices: np.ndarray) -> 'DateColumn':
+        return DateColumn(self.values[indices], self.valid[indices])
+
+    @staticmethod
+    def concat(columns: List['DateColumn']) -> 'DateColumn':
+        return DateColumn(np.concatenate([c.values for c in columns]), np.concatenate([c.valid for c in columns]))
+
+
+class DictionaryColumn:
+    """Coluna codificada por dicionário: códigos int32 e a lista de valores distintos."""
+
+    __slots__ = ('codes', 'dictionary')
+
+    def __init__(self, codes: np.ndarray, dictionary: List[Any]):
+        self.codes = codes
+        self.dictionary = dictionary
+
+    @classmethod
+    def from_array(cls, values: np.ndarray) -> 'DictionaryColumn':
+        """Codifica um array NumPy de strings (ordenação vetorizada)."""
+        dictionary, codes = np.unique(values, return_inverse=True)
+        return cls(codes.astype(np.int32).reshape(-1), dictionary.tolist())
+
+    @classmethod
+    def from_list(cls, values: Iterable[Any]) -> 'DictionaryColumn':
+        """Codifica valores Python quaisquer (hasheáveis) na ordem de aparição."""
+        positions = {}
+        dictionary = []
+        codes = []
+        for value in values:
+            # O tipo faz parte da chave para que 1, 1.0 e True não se confundam
+            key = (value.__class__, value)
+            code = positions.get(key)
+            if code is None:
+                code = positions[key] = len(dictionary)
+                dictionary.append(value)
+            codes.append(code)
+        return cls(np.array(codes, dtype=np.int32), dictionary)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index: int):
+        return self.dictionary[self.codes[index]]
+
+    def tolist(self) -> List[Any]:
+        dictionary = self.dictionary
+        return [dictionary[code] for code in self.codes.tolist()]
+
+    def take(self, indices: np.ndarray) -> 'DictionaryColumn':
+        return DictionaryColumn(self.codes[indices], self.dictionary)
+
+    @staticmethod
+    def concat(columns: List['DictionaryColumn']) -> 'DictionaryColumn':
+        if all(c.dictionary is columns[0].dictionary for c in columns):
+            return DictionaryColumn(np.concatenate([c.codes for c in columns]), columns[0].dictionary)
+        # Une os dicionários e remapeia os códigos de cada parte
+        positions = {}
+        dictionary = []
+        codes = []
+        for column in columns:
+            mapping = np.empty(len(column.dictionary), dtype=np.int32)
+            for index, value in enumerate(column.dictionary):
+                key = (value.__class__, value)
+                code = positions.get(key)
+                if code is None:
+                    code = positions[key] = len(dictionary)
+                    dictionary.append(value)
+                mapping[index] = code
+            codes.append(mapping[column.codes])
+        return DictionaryColumn(np.concatenate(codes), dictionary)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + 8 * len(self.dictionary)
+
+
+def _object_array(values: List[Any]) -> np.ndarray:
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def encode_string_array(values: np.ndarray):
+    """Codifica uma coluna de strings NumPy por dicionário, se houver repetição suficiente."""
+    column = DictionaryColumn.from_array(values)
+    if len(column.dictionary) <= DICTIONARY_MAX_RATIO * max(len(values), 1):
+        return column
+    return _object_array(values.tolist())
+
+
+def _encode_values(values: List[Any]):
+    """Escolhe a representação mais compacta para uma lista de valores Python."""
+    if values and all(isinstance(value, float) or value is None for value in values):
+        return NumericColumn.from_list(values)
+    try:
+        column = DictionaryColumn.from_list(values)
+        if len(column.dictionary) <= DICTIONARY_MAX_RATIO * max(len(values), 1):
+            return column
+    except TypeError:
+        # Valores não hasheáveis ficam num array de objetos
+        pass
+    return _object_array(values)
+
+
+class RecordBatch:
+    """
+    Lote de registros armazenado por coluna.
+
+    Substitui a lista de dicionários trocada entre parser, comparação e
+    gravação: cada coluna é um NumericColumn, um DictionaryColumn ou um array
+    NumPy de objetos, e as linhas só viram dicionários quando necessário.
+    """
+
+    __slots__ = ('column_names', 'columns', '_positions')
+
+    def __init__(self, column_names: List[str], columns: List[Any]):
+        self.column_names = list(column_names)
+        self.columns = list(columns)
+        # Último índice vence, como num dicionário com chaves repetidas
+        self._positions = {name.casefold(): index for index, name in enumerate(self.column_names)}
+
+    @classmethod
+    def from_rows(cls, column_names: List[str], rows: Iterable[Tuple]) -> 'RecordBatch':
+        """Cria um lote a partir de tuplas (ex.: linhas retornadas pelo banco)."""
+        rows = list(rows)
+        if not rows:
+            return cls(column_names, [np.empty(0, dtype=object) for _ in column_names])
+        return cls(column_names, [_encode_values(list(values)) for values in zip(*rows)])
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> 'RecordBatch':
+        """Cria um lote a partir de uma lista de dicionários com as mesmas chaves."""
+        if not records:
+            return cls([], [])
+        column_names = list(records[0].keys())
+        return cls.from_rows(column_names, (tuple(record.values()) for record in records))
+
+    @staticmethod
+    def concat(batches: List['RecordBatch']) -> 'RecordBatch':
+        non_empty = [batch for batch in batches if len(batch)]
+        if not non_empty:
+            return batches[0] if batches else RecordBatch([], [])
+        batches = non_empty
+        if len(batches) == 1:
+            return batches[0]
+        columns = []
+        for index in range(len(batches[0].columns)):
+            parts = [batch.columns[index] for batch in batches]
+            kind = type(parts[0])
+            if all(type(part) is kind for part in parts) and kind in (NumericColumn, DecimalColumn, DateColumn, DictionaryColumn):
+                columns.append(kind.concat(parts))
+            elif all(isinstance(part, np.ndarray) for part in parts):
+                columns.append(np.concatenate(parts))
+            else:
+                columns.append(_encode_values([value for part in parts for value in part.tolist()]))
+        return RecordBatch(batches[0].column_names, columns)
+
+    def __len__(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+    def column_index(self, name: str) -> Optional[int]:
+        """Posição da coluna, ignorando maiúsculas/minúsculas."""
+        return self._positions.get(name.casefold())
+
+    def column(self, name: str) -> List[Any]:
+        """Valores de uma coluna como lista Python."""
+        return self.columns[self._positions[name.casefold()]].tolist()
+
+    def iter_rows(self) -> Iterator[Tuple]:
+        """Itera as linhas como tuplas, na ordem de column_names."""
+        return zip(*[column.tolist() for column in self.columns])
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Itera as linhas como dicionários {coluna: valor}."""
+        names = self.column_names
+        return (dict(zip(names, row)) for row in self.iter_rows())
+
+    def record(self, index: int) -> Dict[str, Any]:
+        return dict(zip(self.column_names, (column[index] for column in self.columns)))
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return list(self.iter_records())
+
+    def take(self, indices: Sequence[int]) -> 'RecordBatch':
+        indices = np.asarray(indices, dtype=np.int64)
+        return RecordBatch(self.column_names, [column.take(indices) for column in self.columns])
+
+    def slice(self, start: int, stop: int) -> 'RecordBatch':
+        return self.take(np.arange(start, min(stop, len(self))))
+
+    def with_column(self, name: str, values: Sequence[Any]) -> 'RecordBatch':
+        """Novo lote com uma coluna a mais no final (as demais são compartilhadas)."""
+        return RecordBatch(self.column_names + [name], self.columns + [_encode_values(list(values))])
+
+    @property
+    def nbytes(self) -> int:
+        """Estimativa dos bytes ocupados pelos buffers das colunas (sem os objetos Python)."""
+        return sum(column.nbytes for column in self.columns)
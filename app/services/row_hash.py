@@ -0,0 +1,186 @@
+import re
+import hashlib
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Dict, Any
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.services.record_batch import RecordBatch, NumericColumn, DictionaryColumn
+
+# Separador dos valores na impressão digital da linha (mesmo caractere no Python e no SQL)
+HASH_SEPARATOR = '\x1f'
+
+_NUMERIC_PATTERN = re.compile(r'^-?\d+(\.\d+)?$')
+
+
+def normalize_value(value: Any) -> str:
+    """Normaliza valores para comparação consistente"""
+    # Trata valores nulos
+    if value is None:
+        return ''
+
+    # Converte para string e remove espaços
+    if isinstance(value, (int, float)):
+        # Para números, usa representação de string precisa
+        if isinstance(value, int):
+            return str(value)
+        else:  # float
+            # Remove zeros à direita e ponto decimal se for inteiro
+            # Usa formatação para evitar problemas de precisão
+            if value == int(value):  # É um float que representa um inteiro
+                return str(int(value))
+            # Formatação com precisão fixa para evitar diferenças de arredondamento
+            s = f"{value:.10f}".rstrip('0').rstrip('.') if value != 0 else '0'
+            return s
+    elif isinstance(value, datetime):
+        # Normaliza datas para formato ISO sem milissegundos
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    elif isinstance(value, str):
+        # Para strings, normaliza removendo espaços extras e convertendo para minúsculas
+        # Também remove caracteres não imprimíveis que podem causar problemas
+        s = value
+        # Remove caracteres de controle e espaços extras
+        s = re.sub(r'[\x00-\x1F\x7F]', '', s)
+        # Normaliza espaços múltiplos para um único espaço
+        s = re.sub(r'\s+', ' ', s)
+        # Remove espaços no início e fim e converte para minúsculas
+        s = s.strip().lower()
+        # Tenta converter para número se parecer um número
+        if re.match(r'^-?\d+(\.\d+)?$', s):
+            try:
+                if '.' in s:
+                    num = float(s)
+                    if num == int(num):  # É um float que representa um inteiro
+                        return str(int(num))
+                    return f"{num:.10f}".rstrip('0').rstrip('.')
+                else:
+                    return str(int(s))
+            except (ValueError, TypeError):
+                pass
+        return s
+    else:
+        # Para outros tipos, converte para string e normaliza
+        s = str(value)
+        s = re.sub(r'[\x00-\x1F\x7F]', '', s)
+        s = re.sub(r'\s+', ' ', s)
+        return s.strip().lower()
+
+
+def hash_key(value: Any) -> str:
+    """
+    Forma canônica de um valor na impressão digital da linha.
+
+    É o valor de normalize_value com os números numa única representação
+    (ex.: Decimal('9116.0') do banco e 9116.0 do arquivo viram "9116").
+    Chaves iguais implicam valores iguais para _find_differences; o contrário
+    nem sempre vale (tolerância numérica), por isso hashes diferentes ainda
+    passam pela comparação campo a campo.
+    """
+    if value.__class__ is Decimal and value.is_finite():
+        # Forma posicional, como CAST(... AS text) no SQL (str(Decimal) pode usar notação científica)
+        value = format(value, 'f')
+    normalized = normalize_value(value)
+    if not _NUMERIC_PATTERN.match(normalized):
+        return normalized
+    try:
+        if '.' not in normalized:
+            return str(int(normalized))
+        number = float(normalized)
+        if number == int(number):
+            return str(int(number))
+        return f"{number:.10f}".rstrip('0').rstrip('.')
+    except (ValueError, OverflowError):
+        return normalized
+
+
+def _column_hash_keys(column) -> List[str]:
+    """Chaves canônicas de uma coluna, calculando uma vez por valor distinto."""
+    if isinstance(column, DictionaryColumn):
+        dictionary = [hash_key(value) for value in column.dictionary]
+        return [dictionary[code] for code in column.codes.tolist()]
+    values = column.tolist() if isinstance(column, (NumericColumn, np.ndarray)) else list(column)
+    cache: Dict[Any, str] = {}
+    keys = []
+    for value in values:
+        key = cache.get(value)
+        if key is None:
+            key = cache[value] = hash_key(value)
+        keys.append(key)
+    return keys
+
+
+def row_hashes(batch: RecordBatch, column_names: List[str]) -> List[str]:
+    """
+    Impressão digital (MD5 em hexadecimal) de cada linha do lote sobre as colunas indicadas.
+
+    Equivale a row_hash_sql no PostgreSQL: md5 das chaves canônicas unidas por HASH_SEPARATOR.
+    """
+    columns = []
+    for name in column_names:
+        index = batch.column_index(name)
+        columns.append(_column_hash_keys(batch.columns[index]) if index is not None else [''] * len(batch))
+    md5 = hashlib.md5
+    return [md5(HASH_SEPARATOR.join(values).encode('utf-8')).hexdigest() for values in zip(*columns)]
+
+
+# Funções temporárias da sessão com as mesmas regras de normalize_value (texto) e hash_key
+SQL_NORMALIZE_FUNCTION = r"""
+    CREATE OR REPLACE FUNCTION pg_temp.sync_normalize(value text) RETURNS text
+    LANGUAGE sql IMMUTABLE AS $$
+        SELECT lower(btrim(regexp_replace(regexp_replace(coalesce(value, ''), '[\x01-\x1f\x7f]', '', 'g'), '\s+', ' ', 'g')))
+    $$
+    """
+
+SQL_FUNCTIONS = (
+    SQL_NORMALIZE_FUNCTION,
+    r"""
+    CREATE OR REPLACE FUNCTION pg_temp.sync_hash_key(value text) RETURNS text
+    LANGUAGE plpgsql IMMUTABLE AS $$
+    DECLARE
+        normalized text := pg_temp.sync_normalize(value);
+    BEGIN
+        IF normalized ~ '^-?[0-9]+$' THEN
+            RETURN CAST(CAST(normalized AS numeric) AS text);
+        ELSIF normalized ~ '^-?[0-9]+\.[0-9]+$' THEN
+            RETURN rtrim(rtrim(CAST(round(CAST(normalized AS numeric), 10) AS text), '0'), '.');
+        END IF;
+        RETURN normalized;
+    END
+    $$
+    """,
+)
+
+_SQL_NUMERIC_TYPES = {'numeric', 'integer', 'bigint', 'smallint', 'double precision', 'real'}
+_SQL_TEXT_TYPES = {'character varying', 'character', 'text'}
+
+
+def _sql_hash_key(column: str, data_type: str) -> str:
+    if data_type in _SQL_NUMERIC_TYPES:
+        # Números dispensam a normalização de texto: só a forma canônica
+        number = f"CAST({column} AS numeric)"
+        return (f"CASE WHEN {column} IS NULL THEN '' "
+                f"WHEN {number} = trunc({number}) THEN CAST(trunc({number}) AS text) "
+                f"ELSE rtrim(rtrim(CAST(round({number}, 10) AS text), '0'), '.') END")
+    if data_type in _SQL_TEXT_TYPES:
+        return f"pg_temp.sync_hash_key({column})"
+    return f"pg_temp.sync_hash_key(CAST({column} AS text))"
+
+
+def row_hash_sql(columns: List[Dict[str, Any]]) -> str:
+    """
+    Expressão SQL (PostgreSQL) da impressão digital da linha, igual à de row_hashes.
+
+    Requer as funções de SQL_FUNCTIONS criadas na sessão.
+
+    Args:
+        columns: Colunas na ordem do hash, com 'name' e 'data_type' (ver SchemaCache.get_columns)
+    """
+    keys = ", ".join(_sql_hash_key(column['name'], column['data_type']) for column in columns)
+    return f"md5(concat_ws(chr(31), {keys}))"
+
+
+def create_sql_functions(session: Session):
+    """Cria na sessão (esquema pg_temp) as funções usadas por row_hash_sql."""
+    for statement in SQL_FUNCTIONS:
+        session.execute(text(statement))
@@ -0,0 +1,119 @@
+import time
+import logging
+import threading
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from sqlalchemy import inspect
+from app.models.database import engine
+from config import DATABASE_SCHEMA, SCHEMA_CACHE_TTL
+
+logger = logging.getLogger("SchemaCache")
+
+# Nome do tipo em information_schema.columns.data_type (PostgreSQL) pelo tipo refletido
+_INFORMATION_SCHEMA_TYPES = {
+    'VARCHAR': 'character varying',
+    'CHAR': 'character',
+    'NUMERIC': 'numeric',
+    'DATE': 'date',
+    'INTEGER': 'integer',
+    'BIGINT': 'bigint',
+    'SMALLINT': 'smallint',
+    'TEXT': 'text',
+    'BOOLEAN': 'boolean',
+    'TIMESTAMP': 'timestamp without time zone',
+    'DOUBLE_PRECISION': 'double precision',
+    'REAL': 'real',
+}
+
+
+class SchemaCache:
+    """
+    Cache compartilhado dos metadados do banco (tabelas, colunas e chaves primárias).
+
+    Cada entrada expira após ttl segundos e pode ser invalidada explicitamente
+    (por tabela ou por completo). Seguro para uso entre threads; o acesso ao
+    catálogo acontece fora do lock.
+    """
+
+    def __init__(self, ttl: float = SCHEMA_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[Tuple, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def _get(self, key: Tuple, loader: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._stats['hits'] += 1
+                return entry[1]
+            self._stats['misses'] += 1
+
+        value = loader()
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def get_tables(self, schema: str = DATABASE_SCHEMA, bind=None) -> List[str]:
+        """Tabelas e views do esquema."""
+        def load():
+            inspector = inspect(bind if bind is not None else engine)
+            return inspector.get_table_names(schema=schema) + inspector.get_view_names(schema=schema)
+        return list(self._get(('tables', schema), load))
+
+    def get_columns(self, table_name: str, schema: str = DATABASE_SCHEMA, bind=None) -> List[Dict[str, Any]]:
+        """
+        Colunas da tabela na ordem da definição.
+
+        Cada coluna tem 'name', 'type' (tipo refletido pelo SQLAlchemy, como
+        texto), 'data_type' (nome do tipo em information_schema) e 'nullable'.
+        """
+        def load():
+            inspector = inspect(bind if bind is not None else engine)
+            return [
+                {
+                    'name': col['name'],
+                    'type': str(col['type']),
+                    'data_type': _INFORMATION_SCHEMA_TYPES.get(col['type'].__visit_name__.upper(), str(col['type']).lower()),
+                    'nullable': col.get('nullable', True)
+                }
+                for col in inspector.get_columns(table_name, schema=schema)
+            ]
+        return list(self._get(('columns', schema, table_name), load))
+
+    def get_primary_key(self, table_name: str, schema: str = DATABASE_SCHEMA, bind=None) -> List[str]:
+        """Colunas da restrição de chave primária da tabela (vazia se não houver)."""
+        def load():
+            inspector = inspect(bind if bind is not None else engine)
+            return inspector.get_pk_constraint(table_name, schema=schema).get('constrained_columns') or []
+        return list(self._get(('pk', schema, table_name), load))
+
+    def invalidate(self, table_name: Optional[str] = None, schema: Optional[str] = None):
+        """Descarta as entradas de uma tabela (e a lista de tabelas) ou o cache inteiro."""
+        with self._lock:
+            if table_name is None and schema is None:
+                self._entries.clear()
+            else:
+                for key in list(self._entries):
+                    if schema is not None and key[1] != schema:
+                        continue
+                    if table_name is None or key[0] == 'tables' or key[2] == table_name:
+                        del self._entries[key]
+        logger.info(f"Cache de metadados invalidado: {table_name or 'todas as tabelas'}")
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores de acertos/faltas e quantidade de entradas."""
+        with self._lock:
+            return {**self._stats, 'size': len(self._entries)}
+
+
+schema_cache = SchemaCache()
+
+
+def invalidate_schema_cache(table_name: Optional[str] = None, schema: Optional[str] = None):
+    """Invalida os metadados em cache (após alterações de estrutura no banco)."""
+    schema_cache.invalidate(table_name, schema)
+
+
+def schema_cache_stats() -> Dict[str, int]:
+    return schema_cache.stats()
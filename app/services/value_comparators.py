@@ -0,0 +1,228 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from app.services.row_hash import normalize_value, _NUMERIC_PATTERN
+
+# Quantidade de textos normalizados guardados por coluna antes de recomeçar o cache
+TEXT_CACHE_SIZE = 65536
+
+Comparator = Callable[[Any, Any], bool]
+KeyFunction = Callable[[Any], Union[float, str]]
+
+# Tipos do banco (information_schema.data_type) agrupados pela forma de comparação
+_NUMERIC_DB_TYPES = {'numeric', 'integer', 'bigint', 'smallint', 'double precision', 'real'}
+_TEXT_DB_TYPES = {'character varying', 'character', 'text'}
+_DATE_DB_TYPES = {'date', 'timestamp without time zone', 'timestamp with time zone'}
+
+
+def numbers_equal(a: float, b: float) -> bool:
+    """Igualdade numérica de _find_differences: inteiros exatos, demais com tolerância de 1e-7 (relativa acima de 1)."""
+    if a == int(a) and b == int(b):
+        return int(a) == int(b)
+    difference = abs(a - b)
+    largest = max(abs(a), abs(b))
+    if largest > 1.0:
+        return difference / largest < 0.0000001
+    return difference < 0.0000001
+
+
+def comparison_key(value: Any) -> Union[float, str]:
+    """
+    Forma de comparação de um valor: float se o valor normalizado é numérico, senão o texto normalizado.
+
+    Dois valores são iguais para _find_differences quando as chaves são ambas
+    float e numbers_equal, ou ambas texto e idênticas (vazio inclui None).
+    """
+    normalized = normalize_value(value)
+    if _NUMERIC_PATTERN.match(normalized):
+        return float(normalized)
+    return normalized
+
+
+def keys_equal(a: Union[float, str], b: Union[float, str]) -> bool:
+    if a.__class__ is float:
+        return b.__class__ is float and numbers_equal(a, b)
+    return a == b
+
+
+def values_equal(file_value: Any, db_value: Any) -> bool:
+    """Comparação genérica (qualquer tipo), sem compilação por coluna."""
+    return keys_equal(comparison_key(file_value), comparison_key(db_value))
+
+
+def _float_key(value: float) -> float:
+    # Mesmo caminho de normalize_value para float, sem expressões regulares
+    if value == int(value):
+        return value
+    return float(f"{value:.10f}".rstrip('0').rstrip('.'))
+
+
+def _number_key(value: Any) -> Union[float, str]:
+    """Chave de valores de colunas numéricas: float do arquivo, Decimal/int/float do banco."""
+    cls = value.__class__
+    if cls is float:
+        return _float_key(value)
+    if cls is Decimal:
+        # str(Decimal) usa notação científica para expoentes extremos: aí o valor não é "numérico"
+        text = str(value)
+        if 'E' not in text and value.is_finite():
+            return float(text)
+        return text.lower()
+    if cls is int:
+        return float(value)
+    if value is None:
+        return ''
+    return comparison_key(value)
+
+
+def _file_number_key(value: Any) -> Union[float, str]:
+    """Chave de valores NUMBER do arquivo: int/Decimal exatos comparados como o float que representam."""
+    cls = value.__class__
+    if cls is int or cls is Decimal:
+        return _float_key(float(value))
+    return _number_key(value)
+
+
+def _date_key(value: Any) -> Union[float, str]:
+    cls = value.__class__
+    if cls is date:
+        return value.isoformat()
+    if cls is datetime:
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if value is None:
+        return ''
+    return comparison_key(value)
+
+
+def _text_key_function() -> KeyFunction:
+    """Chave de textos com cache por valor distinto (as expressões regulares rodam uma vez por valor)."""
+    cache: Dict[str, Union[float, str]] = {}
+
+    def text_key(value: Any) -> Union[float, str]:
+        if value.__class__ is not str:
+            return '' if value is None else comparison_key(value)
+        key = cache.get(value)
+        if key is None:
+            if len(cache) >= TEXT_CACHE_SIZE:
+                cache.clear()
+            key = cache[value] = comparison_key(value)
+        return key
+
+    return text_key
+
+
+def _layout_kind(layout_type: Optional[str]) -> str:
+    layout_type = str(layout_type or '').upper()
+    if layout_type.startswith('NUMBER'):
+        return 'number'
+    if layout_type.startswith('DATE'):
+        return 'date'
+    if layout_type.startswith(('VARCHAR', 'CHAR')):
+        return 'text'
+    return 'other'
+
+
+def _db_kind(db_type: Optional[str]) -> str:
+    db_type = str(db_type or '').lower()
+    if db_type in _NUMERIC_DB_TYPES:
+        return 'number'
+    if db_type in _DATE_DB_TYPES:
+        return 'date'
+    if db_type in _TEXT_DB_TYPES:
+        return 'text'
+    return 'other'
+
+
+def compile_key_functions(layout_type: Optional[str], db_type: Optional[str]) -> Tuple[KeyFunction, KeyFunction]:
+    """
+    Funções de chave (ver comparison_key) do valor do arquivo e do valor do banco de uma coluna.
+
+    Dão o mesmo resultado de comparison_key, escolhendo pelo tipo o caminho
+    mais barato: números do arquivo (int, Decimal ou float, ver column_codec)
+    e do banco (Decimal, int) sem passar por texto, datas pela forma ISO e
+    textos normalizados uma vez por valor distinto. Valores de tipo
+    inesperado caem em comparison_key.
+
+    Args:
+        layout_type: Tipo da coluna no layout (ex.: "NUMBER(10,2)", "VARCHAR2(100)", "CHAR(1)", "DATE")
+        db_type: Tipo da coluna no banco, como em information_schema.columns.data_type
+    """
+    layout_kind = _layout_kind(layout_type)
+    db_kind = _db_kind(db_type)
+    if layout_kind == 'number':
+        file_key = _file_number_key
+    elif layout_kind == 'date':
+        file_key = _date_key
+    else:
+        file_key = _text_key_function()
+    if db_kind == 'number':
+        db_key = _number_key
+    elif db_kind == 'date':
+        db_key = _date_key
+    elif db_kind == 'text' and layout_kind != 'number':
+        db_key = file_key
+    else:
+        db_key = comparison_key
+    return file_key, db_key
+
+
+def compile_comparator(layout_type: Optional[str], db_type: Optional[str]) -> Comparator:
+    """
+    Comparador de uma coluna, escolhido uma vez pelo tipo no layout e pelo tipo no banco.
+
+    O resultado é sempre o de values_equal (mesmas regras de normalização e
+    tolerância numérica), com as funções de chave de compile_key_functions;
+    em colunas de texto, valores idênticos ou iguais sem os espaços das pontas
+    (CHAR) nem chegam a ser normalizados.
+    """
+    file_key, db_key = compile_key_functions(layout_type, db_type)
+
+    if _layout_kind(layout_type) == 'number':
+        def compare_numbers(file_value: Any, db_value: Any) -> bool:
+            a = file_key(file_value)
+            b = db_key(db_value)
+            if a.__class__ is float:
+                return b.__class__ is float and numbers_equal(a, b)
+            return a == b
+        return compare_numbers
+
+    def compare_text(file_value: Any, db_value: Any) -> bool:
+        # Textos iguais, ou iguais sem os espaços das pontas, têm a mesma forma normalizada
+        if file_value.__class__ is str and db_value.__class__ is str and (
+                file_value == db_value or file_value.strip() == db_value.strip()):
+            return True
+        a = file_key(file_value)
+        b = db_key(db_value)
+        if a.__class__ is float:
+            return b.__class__ is float and numbers_equal(a, b)
+        return a == b
+    return compare_text
+
+
+def compile_record_comparators(layout_columns: List[Dict[str, Any]],
+                               db_columns: List[Dict[str, Any]]) -> Dict[str, Comparator]:
+    """
+    Comparadores de todas as colunas do layout.
+
+    Args:
+        layout_columns: Colunas do layout ('Coluna' e 'Tipo')
+        db_columns: Colunas da tabela ('name' e 'data_type', ver SchemaCache.get_columns)
+
+    Returns:
+        Dicionário nome da coluna no layout -> comparador(valor do arquivo, valor do banco)
+    """
+    db_types = {col['name'].lower(): col.get('data_type') for col in db_columns}
+    return {
+        col['Coluna']: compile_comparator(col.get('Tipo'), db_types.get(str(col['Coluna']).lower()))
+        for col in layout_columns
+    }
+
+
+def compile_record_key_functions(layout_columns: List[Dict[str, Any]],
+                                 db_columns: List[Dict[str, Any]]) -> Dict[str, Tuple[KeyFunction, KeyFunction]]:
+    """Funções de chave (arquivo, banco) de todas as colunas do layout, como em compile_record_comparators."""
+    db_types = {col['name'].lower(): col.get('data_type') for col in db_columns}
+    return {
+        col['Coluna']: compile_key_functions(col.get('Tipo'), db_types.get(str(col['Coluna']).lower()))
+        for col in layout_columns
+    }
@@ -0,0 +1,133 @@
+from typing import Any, Dict, List, NamedTuple, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from app.services.record_batch import RecordBatch
+from app.services.value_comparators import KeyFunction
+
+# Coluna com a chave normalizada (texto sem espaços nas pontas) nos DataFrames da comparação
+KEY_COLUMN = '__sync_key'
+# Posição da linha no lote de origem
+POSITION_COLUMN = '__sync_position'
+# Sufixo das colunas do banco no resultado do merge
+DB_SUFFIX = '__db'
+
+
+class ColumnKeys(NamedTuple):
+    """Chaves de comparação de uma coluna (ver comparison_key) em arrays: números e textos separados."""
+    is_number: np.ndarray
+    numbers: np.ndarray
+    texts: np.ndarray
+
+
+def record_frame(batch: RecordBatch, column_names: Sequence[str], primary_key: str,
+                 extra_columns: Sequence[str] = ()) -> pd.DataFrame:
+    """
+    DataFrame de um lote com as colunas pelos nomes do layout, a chave normalizada e a posição no lote.
+
+    As colunas ficam como objetos Python (None para nulos), sem conversão de
+    tipo pelo pandas; colunas ausentes no lote ficam nulas. Linhas sem chave
+    têm KEY_COLUMN nulo.
+    """
+    data = {}
+    for name in list(column_names) + list(extra_columns):
+        index = batch.column_index(name)
+        values = batch.columns[index].tolist() if index is not None else [None] * len(batch)
+        data[name] = pd.Series(values, dtype=object)
+    key_index = batch.column_index(primary_key)
+    keys = batch.columns[key_index].tolist() if key_index is not None else [None] * len(batch)
+    data[KEY_COLUMN] = pd.Series([str(key).strip() if key is not None else None for key in keys], dtype=object)
+    data[POSITION_COLUMN] = np.arange(len(batch))
+    return pd.DataFrame(data)
+
+
+def column_keys(values: np.ndarray, key_function: KeyFunction) -> ColumnKeys:
+    """
+    Chaves de comparação de uma coluna.
+
+    A função de chave roda uma vez por valor distinto (pd.factorize); o
+    resultado é expandido para todas as linhas com indexação NumPy.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    # O último item corresponde aos nulos (código -1)
+    keys = [key_function(value) for value in uniques] + [key_function(None)]
+    is_number = np.fromiter((key.__class__ is float for key in keys), dtype=bool, count=len(keys))
+    numbers = np.fromiter((key if key.__class__ is float else np.nan for key in keys), dtype=np.float64, count=len(keys))
+    texts = np.empty(len(keys), dtype=object)
+    texts[:] = [key if key.__class__ is not float else None for key in keys]
+    return ColumnKeys(is_number[codes], numbers[codes], texts[codes])
+
+
+def numbers_equal_array(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """numbers_equal elemento a elemento: inteiros exatos, demais com tolerância de 1e-7 (relativa acima de 1)."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        integral = (a == np.trunc(a)) & (b == np.trunc(b))
+        difference = np.abs(a - b)
+        largest = np.maximum(np.abs(a), np.abs(b))
+        close = np.where(largest > 1.0, difference / largest < 0.0000001, difference < 0.0000001)
+    return np.where(integral, a == b, close)
+
+
+def keys_equal_array(a: ColumnKeys, b: ColumnKeys) -> np.ndarray:
+    """keys_equal elemento a elemento."""
+    equal = np.zeros(len(a.is_number), dtype=bool)
+    numbers = a.is_number & b.is_number
+    if numbers.any():
+        equal[numbers] = numbers_equal_array(a.numbers[numbers], b.numbers[numbers])
+    texts = ~a.is_number & ~b.is_number
+    if texts.any():
+        equal[texts] = a.texts[texts] == b.texts[texts]
+    return equal
+
+
+def index_by_key(db_frame: pd.DataFrame) -> pd.DataFrame:
+    """Linhas do banco indexadas pela chave normalizada; chaves repetidas valem pela última linha, como em _index_by_key."""
+    return db_frame.dropna(subset=[KEY_COLUMN]).drop_duplicates(KEY_COLUMN, keep='last').set_index(KEY_COLUMN)
+
+
+def match_records(file_frame: pd.DataFrame, db_indexed: pd.DataFrame) -> Tuple[np.ndarray, pd.DataFrame]:
+    """
+    Junta as linhas do arquivo às do banco pela chave normalizada (merge à esquerda).
+
+    Args:
+        file_frame: Lote do arquivo (record_frame)
+        db_indexed: Linhas do banco (index_by_key); o índice pode ser reaproveitado entre lotes
+
+    Returns:
+        Tupla (máscara das linhas sem correspondente no banco, DataFrame com as colunas
+        do arquivo e as do banco com sufixo DB_SUFFIX, na ordem de file_frame)
+    """
+    merged = file_frame.join(db_indexed, on=KEY_COLUMN, how='left', rsuffix=DB_SUFFIX)
+    return merged[POSITION_COLUMN + DB_SUFFIX].isna().to_numpy(), merged
+
+
+def changed_cells(matched: pd.DataFrame, column_names: Sequence[str],
+                  key_functions: Dict[str, Any]) -> np.ndarray:
+    """
+    Matriz (linhas x colunas) com True onde o valor do arquivo difere do banco.
+
+    Mesmas regras de _find_differences (normalização, vazio igual a nulo e
+    tolerância numérica), com as funções de chave de compile_key_functions.
+
+    Args:
+        matched: Linhas com correspondente no banco (de match_records)
+        column_names: Colunas comparadas
+        key_functions: Nome -> (função de chave do arquivo, função de chave do banco)
+    """
+    changed = np.zeros((len(matched), len(column_names)), dtype=bool)
+    for index, name in enumerate(column_names):
+        file_key, db_key = key_functions[name]
+        file_keys = column_keys(matched[name].to_numpy(dtype=object), file_key)
+        db_keys = column_keys(matched[name + DB_SUFFIX].to_numpy(dtype=object), db_key)
+        changed[:, index] = ~keys_equal_array(file_keys, db_keys)
+    return changed
+
+
+def row_differences(matched: pd.DataFrame, column_names: Sequence[str],
+                    changed: np.ndarray) -> List[Tuple[int, Dict[str, Any]]]:
+    """Pares (linha em matched, {coluna: novo valor}) das linhas com alguma coluna alterada."""
+    values = matched[list(column_names)].to_numpy(dtype=object)
+    differences = []
+    for row_index in np.flatnonzero(changed.any(axis=1)).tolist():
+        columns = np.flatnonzero(changed[row_index]).tolist()
+        differences.append((row_index, {column_names[column]: values[row_index, column] for column in columns}))
+    return differences
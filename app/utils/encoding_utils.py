@@ -0,0 +1,200 @@
+import os
+import codecs
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Union
+from app.utils.file_utils import ArchiveMember, DataSource, open_binary
+from config import ENCODING_SAMPLE_BYTES
+
+logger = logging.getLogger("EncodingUtils")
+
+# Encoding usado quando o arquivo não é UTF-8 válido (aceita qualquer sequência de bytes)
+FALLBACK_ENCODING = 'iso-8859-1'
+
+_CACHE_MAX_ENTRIES = 256
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _fallback_error_handler(error: UnicodeDecodeError):
+    """Decodifica bytes inválidos em UTF-8 usando o encoding de fallback."""
+    return error.object[error.start:error.end].decode(FALLBACK_ENCODING), error.end
+
+codecs.register_error('fallback_latin1', _fallback_error_handler)
+
+
+def _file_cache_key(file_path: DataSource, preferred: Optional[str]):
+    if isinstance(file_path, ArchiveMember):
+        return (*file_path.cache_key(), preferred)
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, preferred)
+
+
+def _sniff_prefix(prefix: bytes, is_whole_file: bool, preferred: Optional[str]) -> Dict[str, Any]:
+    """Escolhe o encoding a partir de um prefixo do arquivo."""
+    if preferred:
+        try:
+            codecs.getincrementaldecoder(preferred)().decode(prefix, final=is_whole_file)
+            return {'encoding': preferred, 'reason': f"encoding informado ({preferred}) decodifica o prefixo", 'switchable': False}
+        except (UnicodeDecodeError, LookupError) as e:
+            logger.warning(f"Encoding informado {preferred} não decodifica o arquivo: {str(e)}")
+
+    if prefix.startswith(codecs.BOM_UTF8):
+        return {'encoding': 'utf-8-sig', 'reason': "arquivo começa com BOM UTF-8", 'switchable': False}
+
+    if prefix.isascii():
+        return {
+            'encoding': 'utf-8',
+            'reason': f"prefixo de {len(prefix)} bytes é ASCII puro; troca para {FALLBACK_ENCODING} se surgirem bytes inválidos em UTF-8",
+            'switchable': True
+        }
+
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(prefix, final=is_whole_file)
+        return {'encoding': 'utf-8', 'reason': f"prefixo de {len(prefix)} bytes contém texto UTF-8 válido", 'switchable': False}
+    except UnicodeDecodeError as e:
+        return {
+            'encoding': FALLBACK_ENCODING,
+            'reason': f"byte inválido para UTF-8 (0x{prefix[e.start]:02x}) na posição {e.start} do prefixo",
+            'switchable': False
+        }
+
+
+def detect_file_encoding(file_path: DataSource, preferred: Optional[str] = None, sample_bytes: int = ENCODING_SAMPLE_BYTES) -> Dict[str, Any]:
+    """
+    Detecta o encoding de um arquivo lendo apenas um prefixo limitado.
+
+    O resultado é guardado em cache por arquivo (caminho, tamanho e data de
+    modificação), de modo que validação e parsing reutilizam a mesma decisão.
+
+    Args:
+        file_path: Caminho do arquivo ou membro de um ZIP
+        preferred: Encoding sugerido pelo chamador (opcional)
+        sample_bytes: Tamanho máximo do prefixo analisado
+
+    Returns:
+        Dicionário com 'encoding' escolhido e 'reason' da escolha
+    """
+    key = _file_cache_key(file_path, preferred)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    with open_binary(file_path) as file:
+        prefix = file.read(sample_bytes)
+        is_whole_file = not file.read(1)
+
+    info = _sniff_prefix(prefix, is_whole_file, preferred)
+    logger.info(f"Encoding de {os.path.basename(str(file_path))}: {info['encoding']} ({info['reason']})")
+
+    with _cache_lock:
+        _cache[key] = info
+        while len(_cache) > _CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return info
+
+
+def resolve_encoding(file_path: DataSource, encoding: Union[str, Dict[str, Any], None] = None) -> Dict[str, Any]:
+    """Aceita um encoding já detectado (dicionário), um nome sugerido ou None."""
+    if isinstance(encoding, dict):
+        return encoding
+    return detect_file_encoding(file_path, encoding)
+
+
+class DecodedReader:
+    """
+    Leitor de texto que decodifica um arquivo binário bloco a bloco.
+
+    Segue o mesmo tratamento de quebras de linha do modo texto do Python
+    (\\r\\n e \\r viram \\n). Se o encoding foi escolhido a partir de um prefixo
+    ASCII e um bloco posterior não for UTF-8 válido, troca para o encoding de
+    fallback sem reler o arquivo: todo o texto anterior era ASCII, idêntico
+    nos dois encodings. A decisão fica registrada em encoding_info.
+    """
+
+    def __init__(self, binary_file, encoding_info: Dict[str, Any], offset: int = 0):
+        self._file = binary_file
+        self._info = encoding_info
+        self._decoder = codecs.getincrementaldecoder(encoding_info['encoding'])()
+        self._ascii_so_far = True
+        self._pending_cr = False
+        # Posição do primeiro byte lido no arquivo (para leituras de um trecho)
+        self._bytes_read = offset
+
+    @property
+    def ascii_so_far(self) -> bool:
+        """Indica se todos os bytes lidos até agora eram ASCII."""
+        return self._ascii_so_far
+
+    def _decode(self, raw: bytes, final: bool) -> str:
+        state = self._decoder.getstate()
+        try:
+            text = self._decoder.decode(raw, final)
+        except UnicodeDecodeError as e:
+            position = self._bytes_read + e.start
+            if self._info.get('switchable') and self._ascii_so_far:
+                self._info.update({
+                    'encoding': FALLBACK_ENCODING,
+                    'switchable': False,
+                    'reason': f"prefixo ASCII, mas byte inválido para UTF-8 na posição {position}; lido como {FALLBACK_ENCODING}"
+                })
+                self._decoder = codecs.getincrementaldecoder(FALLBACK_ENCODING)()
+            else:
+                # Conteúdo UTF-8 já confirmado: apenas os bytes inválidos usam o fallback
+                logger.warning(f"Bytes inválidos para {self._info['encoding']} na posição {position}; decodificados como {FALLBACK_ENCODING}")
+                self._info['invalid_bytes_at'] = self._info.get('invalid_bytes_at', position)
+                self._decoder = codecs.getincrementaldecoder(self._info['encoding'])('fallback_latin1')
+                self._decoder.setstate(state)
+            text = self._decoder.decode(raw, final)
+
+        self._ascii_so_far = self._ascii_so_far and raw.isascii()
+        self._bytes_read += len(raw)
+        return text
+
+    def read(self, size: int = -1) -> str:
+        raw = self._file.read(size)
+        text = self._decode(raw, final=not raw)
+
+        # Tradução de quebras de linha equivalente ao modo texto
+        if self._pending_cr:
+            text = '\r' + text
+            self._pending_cr = False
+        if raw and text.endswith('\r'):
+            text = text[:-1]
+            self._pending_cr = True
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+        # Garante que só retorna vazio no fim do arquivo
+        if not text and raw:
+            return self.read(size)
+        return text
+
+    def __iter__(self) -> Iterator[str]:
+        remainder = ''
+        while True:
+            chunk = self.read(1 << 16)
+            if not chunk:
+                break
+            lines = (remainder + chunk).split('\n')
+            remainder = lines.pop()
+            for line in lines:
+                yield line + '\n'
+        if remainder:
+            yield remainder
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_decoded(file_path: DataSource, encoding_info: Dict[str, Any]) -> DecodedReader:
+    """Abre um arquivo (ou membro de ZIP) para leitura de texto com o encoding detectado."""
+    return DecodedReader(open_binary(file_path), encoding_info)
@@ -1,7 +1,8 @@
 import os
 import shutil
+import zipfile
 import tempfile
-from typing import Optional, Tuple
+from typing import BinaryIO, List, Tuple, Union
 
 def create_temp_dir() -> str:
     """
@@ -44,4 +45,65 @@ def is_valid_zip(file_path: str) -> bool:
     Returns:
         True se for um ZIP válido, False caso contrário.
     """
-    return file_path.endswith('.zip') and os.path.exists(file_path)
\ No newline at end of file
+    return file_path.endswith('.zip') and os.path.exists(file_path)
+
+class ArchiveMember:
+    """
+    Arquivo dentro de um ZIP, lido diretamente do arquivo compactado.
+
+    Pode ser usado no lugar de um caminho em disco pelo parser, pela detecção
+    de encoding e pelo carregamento de layouts, sem extrair nada para disco.
+    """
+
+    __slots__ = ('zip_path', 'name', 'file_size', 'crc')
+
+    def __init__(self, zip_path: str, info: zipfile.ZipInfo):
+        self.zip_path = zip_path
+        self.name = info.filename
+        self.file_size = info.file_size
+        self.crc = info.CRC
+
+    def open(self) -> BinaryIO:
+        """Abre o membro para leitura binária (cada chamada tem seu próprio descritor)."""
+        with zipfile.ZipFile(self.zip_path, 'r') as zip_ref:
+            # O stream continua válido após fechar o ZipFile
+            return zip_ref.open(self.name)
+
+    def cache_key(self) -> Tuple:
+        return (os.path.abspath(self.zip_path), self.name, self.file_size, self.crc)
+
+    def __str__(self) -> str:
+        return f"{os.path.basename(self.zip_path)}/{self.name}"
+
+    def __repr__(self) -> str:
+        return f"ArchiveMember({self.zip_path!r}, {self.name!r})"
+
+
+# Caminho em disco ou membro de um ZIP
+DataSource = Union[str, ArchiveMember]
+
+def list_zip_members(zip_path: str) -> List[ArchiveMember]:
+    """
+    Lista os arquivos da raiz de um ZIP (os mesmos que a extração deixaria no diretório).
+    
+    Args:
+        zip_path: Caminho do arquivo ZIP.
+        
+    Returns:
+        Membros do ZIP, sem diretórios nem arquivos em subpastas.
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        return [ArchiveMember(zip_path, info) for info in zip_ref.infolist()
+                if not info.is_dir() and '/' not in info.filename]
+
+def open_binary(source: DataSource) -> BinaryIO:
+    """Abre um caminho em disco ou um membro de ZIP para leitura binária."""
+    if isinstance(source, ArchiveMember):
+        return source.open()
+    return open(source, 'rb')
+
+def source_size(source: DataSource) -> int:
+    """Tamanho em bytes (descompactado, no caso de membros de ZIP)."""
+    if isinstance(source, ArchiveMember):
+        return source.file_size
+    return os.path.getsize(source)
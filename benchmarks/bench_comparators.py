@@ -0,0 +1,117 @@
+"""
+Comparação campo a campo arquivo x banco: normalização por célula (regra anterior) vs. comparadores compilados por coluna.
+
+Os registros do banco têm os tipos devolvidos pelo driver (Decimal, CHAR com
+espaços à direita) e uma fração deles tem campos alterados. Confere que as
+diferenças encontradas são as mesmas.
+
+Uso:
+    python -m benchmarks.bench_comparators --rows 200000 --changed 0.1
+"""
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+from decimal import Decimal
+
+from app.services.data_validator import iter_fixed_width_batches
+from app.services.row_hash import normalize_value
+from app.services.value_comparators import compile_record_comparators
+from benchmarks.bench_parser import LAYOUT, write_sample_file
+
+DB_COLUMNS = [
+    {'name': 'co_procedimento', 'data_type': 'character varying'},
+    {'name': 'no_procedimento', 'data_type': 'character varying'},
+    {'name': 'tp_sexo', 'data_type': 'character'},
+    {'name': 'qt_maxima', 'data_type': 'numeric'},
+    {'name': 'vl_sh', 'data_type': 'numeric'},
+    {'name': 'dt_competencia', 'data_type': 'character'},
+]
+
+
+def legacy_values_equal(file_value, db_value) -> bool:
+    """Regra anterior de _find_differences: normaliza e testa expressões regulares em cada célula."""
+    file_norm = normalize_value(file_value)
+    db_norm = normalize_value(db_value)
+    if not file_norm and not db_norm:
+        return True
+    try:
+        if re.match(r'^-?\d+(\.\d+)?$', file_norm) and re.match(r'^-?\d+(\.\d+)?$', db_norm):
+            file_num = float(file_norm)
+            db_num = float(db_norm)
+            if file_num == int(file_num) and db_num == int(db_num):
+                if int(file_num) == int(db_num):
+                    return True
+            else:
+                abs_diff = abs(file_num - db_num)
+                max_val = max(abs(file_num), abs(db_num))
+                if (abs_diff / max_val if max_val > 1.0 else abs_diff) < 0.0000001:
+                    return True
+    except (ValueError, TypeError):
+        pass
+    return file_norm == db_norm
+
+
+def database_row(row, rng: random.Random, changed: float):
+    """Linha do banco correspondente à do arquivo, com os tipos do driver e, às vezes, um campo alterado."""
+    code, name, sex, quantity, value, competence = row
+    db_row = [code, name, f"{sex:<1}", Decimal(int(quantity)), Decimal(f"{value:.2f}"), f"{competence:<8}"]
+    if rng.random() < changed:
+        column = rng.randrange(1, len(db_row))
+        db_row[column] = Decimal('0.5') if isinstance(db_row[column], Decimal) else 'ALTERADO'
+    return tuple(db_row)
+
+
+def differences(pairs, equal_functions):
+    found = []
+    for position, (file_row, db_row) in enumerate(pairs):
+        for column, (equal, file_value, db_value) in enumerate(zip(equal_functions, file_row, db_row)):
+            if column and not equal(file_value, db_value):
+                found.append((position, column))
+    return found
+
+
+def run(rows: int, changed: float, repeat: int):
+    fd, path = tempfile.mkstemp(suffix='.txt')
+    os.close(fd)
+    try:
+        write_sample_file(path, rows)
+        file_rows = [row for batch in iter_fixed_width_batches(path, LAYOUT, 50000) for row in batch.iter_rows()]
+    finally:
+        os.remove(path)
+
+    rng = random.Random(7)
+    pairs = [(row, database_row(row, rng, changed)) for row in file_rows]
+    names = [col['Coluna'] for col in LAYOUT]
+
+    results = {}
+    for label in ('por célula', 'compilados'):
+        best = None
+        for _ in range(repeat):
+            if label == 'por célula':
+                equal_functions = [legacy_values_equal] * len(names)
+            else:
+                # A compilação faz parte do tempo medido, como numa sincronização
+                comparators = compile_record_comparators(LAYOUT, DB_COLUMNS)
+                equal_functions = [comparators[name] for name in names]
+            start = time.perf_counter()
+            found = differences(pairs, equal_functions)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[label] = (found, best)
+        cells = rows * (len(names) - 1)
+        print(f"{label:>11}: {cells / best:,.0f} células/s ({best:.3f}s, {len(found)} diferenças)")
+
+    assert results['por célula'][0] == results['compilados'][0], "Os comparadores encontraram diferenças distintas"
+    print(f"Diferenças idênticas; {results['por célula'][1] / results['compilados'][1]:.1f}x mais rápido")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--changed', type=float, default=0.1, help="Fração de registros com um campo alterado")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.rows, args.changed, args.repeat)
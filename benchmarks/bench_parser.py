@@ -0,0 +1,77 @@
+"""
+Benchmark do parser de largura fixa: linha a linha (python) vs. blocos NumPy (vectorized).
+
+Mede também a leitura em lotes colunares (RecordBatch), usada pela sincronização.
+
+Uso:
+    python -m benchmarks.bench_parser --rows 200000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app.services.data_validator import parse_fixed_width_data, iter_fixed_width_batches
+
+LAYOUT = [
+    {'Coluna': 'CO_PROCEDIMENTO', 'Tamanho': 10, 'Inicio': 1, 'Fim': 10, 'Tipo': 'VARCHAR2'},
+    {'Coluna': 'NO_PROCEDIMENTO', 'Tamanho': 40, 'Inicio': 11, 'Fim': 50, 'Tipo': 'VARCHAR2'},
+    {'Coluna': 'TP_SEXO', 'Tamanho': 1, 'Inicio': 51, 'Fim': 51, 'Tipo': 'CHAR'},
+    {'Coluna': 'QT_MAXIMA', 'Tamanho': 4, 'Inicio': 52, 'Fim': 55, 'Tipo': 'NUMBER'},
+    {'Coluna': 'VL_SH', 'Tamanho': 12, 'Inicio': 56, 'Fim': 67, 'Tipo': 'NUMBER(10,2)'},
+    {'Coluna': 'DT_COMPETENCIA', 'Tamanho': 6, 'Inicio': 68, 'Fim': 73, 'Tipo': 'CHAR'},
+]
+
+
+def write_sample_file(path: str, rows: int, seed: int = 42):
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as file:
+        for i in range(rows):
+            name = f"PROCEDIMENTO {rng.randint(0, 99999)} ÇÃO"
+            file.write(
+                f"{i:010d}"
+                f"{name:<40}"
+                f"{rng.choice('MFI')}"
+                f"{rng.randint(0, 9999):4d}"
+                f"{rng.uniform(0, 99999):12.2f}"
+                f"2024{rng.randint(1, 12):02d}\n"
+            )
+
+
+def run(rows: int, repeat: int):
+    fd, path = tempfile.mkstemp(suffix='.txt')
+    os.close(fd)
+    try:
+        write_sample_file(path, rows)
+        results = {}
+        for engine in ('python', 'vectorized'):
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                records = parse_fixed_width_data(path, LAYOUT, engine=engine)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[engine] = records
+            print(f"{engine:>10}: {rows / best:,.0f} linhas/s ({best:.3f}s)")
+        assert results['python'] == results['vectorized'], "Os parsers produziram valores diferentes"
+        print("Resultados idênticos entre os parsers")
+
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _batch in iter_fixed_width_batches(path, LAYOUT, 50000):
+                pass
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{'lotes':>10}: {rows / best:,.0f} linhas/s ({best:.3f}s)")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
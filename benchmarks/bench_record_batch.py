@@ -0,0 +1,84 @@
+"""
+Memória ocupada por registros como lista de dicionários vs. lotes colunares (RecordBatch).
+
+Mede o lado do arquivo (saída do parser) e o lado do banco (tuplas retornadas
+pelo driver), extrapolando para um milhão de linhas.
+
+Uso:
+    python -m benchmarks.bench_record_batch --rows 200000
+"""
+import argparse
+import gc
+import os
+import tempfile
+import tracemalloc
+from decimal import Decimal
+
+import numpy as np
+
+from app.services.column_codecs import DecimalCodec
+from app.services.data_validator import iter_fixed_width_batches
+from app.services.record_batch import RecordBatch
+from benchmarks.bench_parser import LAYOUT, write_sample_file
+
+
+def measure(build):
+    """Retorna (objeto, bytes alocados e mantidos pela construção)."""
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    gc.collect()
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current
+
+
+def database_rows(rows: int):
+    """Tuplas no formato retornado pelo driver para a mesma tabela."""
+    return [
+        (f"{i:010d}", f"PROCEDIMENTO {i % 5000}", 'MFI'[i % 3], Decimal(i % 9999), Decimal(f"{i % 99999}.{i % 100:02d}"), f"2024{i % 12 + 1:02d}")
+        for i in range(rows)
+    ]
+
+
+def check_decimal_concat():
+    """Blocos NUMBER com escalas diferentes: a união não pode estourar o int64 ao reescalar."""
+    large, _ = DecimalCodec(2).convert_block(np.array(['1234567890123456.00', '', '-5.5']))
+    small, _ = DecimalCodec(2).convert_block(np.array(['1.2345']))
+    merged = RecordBatch.concat([RecordBatch(['VL'], [large]), RecordBatch(['VL'], [small])])
+    expected = [Decimal('1234567890123456.00'), None, Decimal('-5.5'), Decimal('1.2345')]
+    assert merged.column('VL') == expected, f"Concatenação de decimais incorreta: {merged.column('VL')}"
+    print("Concatenação de decimais com escalas diferentes: valores exatos")
+
+
+def report(label: str, rows: int, as_dicts: int, as_batch: int):
+    scale = 1_000_000 / rows
+    print(f"{label}: dicts {as_dicts * scale / 2**20:,.0f} MiB/milhão, "
+          f"RecordBatch {as_batch * scale / 2**20:,.0f} MiB/milhão ({as_dicts / max(as_batch, 1):.1f}x menor)")
+
+
+def run(rows: int):
+    check_decimal_concat()
+    fd, path = tempfile.mkstemp(suffix='.txt')
+    os.close(fd)
+    try:
+        write_sample_file(path, rows)
+        batches, batch_bytes = measure(lambda: list(iter_fixed_width_batches(path, LAYOUT, 50000)))
+        records, dict_bytes = measure(lambda: [record for batch in batches for record in batch.iter_records()])
+        report("Arquivo", rows, dict_bytes, batch_bytes)
+        del batches, records
+    finally:
+        os.remove(path)
+
+    names = [col['Coluna'] for col in LAYOUT]
+    rows_from_db = database_rows(rows)
+    _, dict_bytes = measure(lambda: [dict(zip(names, row)) for row in rows_from_db])
+    _, batch_bytes = measure(lambda: RecordBatch.from_rows(names, rows_from_db))
+    report("Banco", rows, dict_bytes, batch_bytes)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000)
+    args = parser.parse_args()
+    run(args.rows)
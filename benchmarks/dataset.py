@@ -0,0 +1,240 @@
+"""
+Gerador de cargas sintéticas de largura fixa: *_layout.txt, arquivo de dados e ZIP como os de produção.
+
+Cada tabela tem uma chave CO_<TABELA> e as colunas pedidas (NUMBER,
+VARCHAR2, CHAR, DATE). A mesma semente gera sempre os mesmos arquivos: a
+carga inicial e a atualização têm os mesmos valores, exceto as linhas
+alteradas (change_rate, uma coluna por linha, sempre com valor diferente).
+As linhas inválidas (bad_rate: linha truncada, NUMBER com letras ou data
+inexistente) são as mesmas nas duas versões, então as contagens esperadas
+de cada sincronização são conhecidas.
+
+Uso:
+    python -m benchmarks.dataset --rows 100000 --output-dir /tmp/carga
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import zipfile
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+# Tipos do layout e colunas por tipo (padrão)
+COLUMN_TYPES = ('NUMBER', 'VARCHAR2', 'CHAR', 'DATE')
+DEFAULT_COLUMNS = 'NUMBER=2,VARCHAR2=2,CHAR=1,DATE=1'
+
+# Encoding dos arquivos de dados de produção
+DATA_ENCODING = 'latin-1'
+
+# Prefixo dos nomes de coluna por tipo (a chave é CO_<TABELA>)
+COLUMN_PREFIXES = {'NUMBER': 'VL', 'VARCHAR2': 'NO', 'CHAR': 'TP', 'DATE': 'DT'}
+
+KEY_WIDTH = 10
+TEXT_CHARS = 'ABCDEFGHIJKLMNOPQRSTUVWÇÃÉÍÓÚ '
+FLAG_CHARS = 'ABCDEFGHIJ'
+FIRST_DATE = date(2000, 1, 1)
+
+
+class SyntheticColumn:
+    """Geração, alteração e corrupção dos valores de uma coluna do layout."""
+
+    def __init__(self, name: str, layout_type: str, index: int):
+        self.name = name
+        self.type = layout_type
+        # Colunas NUMBER alternam inteiro e NUMBER(12,2)
+        self.scale = 2 if layout_type == 'NUMBER' and index % 2 else 0
+        self.width = {'NUMBER': 12 if self.scale else 8, 'VARCHAR2': 40, 'CHAR': 1, 'DATE': 8}[layout_type]
+
+    @property
+    def layout_type(self) -> str:
+        return f"NUMBER({self.width},{self.scale})" if self.scale else self.type
+
+    def generate(self, rng: random.Random) -> Any:
+        if self.type == 'NUMBER':
+            # Um dígito livre: a alteração sempre cabe na largura
+            return rng.randrange(10 ** (self.width - 2))
+        if self.type == 'VARCHAR2':
+            return ''.join(rng.choices(TEXT_CHARS[:-1], k=1)) + ''.join(rng.choices(TEXT_CHARS, k=rng.randint(4, 39)))
+        if self.type == 'CHAR':
+            return rng.choice(FLAG_CHARS)
+        return FIRST_DATE + timedelta(days=rng.randrange(9000))
+
+    def change(self, value: Any) -> Any:
+        if self.type == 'NUMBER':
+            # A comparação tolera diferença relativa de 1e-7 (numbers_equal): a alteração é bem maior
+            return value * 2 + 1
+        if self.type == 'VARCHAR2':
+            return ('Z' if value[0] != 'Z' else 'Y') + value[1:]
+        if self.type == 'CHAR':
+            return FLAG_CHARS[(FLAG_CHARS.index(value) + 1) % len(FLAG_CHARS)]
+        return value + timedelta(days=1)
+
+    def text(self, value: Any) -> str:
+        if self.type == 'NUMBER':
+            if self.scale:
+                return f"{value // 100}.{value % 100:02d}".rjust(self.width)
+            return f"{value:{self.width}d}"
+        if self.type == 'DATE':
+            return value.strftime('%Y%m%d')
+        return value.ljust(self.width)
+
+    def corrupt(self, text: str) -> Optional[str]:
+        """Valor inválido com a mesma largura (None se o tipo não tem forma inválida)."""
+        if self.type == 'NUMBER':
+            return ('12X4' + text)[:self.width].rjust(self.width)
+        if self.type == 'DATE':
+            return '20241399'
+        return None
+
+
+def parse_column_mix(spec: str) -> Dict[str, int]:
+    """"NUMBER=2,VARCHAR2=2,CHAR=1,DATE=1" -> colunas por tipo."""
+    mix = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        layout_type, _, count = item.partition('=')
+        layout_type = layout_type.strip().upper()
+        if layout_type not in COLUMN_TYPES:
+            raise ValueError(f"Tipo de coluna desconhecido: {layout_type} (use {', '.join(COLUMN_TYPES)})")
+        mix[layout_type] = int(count or 1)
+    return mix
+
+
+def make_columns(column_mix: Dict[str, int]) -> List[SyntheticColumn]:
+    """Colunas de uma tabela, intercaladas por tipo (a chave não entra na lista)."""
+    columns = []
+    remaining = dict(column_mix)
+    while any(remaining.values()):
+        for layout_type in COLUMN_TYPES:
+            if remaining.get(layout_type):
+                index = column_mix[layout_type] - remaining[layout_type]
+                remaining[layout_type] -= 1
+                name = f"{COLUMN_PREFIXES[layout_type]}_{len(columns) + 1}"
+                columns.append(SyntheticColumn(name, layout_type, index))
+    return columns
+
+
+def make_layout(table: str, columns: List[SyntheticColumn]) -> List[Dict[str, Any]]:
+    """Linhas do *_layout.txt: a chave CO_<TABELA> seguida das colunas."""
+    key = f"CO_{table.upper().replace('TB_', '')}"
+    layout = [{'Coluna': key, 'Tamanho': KEY_WIDTH, 'Inicio': 1, 'Fim': KEY_WIDTH, 'Tipo': 'VARCHAR2'}]
+    start = KEY_WIDTH + 1
+    for column in columns:
+        layout.append({'Coluna': column.name, 'Tamanho': column.width, 'Inicio': start,
+                       'Fim': start + column.width - 1, 'Tipo': column.layout_type})
+        start += column.width
+    return layout
+
+
+def write_layout(path: str, layout: List[Dict[str, Any]]):
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=['Coluna', 'Tamanho', 'Inicio', 'Fim', 'Tipo'],
+                                lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(layout)
+
+
+def write_data(path: str, columns: List[SyntheticColumn], rows: int, seed: int = 42,
+               change_rate: float = 0.0, bad_rate: float = 0.0) -> Dict[str, int]:
+    """
+    Grava o arquivo de dados de uma tabela.
+
+    Os valores, as linhas alteradas e as linhas inválidas saem de sequências
+    aleatórias separadas: com a mesma semente, change_rate 0 gera a carga
+    inicial e change_rate > 0 a atualização correspondente.
+
+    Returns:
+        Linhas gravadas, alteradas (válidas) e inválidas
+    """
+    values_rng = random.Random(seed)
+    change_rng = random.Random(seed + 1)
+    bad_rng = random.Random(seed + 2)
+    corruptible = [index for index, column in enumerate(columns) if column.corrupt(' ' * column.width)]
+    stats = {'rows': rows, 'changed_rows': 0, 'bad_lines': 0}
+
+    with open(path, 'w', encoding=DATA_ENCODING, newline='') as file:
+        for key in range(rows):
+            values = [column.generate(values_rng) for column in columns]
+            bad = bad_rng.random() < bad_rate
+            kind = bad_rng.randrange(len(corruptible) + 1) if bad else None
+            changed = change_rng.random() < change_rate
+            target = change_rng.randrange(len(columns)) if changed else None
+
+            if changed and not bad:
+                values[target] = columns[target].change(values[target])
+                stats['changed_rows'] += 1
+            texts = [column.text(value) for column, value in zip(columns, values)]
+            line = f"{key:0{KEY_WIDTH}d}" + ''.join(texts)
+            if bad:
+                stats['bad_lines'] += 1
+                if kind < len(corruptible):
+                    index = corruptible[kind]
+                    texts[index] = columns[index].corrupt(texts[index])
+                    line = f"{key:0{KEY_WIDTH}d}" + ''.join(texts)
+                else:
+                    # Linha truncada (a chave fica inteira)
+                    line = line[:KEY_WIDTH + bad_rng.randint(1, max(len(line) - KEY_WIDTH - 1, 1))]
+            file.write(line + '\n')
+    return stats
+
+
+def write_zip(path: str, members: Dict[str, str]):
+    """ZIP com os arquivos (nome no ZIP -> caminho), compactados como os enviados em produção."""
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, file_path in members.items():
+            archive.write(file_path, name)
+
+
+def generate_dataset(directory: str, rows: int, tables: int = 1, column_mix: Optional[Dict[str, int]] = None,
+                     change_rate: float = 0.05, bad_rate: float = 0.001, seed: int = 42) -> Dict[str, Any]:
+    """
+    Gera, em directory, a carga inicial (baseline.zip) e a atualização (update.zip) de tables tabelas.
+
+    Returns:
+        Caminhos dos ZIPs e, por tabela, layout e contagens de cada versão
+    """
+    column_mix = column_mix or parse_column_mix(DEFAULT_COLUMNS)
+    os.makedirs(directory, exist_ok=True)
+    dataset = {'directory': directory, 'tables': []}
+    versions = {'baseline': {}, 'update': {}}
+
+    for number in range(1, tables + 1):
+        table = f"tb_bench_{number}"
+        columns = make_columns(column_mix)
+        layout = make_layout(table, columns)
+        table_seed = seed + 10 * number
+        layout_path = os.path.join(directory, f"{table}_layout.txt")
+        write_layout(layout_path, layout)
+        info = {'table': table, 'layout': layout}
+        for version, rate in (('baseline', 0.0), ('update', change_rate)):
+            data_path = os.path.join(directory, version, f"{table}.txt")
+            os.makedirs(os.path.dirname(data_path), exist_ok=True)
+            info[version] = write_data(data_path, columns, rows, table_seed, rate, bad_rate)
+            versions[version][f"{table}.txt"] = data_path
+            versions[version][f"{table}_layout.txt"] = layout_path
+        dataset['tables'].append(info)
+
+    for version, members in versions.items():
+        zip_path = os.path.join(directory, f"{version}.zip")
+        write_zip(zip_path, members)
+        dataset[f"{version}_zip"] = zip_path
+        dataset[f"{version}_bytes"] = sum(os.path.getsize(path) for path in members.values())
+    return dataset
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000, help="Linhas por tabela")
+    parser.add_argument('--tables', type=int, default=1)
+    parser.add_argument('--columns', default=DEFAULT_COLUMNS, help="Colunas por tipo, além da chave")
+    parser.add_argument('--change-rate', type=float, default=0.05, help="Fração de linhas alteradas na atualização")
+    parser.add_argument('--bad-rate', type=float, default=0.001, help="Fração de linhas inválidas")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output-dir', required=True)
+    args = parser.parse_args()
+    result = generate_dataset(args.output_dir, args.rows, args.tables, parse_column_mix(args.columns),
+                              args.change_rate, args.bad_rate, args.seed)
+    print(json.dumps({key: value for key, value in result.items() if key != 'tables'}, indent=2))
+    for table in result['tables']:
+        print(f"{table['table']}: {len(table['layout'])} colunas, inicial {table['baseline']}, atualização {table['update']}")
@@ -36,3 +36,83 @@ class Config:
 
     # Porta do Flask
     FLASK_PORT = int(os.getenv("FLASK_PORT", 8080))
+
+    # parser de largura fixa: "vectorized" (blocos NumPy) ou "python" (linha a linha)
+    PARSER_ENGINE = os.getenv("PARSER_ENGINE", "vectorized")
+    # quantidade de linhas processadas por bloco no parser vetorizado
+    PARSER_BLOCK_LINES = int(os.getenv("PARSER_BLOCK_LINES", 50000))
+    # conversão dos campos: "typed" (NUMBER exato em int/Decimal, DATE em data) ou "float" (NUMBER em float, DATE como texto)
+    PARSE_CODECS = os.getenv("PARSE_CODECS", "typed")
+    # registros do arquivo comparados/gravados por lote na sincronização
+    SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", 50000))
+    # bytes iniciais lidos para detectar o encoding de cada arquivo de dados
+    ENCODING_SAMPLE_BYTES = int(os.getenv("ENCODING_SAMPLE_BYTES", 1 << 20))
+    # linhas inválidas: "lenient" (ajusta e importa) ou "strict" (rejeita a linha)
+    PARSE_ERROR_POLICY = os.getenv("PARSE_ERROR_POLICY", "lenient")
+    # máximo de erros detalhados por arquivo no resultado do upload
+    PARSE_MAX_ERRORS = int(os.getenv("PARSE_MAX_ERRORS", 100))
+    # layouts compilados mantidos em cache (chave: hash do conteúdo do arquivo)
+    LAYOUT_CACHE_SIZE = int(os.getenv("LAYOUT_CACHE_SIZE", 128))
+    # arquivos de dados a partir deste tamanho são lidos em paralelo, por trechos de bytes
+    PARALLEL_PARSE_MIN_BYTES = int(os.getenv("PARALLEL_PARSE_MIN_BYTES", 256 << 20))
+    # processos usados no parsing paralelo (0 = quantidade de CPUs)
+    PARSER_WORKERS = int(os.getenv("PARSER_WORKERS", 0))
+    # leitura do ZIP enviado: "stream" (direto do arquivo compactado) ou "extract" (extrai para diretório temporário)
+    ZIP_READ_MODE = os.getenv("ZIP_READ_MODE", "stream")
+    # uploads processados ao mesmo tempo pela fila de jobs (os demais aguardam na fila)
+    UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 1))
+    # tempo (segundos) em que o resultado de um job concluído fica disponível em /jobs/<id>
+    JOB_RETENTION = float(os.getenv("JOB_RETENTION", 3600))
+    # eventos de progresso guardados por job (para quem conecta ou reconecta em /jobs/<id>/events)
+    PROGRESS_EVENT_BUFFER = int(os.getenv("PROGRESS_EVENT_BUFFER", 1000))
+    # intervalo (segundos) entre mensagens de keep-alive no stream de eventos sem novidades
+    SSE_HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", 15))
+    # limites (segundos) das faixas do histograma de duração por etapa em /metrics
+    METRICS_BUCKETS = tuple(float(bound) for bound in os.getenv(
+        "METRICS_BUCKETS", "0.01,0.05,0.1,0.5,1,5,10,30,60,300,900,1800,3600").split(","))
+    # perfil (cProfile) dos uploads: "off" (só os enviados com profile=1) ou "on" (todos)
+    PROFILE_UPLOADS = os.getenv("PROFILE_UPLOADS", "off")
+    # diretório dos perfis, um subdiretório por job (vazio = diretório temporário do sistema)
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "")
+    # funções por tabela no resumo de /jobs/<id>/profile
+    PROFILE_TOP = int(os.getenv("PROFILE_TOP", 30))
+    # tabelas sincronizadas em paralelo e tipo de pool ("thread" ou "process")
+    SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", 4))
+    SYNC_EXECUTOR = os.getenv("SYNC_EXECUTOR", "thread")
+    # limite de conexões simultâneas com o banco (tamanho do pool do SQLAlchemy)
+    DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", 8))
+    # validade (segundos) dos metadados do banco em cache: tabelas, colunas e chaves primárias
+    SCHEMA_CACHE_TTL = float(os.getenv("SCHEMA_CACHE_TTL", 300))
+    # gravação de registros novos: "auto" (COPY no PostgreSQL, executemany nos demais), "copy", "executemany" ou "values"
+    BULK_INSERT_STRATEGY = os.getenv("BULK_INSERT_STRATEGY", "auto")
+    # comparação arquivo x banco: "python" (no servidor), "vectorized" (no servidor, em DataFrames),
+    # "database" (no PostgreSQL), "merge" (arquivo e tabela ordenados pela chave e intercalados,
+    # memória limitada) ou "auto" (pelo tamanho da tabela)
+    SYNC_DIFF_ENGINE = os.getenv("SYNC_DIFF_ENGINE", "auto")
+    # escolha por tabela, sobrepondo SYNC_DIFF_ENGINE (ex.: "tb_procedimento:database,tb_cid:python")
+    SYNC_DIFF_ENGINE_TABLES = os.getenv("SYNC_DIFF_ENGINE_TABLES", "")
+    # no modo "auto", tabelas com pelo menos esta quantidade estimada de linhas são comparadas no banco
+    DB_DIFF_MIN_ROWS = int(os.getenv("DB_DIFF_MIN_ROWS", 1000000))
+    # registros do banco na comparação em Python: "keys" (só as chaves, depois as linhas das chaves
+    # presentes no arquivo) ou "full" (todas as linhas de uma vez)
+    SYNC_EXISTING_FETCH = os.getenv("SYNC_EXISTING_FETCH", "keys")
+    # chaves por consulta ao buscar as linhas completas no modo "keys"
+    SYNC_KEY_LOOKUP_SIZE = int(os.getenv("SYNC_KEY_LOOKUP_SIZE", 10000))
+    # linhas trazidas por vez do cursor do lado do servidor ao ler registros existentes
+    SYNC_FETCH_SIZE = int(os.getenv("SYNC_FETCH_SIZE", 10000))
+    # impressão digital por linha na comparação em Python: "auto" (calculada em SQL no PostgreSQL ou
+    # lida de SYNC_HASH_COLUMN) ou "off"; linhas com o mesmo hash não são comparadas campo a campo
+    SYNC_ROW_HASH = os.getenv("SYNC_ROW_HASH", "auto")
+    # coluna opcional das tabelas com o hash gravado na última carga (ex.: "SYNC_ROW_HASH"; vazio = não usa)
+    SYNC_HASH_COLUMN = os.getenv("SYNC_HASH_COLUMN", "")
+    # comparação por intercalação ordenada ("merge"): linhas do arquivo mantidas em memória antes de
+    # gravar um trecho ordenado em disco, e diretório desses arquivos (vazio = diretório temporário do sistema)
+    SYNC_MERGE_BUFFER_ROWS = int(os.getenv("SYNC_MERGE_BUFFER_ROWS", 1000000))
+    SYNC_SPILL_DIR = os.getenv("SYNC_SPILL_DIR", "")
+
+
+# Exporta as configurações em nível de módulo (ex.: from config import DATABASE_SCHEMA)
+for _name, _value in vars(Config).items():
+    if _name.isupper():
+        globals()[_name] = _value
+DATABASE_URL = Config.SQLALCHEMY_DATABASE_URI